@@ -1,10 +1,13 @@
 from chalice.app import Chalice
 from chalice.app import (
     ChaliceViewError, BadRequestError, UnauthorizedError, ForbiddenError,
-    NotFoundError, ConflictError, TooManyRequestsError, Response, CORSConfig,
+    NotFoundError, ConflictError, TooManyRequestsError, GatewayTimeoutError,
+    Response, CORSConfig,
     CustomAuthorizer, CognitoUserPoolAuthorizer, IAMAuthorizer,
-    UnprocessableEntityError,
-    AuthResponse, AuthRoute, Cron, Rate, __version__ as chalice_version
+    UnprocessableEntityError, JSONCodec, get_json_codec, CompressionConfig,
+    CacheConfig, ClientRegistry, StructuredLogConfig, MediaTypeMatcher,
+    JSONSchemaValidator, MultiDict, AuthResponse, AuthRoute, Cron, Rate,
+    __version__ as chalice_version
 )
 # We're reassigning version here to keep mypy happy.
 __version__ = chalice_version
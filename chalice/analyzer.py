@@ -162,6 +162,33 @@ class Boto3ClientMethodCallType(Boto3ClientMethodType):
     pass
 
 
+# The next 4 classes are used to track the boto3 clients
+# created through a chalice app's client registry:
+#
+# from chalice import Chalice   <--- bind "Chalice" as the chalice class type
+# app = Chalice('app')          <--- bind "app" as the chalice app type
+# app.clients                   <--- bind as the client registry type
+# app.clients.dynamodb          <--- bind as the boto3 client type,
+#                                    subtype 'dynamodb'.
+# app.clients.get               <--- bind as the boto3 create client type,
+#                                    so app.clients.get('s3') is handled
+#                                    the same way as boto3.client('s3').
+class ChaliceModuleType(BaseType):
+    pass
+
+
+class ChaliceClassType(BaseType):
+    pass
+
+
+class ChaliceAppType(BaseType):
+    pass
+
+
+class ClientRegistryType(BaseType):
+    pass
+
+
 class FunctionType(BaseType):
     def __init__(self, return_type):
         # type: (Any) -> None
@@ -324,6 +351,10 @@ class TypeBinder(object):
 class SymbolTableTypeInfer(ast.NodeVisitor):
     _SDK_PACKAGE = 'boto3'
     _CREATE_CLIENT = 'client'
+    _CHALICE_PACKAGE = 'chalice'
+    _CHALICE_CLASS = 'Chalice'
+    _CLIENT_REGISTRY = 'clients'
+    _REGISTRY_GET_CLIENT = 'get'
 
     def __init__(self, parsed_code, binder=None, visited=None):
         # type: (ParsedCode, Optional[TypeBinder], OptASTSet) -> None
@@ -382,6 +413,18 @@ class SymbolTableTypeInfer(ast.NodeVisitor):
                 if import_name == self._SDK_PACKAGE:
                     self._set_inferred_type_for_name(
                         import_name, Boto3ModuleType())
+                elif import_name == self._CHALICE_PACKAGE:
+                    self._set_inferred_type_for_name(
+                        import_name, ChaliceModuleType())
+        self.generic_visit(node)
+
+    def visit_ImportFrom(self, node):
+        # type: (ast.ImportFrom) -> None
+        if node.module == self._CHALICE_PACKAGE:
+            for child in node.names:
+                if child.name == self._CHALICE_CLASS:
+                    self._set_inferred_type_for_name(
+                        child.asname or child.name, ChaliceClassType())
         self.generic_visit(node)
 
     def visit_Name(self, node):
@@ -428,6 +471,28 @@ class SymbolTableTypeInfer(ast.NodeVisitor):
                     node.attr
                 )
             )
+        else:
+            self._infer_chalice_attribute(node, lhs_inferred_type)
+
+    def _infer_chalice_attribute(self, node, lhs_inferred_type):
+        # type: (ast.Attribute, Any) -> None
+        if lhs_inferred_type == ChaliceModuleType():
+            # chalice.Chalice
+            if node.attr == self._CHALICE_CLASS:
+                self._set_inferred_type_for_node(node, ChaliceClassType())
+        elif lhs_inferred_type == ChaliceAppType():
+            # app.clients
+            if node.attr == self._CLIENT_REGISTRY:
+                self._set_inferred_type_for_node(node, ClientRegistryType())
+        elif lhs_inferred_type == ClientRegistryType():
+            if node.attr == self._REGISTRY_GET_CLIENT:
+                # app.clients.get('s3')
+                self._set_inferred_type_for_node(node, Boto3CreateClientType())
+            else:
+                # app.clients.s3, the registry maps underscores in
+                # attribute names to dashes, e.g. app.clients.cognito_idp.
+                self._set_inferred_type_for_node(
+                    node, Boto3ClientType(node.attr.replace('_', '-')))
 
     def visit_Call(self, node):
         # type: (ast.Call) -> None
@@ -460,6 +525,8 @@ class SymbolTableTypeInfer(ast.NodeVisitor):
         elif isinstance(inferred_func_type, FunctionType):
             self._set_inferred_type_for_node(
                 node, inferred_func_type.return_type)
+        elif inferred_func_type == ChaliceClassType():
+            self._set_inferred_type_for_node(node, ChaliceAppType())
         elif isinstance(node.func, ast.Name) and \
                 self._symbol_table.has_ast_node_for_symbol(node.func.id):
             if node not in self._visited:
@@ -672,9 +739,10 @@ class AppViewTransformer(ast.NodeTransformer):
                 if decorator.func.attr == 'route' and \
                         decorator.args:
                     return True
-                # For lambda_function and schedule decorator.args
-                # not present.
-                if decorator.func.attr in ('lambda_function', 'schedule'):
+                # For lambda_function, schedule and on_sqs_message
+                # decorator.args not present.
+                if decorator.func.attr in ('lambda_function', 'schedule',
+                                           'on_sqs_message'):
                     return True
         return False
 
@@ -1,13 +1,26 @@
 """Chalice app and routing code."""
 import re
 import sys
+import copy
 import os
+import time
 import logging
+import threading
 import json
 import traceback
 import decimal
 import base64
-from collections import defaultdict, Mapping
+import hashlib
+import functools
+import operator
+import zlib
+import random
+import signal
+from collections import defaultdict, Mapping, OrderedDict
+
+# Recorded as early as possible so the cold start info can tell how
+# long it took to go from importing chalice to handling a request.
+_IMPORT_TIME = time.time()
 
 __version__ = '1.1.1'
 
@@ -18,6 +31,23 @@ __version__ = '1.1.1'
 
 
 _PARAMS = re.compile(r'{\w+}')
+_MIDDLEWARE_EVENT_TYPES = frozenset(['http'])
+# The largest batch lambda can receive from an SQS queue without
+# a batching window.
+_MAX_SQS_BATCH_SIZE = 10
+_DEFAULT_AUTHORIZER_TTL = 300
+# The key in the input of the keep warm CloudWatch rule.
+_KEEP_WARM_KEY = 'chalice_keep_warm'
+# Set in events by callers that want binary response bodies as bytes
+# instead of base64 encoded strings, e.g. the WSGI adapter.
+_RAW_BODY_KEY = 'chalice_raw_body'
+# How long the containers invoked by a keep warm fan out stay busy so
+# that the other invocations are sent to different containers.
+_KEEP_WARM_HOLD_SECONDS = 0.1
+# Lambda allocates one vCPU for every 1,769 MB of memory, up to 6 vCPUs.
+_MB_PER_VCPU = 1769
+_MAX_LAMBDA_VCPUS = 6
+_DEFAULT_LAMBDA_MEMORY_SIZE = 128
 
 try:
     # In python 2 there is a base class for the string types that
@@ -29,25 +59,328 @@ except NameError:
     # for both.
     _ANY_STRING = (str, bytes)
 
+try:
+    _STRING_TYPES = (basestring,)
+    _INTEGER_TYPES = (int, long)
+except NameError:
+    _STRING_TYPES = (str,)
+    _INTEGER_TYPES = (int,)
+
 
 def handle_decimals(obj):
     # Lambda will automatically serialize decimals so we need
     # to support that as well.
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, MultiDict):
+        return dict(obj)
+    return obj
+
+
+def _json_default(obj):
+    # Used by the third party codecs, which would otherwise keep
+    # calling ``default`` on a value it returns unchanged.
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, MultiDict):
+        return dict(obj)
+    raise TypeError("Object of type %s is not JSON serializable"
+                    % obj.__class__.__name__)
+
+
+def _normalize_json(obj):
+    # Converts the values the stdlib json module serializes, but the
+    # third party codecs don't, to plain JSON types: a MultiDict nested
+    # anywhere in the value and keys that aren't strings.
+    if isinstance(obj, (dict, MultiDict)):
+        return {_normalize_json_key(key): _normalize_json(value)
+                for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_normalize_json(value) for value in obj]
     if isinstance(obj, decimal.Decimal):
         return float(obj)
     return obj
 
 
-def error_response(message, error_code, http_status_code):
+def _normalize_json_key(key):
+    if isinstance(key, _STRING_TYPES):
+        return key
+    if key is None or isinstance(key, (bool, float) + _INTEGER_TYPES):
+        # The same conversion the stdlib json module uses for keys,
+        # e.g. True is "true" and None is "null".
+        return json.dumps(key)
+    raise TypeError("keys must be str, int, float, bool or None, not %s"
+                    % key.__class__.__name__)
+
+
+def error_response(message, error_code, http_status_code, json_codec=None):
     body = {'Code': error_code, 'Message': message}
     response = Response(body=body, status_code=http_status_code)
-    return response.to_dict()
+    return response.to_dict(json_codec=json_codec)
+
+
+def _get_header(headers, name, default=None):
+    # Looks up a header without building a case insensitive copy of
+    # the whole mapping.  ``name`` must already be lowercased.  Response
+    # header dicts are small, so a linear scan is cheaper than
+    # lowercasing and copying every key.
+    for key, value in headers.items():
+        if key.lower() == name:
+            return value
+    return default
+
+
+def _compute_etag(body):
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def _etag_matches(if_none_match, etag):
+    # If-None-Match uses the weak comparison function, so the W/
+    # prefix is ignored on both sides.
+    if if_none_match.strip() == '*':
+        return True
+    if etag.startswith('W/'):
+        etag = etag[2:]
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def _parse_media_type(value):
+    # Returns the lowercased type/subtype and a dict of the parameters,
+    # e.g. 'text/html; charset=UTF-8' -> ('text/html', {'charset': 'utf-8'})
+    parts = value.lower().split(';')
+    params = {}
+    for param in parts[1:]:
+        name, sep, param_value = param.partition('=')
+        if sep:
+            params[name.strip()] = param_value.strip().strip('"')
+    return parts[0].strip(), params
+
+
+def _media_range_matches(media_range, media_type):
+    range_type, range_params = media_range
+    type_name, params = media_type
+    if '/' not in type_name:
+        return False
+    if range_type != '*/*':
+        if range_type.endswith('/*'):
+            if not type_name.startswith(range_type[:-1]):
+                return False
+        elif range_type != type_name:
+            return False
+    for name, value in range_params.items():
+        if params.get(name) != value:
+            return False
+    return True
+
+
+def _parse_accept(accept):
+    # Returns (media_range, q) for the media ranges of an Accept header in
+    # order of preference.  Ranges with the same q value keep their order
+    # in the header.  Ranges with a q value of 0 are kept (at the end) so
+    # they can exclude a type that a less specific range would accept.
+    ranges = []
+    for index, part in enumerate(accept.split(',')):
+        media_range = _parse_media_type(part)
+        if not media_range[0]:
+            continue
+        try:
+            quality = float(media_range[1].pop('q', 1))
+        except ValueError:
+            continue
+        ranges.append((-quality, index, media_range))
+    ranges.sort(key=lambda r: r[:2])
+    return [(media_range, -negative_quality)
+            for negative_quality, _, media_range in ranges]
+
 
+class MediaTypeMatcher(object):
+    """Match media types against a fixed list of media ranges.
 
-def _matches_content_type(content_type, valid_content_types):
-    if ';' in content_type:
-        content_type = content_type.split(';', 1)[0].strip()
-    return content_type in valid_content_types
+    The media ranges are parsed once, when the matcher is created.  They
+    can be wildcards such as ``image/*`` or ``*/*`` and can include
+    parameters, e.g. ``text/plain; charset=utf-8`` only matches a
+    ``text/plain`` type with that charset.  The results for each header
+    value are cached since the same few values are seen repeatedly.
+    """
+
+    _MAX_CACHED = 256
+
+    def __init__(self, media_ranges):
+        self.media_ranges = tuple(media_ranges)
+        self._parsed = [_parse_media_type(r) for r in self.media_ranges]
+        self._matches = {}
+        self._accepts = {}
+        self._best_matches = {}
+
+    def __contains__(self, media_type):
+        return self.matches(media_type)
+
+    def __iter__(self):
+        return iter(self.media_ranges)
+
+    def __len__(self):
+        return len(self.media_ranges)
+
+    def matches(self, media_type):
+        """Return True if ``media_type`` is in one of the media ranges."""
+        result = self._matches.get(media_type)
+        if result is None:
+            parsed = _parse_media_type(media_type)
+            result = any(_media_range_matches(media_range, parsed)
+                         for media_range in self._parsed)
+            self._cache(self._matches, media_type, result)
+        return result
+
+    def accepts(self, accept):
+        """Return True if the client's preferred type is matched.
+
+        The preferred type is the media range in the ``Accept`` header
+        with the highest q value, or the first one if several have the
+        same q value.
+        """
+        result = self._accepts.get(accept)
+        if result is None:
+            ranges = _parse_accept(accept)
+            result = bool(ranges) and ranges[0][1] > 0 and any(
+                _media_range_matches(media_range, ranges[0][0])
+                for media_range in self._parsed)
+            self._cache(self._accepts, accept, result)
+        return result
+
+    def best_match(self, accept):
+        """Return the media range that best satisfies an Accept header.
+
+        Each media range gets the q value of the most specific range in
+        ``accept`` that matches it.  The media range with the highest q
+        value is returned, with ties going to the range that comes first
+        in ``accept`` and then to the order of ``media_ranges``.  If none
+        of the media ranges are acceptable ``None`` is returned.
+        """
+        if accept in self._best_matches:
+            return self._best_matches[accept]
+        ranges = _parse_accept(accept)
+        best = None
+        best_key = None
+        for media_range, parsed in zip(self.media_ranges, self._parsed):
+            key = self._negotiation_key(parsed, ranges)
+            if key is not None and (best_key is None or key > best_key):
+                best, best_key = media_range, key
+        self._cache(self._best_matches, accept, best)
+        return best
+
+    def _negotiation_key(self, parsed, accept_ranges):
+        most_specific = None
+        for index, (accept_range, quality) in enumerate(accept_ranges):
+            if not (_media_range_matches(accept_range, parsed) or
+                    _media_range_matches(parsed, accept_range)):
+                continue
+            specificity = (accept_range[0].count('*') * -1,
+                           len(accept_range[1]))
+            if most_specific is None or specificity > most_specific[0]:
+                most_specific = (specificity, quality, -index)
+        if most_specific is None or most_specific[1] <= 0:
+            return None
+        return most_specific[1:]
+
+    def _cache(self, cache, key, value):
+        if len(cache) >= self._MAX_CACHED:
+            cache.clear()
+        cache[key] = value
+
+
+_JSON_MEDIA_TYPE = MediaTypeMatcher(['application/json'])
+
+
+class _DeadlineAlarm(object):
+    """Raise a GatewayTimeoutError if a deadline is reached.
+
+    This uses ``SIGALRM``, so it only has an effect in the main thread
+    on platforms that support it.  Lambda invokes the handler in the
+    main thread.
+    """
+
+    def __init__(self, deadline):
+        self._deadline = deadline
+        self._previous_handler = None
+        self._previous_timer = (0.0, 0.0)
+        self._started = None
+        self._installed = False
+
+    def __enter__(self):
+        try:
+            self._previous_handler = signal.signal(signal.SIGALRM,
+                                                   self._on_alarm)
+        except (ValueError, AttributeError):
+            # ValueError when not in the main thread, and AttributeError
+            # when SIGALRM isn't available (e.g. Windows).
+            return self
+        self._installed = True
+        self._started = time.time()
+        self._previous_timer = signal.setitimer(
+            signal.ITIMER_REAL, max(self._deadline - self._started, 0.001))
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if not self._installed:
+            return
+        # The timer is disarmed first so the alarm can't fire once the
+        # view has returned.
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        self._installed = False
+        # signal.signal() returns None when the previous handler
+        # wasn't installed from python.
+        signal.signal(signal.SIGALRM,
+                      self._previous_handler or signal.SIG_DFL)
+        delay, interval = self._previous_timer
+        if delay > 0:
+            # The timer the app had set keeps counting down from when
+            # it was replaced, and fires right away if it's overdue.
+            elapsed = time.time() - self._started
+            signal.setitimer(signal.ITIMER_REAL,
+                             max(delay - elapsed, 0.001), interval)
+
+    def _on_alarm(self, signum, frame):
+        raise GatewayTimeoutError(
+            'The request did not complete before its deadline.')
+
+
+def _is_coroutine_function(func):
+    # inspect is only imported when routes are compiled to keep the
+    # import time down, and python 2 doesn't have coroutine functions.
+    import inspect
+    iscoroutinefunction = getattr(inspect, 'iscoroutinefunction', None)
+    return iscoroutinefunction is not None and iscoroutinefunction(func)
+
+
+def _wrap_middleware(middleware, get_response):
+    def handler(request):
+        response = middleware(request, get_response)
+        if not isinstance(response, Response):
+            response = Response(body=response)
+        return response
+    return handler
+
+
+def _cache_view_response(cache, get_view_response):
+    # Used for cached routes when there's middleware.  The cache is the
+    # innermost handler so the middleware runs on a cache hit too.
+    def get_cached_view_response(request):
+        key = cache.create_key(request)
+        response = cache.get(key)
+        if response is None:
+            response = get_view_response(request)
+            if response.status_code == 200:
+                cache.put(key, response)
+        return response
+    return get_cached_view_response
 
 
 class ChaliceError(Exception):
@@ -98,6 +431,10 @@ class TooManyRequestsError(ChaliceViewError):
     STATUS_CODE = 429
 
 
+class GatewayTimeoutError(ChaliceViewError):
+    STATUS_CODE = 504
+
+
 ALL_ERRORS = [
     ChaliceViewError,
     BadRequestError,
@@ -107,12 +444,476 @@ ALL_ERRORS = [
     RequestTimeoutError,
     ConflictError,
     UnprocessableEntityError,
-    TooManyRequestsError]
+    TooManyRequestsError,
+    GatewayTimeoutError]
+
+
+class _SchemaViolation(Exception):
+    def __init__(self, message, path=None):
+        super(_SchemaViolation, self).__init__(message)
+        self.message = message
+        # The path is built in reverse as the violation propagates up
+        # through the compiled checks, so nothing is allocated for it
+        # unless validation fails.
+        self.path = [] if path is None else path
+
+
+def _is_number(value):
+    return (isinstance(value, _INTEGER_TYPES + (float, decimal.Decimal))
+            and not isinstance(value, bool))
+
+
+_JSON_SCHEMA_TYPES = {
+    'object': lambda value: isinstance(value, dict),
+    'array': lambda value: isinstance(value, list),
+    'string': lambda value: isinstance(value, _STRING_TYPES),
+    'integer': lambda value: (isinstance(value, _INTEGER_TYPES) and
+                              not isinstance(value, bool)),
+    'number': _is_number,
+    'boolean': lambda value: isinstance(value, bool),
+    'null': lambda value: value is None,
+}
+# Keywords that don't affect validation.
+_JSON_SCHEMA_ANNOTATIONS = frozenset([
+    '$schema', 'id', 'title', 'description', 'default', 'example',
+    'format',
+])
+
+
+def _compile_schema(schema):
+    if not isinstance(schema, dict):
+        raise ValueError('A JSON schema must be a dict, not: %r' % (schema,))
+    unknown = set(schema) - set(_SCHEMA_KEYWORDS) - _JSON_SCHEMA_ANNOTATIONS
+    if unknown:
+        raise ValueError('Unsupported JSON schema keywords: %s'
+                         % ', '.join(sorted(unknown)))
+    checks = []
+    for keyword, compile_keyword in _SCHEMA_KEYWORDS.items():
+        if keyword in schema:
+            check = compile_keyword(schema[keyword], schema)
+            if check is not None:
+                checks.append(check)
+    if not checks:
+        return lambda value: None
+    if len(checks) == 1:
+        return checks[0]
+
+    def check_all(value):
+        for check in checks:
+            check(value)
+    return check_all
+
+
+def _compile_type(types, schema):
+    if not isinstance(types, list):
+        types = [types]
+    for name in types:
+        if name not in _JSON_SCHEMA_TYPES:
+            raise ValueError('Unknown JSON schema type: %s' % name)
+    predicates = [_JSON_SCHEMA_TYPES[name] for name in types]
+    message = 'must be of type %s' % ' or '.join(types)
+
+    def check(value):
+        for predicate in predicates:
+            if predicate(value):
+                return
+        raise _SchemaViolation(message)
+    return check
+
+
+def _compile_enum(values, schema):
+    message = 'must be one of: %s' % ', '.join(
+        json.dumps(value) for value in values)
+
+    def check(value):
+        if value not in values:
+            raise _SchemaViolation(message)
+    return check
+
+
+def _compile_properties(properties, schema):
+    compiled = [(name, _compile_schema(subschema))
+                for name, subschema in properties.items()]
+
+    def check(value):
+        if not isinstance(value, dict):
+            return
+        for name, check_property in compiled:
+            if name in value:
+                try:
+                    check_property(value[name])
+                except _SchemaViolation as e:
+                    e.path.append('.%s' % name)
+                    raise
+    return check
+
+
+def _compile_required(required, schema):
+    def check(value):
+        if not isinstance(value, dict):
+            return
+        for name in required:
+            if name not in value:
+                raise _SchemaViolation('is required', ['.%s' % name])
+    return check
+
+
+def _compile_additional_properties(additional, schema):
+    if additional is True:
+        return None
+    known = frozenset(schema.get('properties', ()))
+    check_additional = None
+    if additional is not False:
+        check_additional = _compile_schema(additional)
+
+    def check(value):
+        if not isinstance(value, dict):
+            return
+        for name in value:
+            if name in known:
+                continue
+            if check_additional is None:
+                raise _SchemaViolation('is not allowed', ['.%s' % name])
+            try:
+                check_additional(value[name])
+            except _SchemaViolation as e:
+                e.path.append('.%s' % name)
+                raise
+    return check
+
+
+def _compile_items(items, schema):
+    if not isinstance(items, dict):
+        raise ValueError('Only a single schema is supported for items.')
+    check_item = _compile_schema(items)
+
+    def check(value):
+        if not isinstance(value, list):
+            return
+        for i, item in enumerate(value):
+            try:
+                check_item(item)
+            except _SchemaViolation as e:
+                e.path.append('[%s]' % i)
+                raise
+    return check
+
+
+def _compile_bound(applies_to, size, compare, message):
+    def compile_keyword(limit, schema):
+        def check(value):
+            if applies_to(value) and not compare(size(value), limit):
+                raise _SchemaViolation(message % limit)
+        return check
+    return compile_keyword
+
+
+def _compile_pattern(pattern, schema):
+    search = re.compile(pattern).search
+    message = 'must match the pattern %s' % pattern
+
+    def check(value):
+        if isinstance(value, _STRING_TYPES) and search(value) is None:
+            raise _SchemaViolation(message)
+    return check
+
+
+def _compile_minimum(minimum, schema):
+    if schema.get('exclusiveMinimum', False):
+        compile_keyword = _compile_bound(
+            _is_number, _identity, operator.gt, 'must be greater than %s')
+    else:
+        compile_keyword = _compile_bound(
+            _is_number, _identity, operator.ge,
+            'must be greater than or equal to %s')
+    return compile_keyword(minimum, schema)
+
+
+def _compile_maximum(maximum, schema):
+    if schema.get('exclusiveMaximum', False):
+        compile_keyword = _compile_bound(
+            _is_number, _identity, operator.lt, 'must be less than %s')
+    else:
+        compile_keyword = _compile_bound(
+            _is_number, _identity, operator.le,
+            'must be less than or equal to %s')
+    return compile_keyword(maximum, schema)
+
+
+def _compile_all_of(schemas, schema):
+    checks = [_compile_schema(subschema) for subschema in schemas]
+
+    def check(value):
+        for check_schema in checks:
+            check_schema(value)
+    return check
+
+
+def _compile_any_of(schemas, schema):
+    checks = [_compile_schema(subschema) for subschema in schemas]
+
+    def check(value):
+        for check_schema in checks:
+            try:
+                check_schema(value)
+                return
+            except _SchemaViolation:
+                pass
+        raise _SchemaViolation('must match at least one of the schemas '
+                               'in anyOf')
+    return check
+
+
+def _is_string(value):
+    return isinstance(value, _STRING_TYPES)
+
+
+def _is_list(value):
+    return isinstance(value, list)
+
+
+def _identity(value):
+    return value
+
+
+# The keywords of the JSON schema draft 4 subset supported by API
+# Gateway models, mapped to a function that compiles the keyword's
+# value into a check.  The checks run in this order.
+_SCHEMA_KEYWORDS = OrderedDict([
+    ('type', _compile_type),
+    ('enum', _compile_enum),
+    ('required', _compile_required),
+    ('properties', _compile_properties),
+    ('additionalProperties', _compile_additional_properties),
+    ('items', _compile_items),
+    ('minItems', _compile_bound(_is_list, len, operator.ge,
+                                'must have at least %s items')),
+    ('maxItems', _compile_bound(_is_list, len, operator.le,
+                                'must have at most %s items')),
+    ('minLength', _compile_bound(_is_string, len, operator.ge,
+                                 'must be at least %s characters long')),
+    ('maxLength', _compile_bound(_is_string, len, operator.le,
+                                 'must be at most %s characters long')),
+    ('pattern', _compile_pattern),
+    ('minimum', _compile_minimum),
+    ('maximum', _compile_maximum),
+    # These only modify minimum and maximum.
+    ('exclusiveMinimum', lambda value, schema: None),
+    ('exclusiveMaximum', lambda value, schema: None),
+    ('allOf', _compile_all_of),
+    ('anyOf', _compile_any_of),
+])
+
+
+class JSONSchemaValidator(object):
+    """Validate values against a JSON schema.
+
+    The schema is compiled into a set of checks when the validator is
+    created, so validating a value only runs the checks the schema
+    needs.  The draft 4 keywords supported by API Gateway models are
+    understood, apart from ``$ref``, ``oneOf``, ``not`` and the
+    keywords for dependencies and pattern properties.  A ``ValueError``
+    is raised for a schema that uses any other keyword rather than
+    ignoring it.
+    """
+
+    def __init__(self, schema, name='body'):
+        self.schema = schema
+        #: The name used for the value in error messages.
+        self.name = name
+        self._check = _compile_schema(schema)
+
+    def validate(self, value):
+        """Raise a BadRequestError if ``value`` doesn't match the schema."""
+        try:
+            self._check(value)
+        except _SchemaViolation as e:
+            path = self.name + ''.join(reversed(e.path))
+            raise BadRequestError('%s %s' % (path, e.message))
+
+    def __eq__(self, other):
+        return (isinstance(other, self.__class__) and
+                self.schema == other.schema and self.name == other.name)
+
+
+def _parse_boolean(value):
+    if value == 'true':
+        return True
+    if value == 'false':
+        return False
+    raise ValueError('Not a boolean: %s' % value)
+
+
+_QUERY_PARAM_PARSERS = {
+    'integer': int,
+    'number': float,
+    'boolean': _parse_boolean,
+}
+
+
+def _compile_query_param_parser(types):
+    if not isinstance(types, list):
+        types = [types]
+    parsers = [_QUERY_PARAM_PARSERS[name] for name in types
+               if name in _QUERY_PARAM_PARSERS]
+    if not parsers:
+        return None
+
+    def parse(value):
+        for parser in parsers:
+            try:
+                return parser(value)
+            except ValueError:
+                pass
+        # The schema reports the value as the wrong type.
+        return value
+    return parse
+
+
+class _QueryParamsValidator(JSONSchemaValidator):
+    """Validate the query string parameters of a request.
+
+    The values of query string parameters are always strings, so the
+    parameters whose properties are declared as an integer, number or
+    boolean are parsed as that type before they're validated.
+    """
+
+    def __init__(self, schema):
+        super(_QueryParamsValidator, self).__init__(schema, 'query')
+        self._parsers = {}
+        for name, subschema in schema.get('properties', {}).items():
+            parser = _compile_query_param_parser(subschema.get('type', []))
+            if parser is not None:
+                self._parsers[name] = parser
+
+    def validate(self, value):
+        params = dict(value)
+        for name, parser in self._parsers.items():
+            if name in params:
+                params[name] = parser(params[name])
+        super(_QueryParamsValidator, self).validate(params)
+
+
+class JSONCodec(object):
+    """Serialize and parse JSON using the stdlib ``json`` module.
+
+    This is the default codec.  A codec is any object with a ``dumps``
+    method that returns a ``str`` and a ``loads`` method that accepts
+    a ``str`` or ``bytes``.  It's used for JSON request bodies, JSON
+    responses, and error responses.
+    """
+
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':'),
+                          default=handle_decimals)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class _ThirdPartyJSONCodec(JSONCodec):
+    def dumps(self, obj):
+        try:
+            return self._dumps(obj)
+        except TypeError:
+            # The value is only normalized when the library rejects it,
+            # so serializing plain JSON types stays fast.
+            return self._dumps(_normalize_json(obj))
+
+    def _dumps(self, obj):
+        raise NotImplementedError('_dumps')
+
+
+class OrjsonCodec(_ThirdPartyJSONCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def _dumps(self, obj):
+        # orjson returns bytes, but API Gateway expects a str body for
+        # non binary responses.
+        return self._orjson.dumps(obj, default=_json_default).decode('utf-8')
+
+    def loads(self, data):
+        return self._orjson.loads(data)
+
+
+class RapidJSONCodec(_ThirdPartyJSONCodec):
+    name = 'rapidjson'
+
+    def __init__(self):
+        import rapidjson
+        self._rapidjson = rapidjson
+
+    def _dumps(self, obj):
+        return self._rapidjson.dumps(obj, default=_json_default)
+
+    def loads(self, data):
+        return self._rapidjson.loads(data)
+
+
+class UJSONCodec(_ThirdPartyJSONCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+
+    def _dumps(self, obj):
+        # ujson serializes decimal.Decimal values as numbers on its own.
+        # It converts keys that aren't strings with str() rather than
+        # rejecting them, so bool and None keys are written as "True",
+        # "False" and "None".
+        return self._ujson.dumps(obj)
+
+    def loads(self, data):
+        return self._ujson.loads(data)
+
+
+_JSON_CODECS = {
+    'json': JSONCodec,
+    'orjson': OrjsonCodec,
+    'rapidjson': RapidJSONCodec,
+    'ujson': UJSONCodec,
+}
+# The order the backends are tried when ``json_codec='auto'``.
+_AUTO_JSON_CODECS = ['orjson', 'rapidjson', 'ujson']
+_DEFAULT_JSON_CODEC = JSONCodec()
+
+
+def get_json_codec(name):
+    """Create a JSON codec by name.
+
+    The ``name`` can be one of ``json``, ``orjson``, ``rapidjson``,
+    or ``ujson``.  An ``ImportError`` is raised if the corresponding
+    package is not installed.  A value of ``auto`` selects the first
+    third party codec that's installed, falling back to the stdlib
+    ``json`` module.
+
+    """
+    if name == 'auto':
+        for codec_name in _AUTO_JSON_CODECS:
+            try:
+                return _JSON_CODECS[codec_name]()
+            except ImportError:
+                continue
+        return _DEFAULT_JSON_CODEC
+    if name not in _JSON_CODECS:
+        raise ValueError(
+            "Unknown json_codec '%s', expected one of: auto, %s"
+            % (name, ', '.join(sorted(_JSON_CODECS))))
+    return _JSON_CODECS[name]()
 
 
 class CaseInsensitiveMapping(Mapping):
     """Case insensitive and read-only mapping."""
 
+    __slots__ = ('_dict',)
+
     def __init__(self, mapping):
         mapping = mapping or {}
         self._dict = {k.lower(): v for k, v in mapping.items()}
@@ -130,6 +931,80 @@ class CaseInsensitiveMapping(Mapping):
         return 'CaseInsensitiveMapping(%s)' % repr(self._dict)
 
 
+class MultiDict(Mapping):
+    """A read-only mapping that can have multiple values for a key.
+
+    This is created from the single and multi value maps API Gateway
+    sends for query strings and headers.  Looking up a key returns its
+    last value, which is the value in the single value map, and
+    ``getlist()`` returns all of its values.  If ``case_sensitive`` is
+    False, keys are looked up case insensitively.  The lists of values
+    are only built the first time they're needed.
+    """
+
+    __slots__ = ('_mapping', '_multi_mapping', '_case_sensitive', '_lists')
+
+    def __init__(self, mapping=None, multi_mapping=None, case_sensitive=True):
+        self._mapping = mapping
+        self._multi_mapping = multi_mapping
+        self._case_sensitive = case_sensitive
+        self._lists = None
+
+    def _is_single_valued(self):
+        # Without a multi value map, the single value map can be
+        # used as is.
+        return self._case_sensitive and self._multi_mapping is None
+
+    def _get_lists(self):
+        lists = self._lists
+        if lists is None:
+            if self._multi_mapping:
+                items = self._multi_mapping.items()
+            else:
+                items = [(key, [value]) for key, value
+                         in (self._mapping or {}).items()]
+            lists = {}
+            for key, values in items:
+                if not values:
+                    continue
+                if not self._case_sensitive:
+                    key = key.lower()
+                lists.setdefault(key, []).extend(values)
+            self._lists = lists
+        return lists
+
+    def getlist(self, key):
+        """Return a list of every value of ``key``.
+
+        An empty list is returned if the key isn't present.
+        """
+        if not self._case_sensitive:
+            key = key.lower()
+        return list(self._get_lists().get(key, ()))
+
+    def __getitem__(self, key):
+        if self._is_single_valued():
+            if self._mapping is None:
+                raise KeyError(key)
+            return self._mapping[key]
+        if not self._case_sensitive:
+            key = key.lower()
+        return self._get_lists()[key][-1]
+
+    def __iter__(self):
+        if self._is_single_valued():
+            return iter(self._mapping or ())
+        return iter(self._get_lists())
+
+    def __len__(self):
+        if self._is_single_valued():
+            return len(self._mapping or ())
+        return len(self._get_lists())
+
+    def __repr__(self):
+        return 'MultiDict(%r)' % self._get_lists()
+
+
 class Authorizer(object):
     name = ''
 
@@ -260,13 +1135,397 @@ class CORSConfig(object):
                 other.get_access_control_headers()
 
 
+class CompressionConfig(object):
+    """Compress responses based on the request's Accept-Encoding header."""
+
+    _DEFAULT_ALGORITHMS = ['br', 'gzip', 'deflate']
+    _DEFAULT_CONTENT_TYPES = [
+        'application/json',
+        'application/javascript',
+        'application/xml',
+        'image/svg+xml',
+    ]
+
+    def __init__(self, minimum_size=1024, algorithms=None,
+                 content_types=None, level=6):
+        self.minimum_size = minimum_size
+        self.level = level
+        if algorithms is None:
+            algorithms = [a for a in self._DEFAULT_ALGORITHMS
+                          if a != 'br' or self._load_brotli() is not None]
+        else:
+            self._validate_algorithms(algorithms)
+        self.algorithms = algorithms
+        if content_types is None:
+            content_types = self._DEFAULT_CONTENT_TYPES
+        self.content_types = frozenset(content_types)
+
+    def _load_brotli(self):
+        try:
+            import brotli
+        except ImportError:
+            return None
+        return brotli
+
+    def _validate_algorithms(self, algorithms):
+        for algorithm in algorithms:
+            if algorithm not in self._DEFAULT_ALGORITHMS:
+                raise ValueError(
+                    "Unknown compression algorithm '%s', expected one of: %s"
+                    % (algorithm, ', '.join(self._DEFAULT_ALGORITHMS)))
+            if algorithm == 'br' and self._load_brotli() is None:
+                raise ImportError(
+                    "The 'brotli' package is required for 'br' compression.")
+
+    def is_compressible(self, content_type):
+        if ';' in content_type:
+            content_type = content_type.split(';', 1)[0].strip()
+        return (content_type.startswith('text/') or
+                content_type in self.content_types)
+
+    def select_encoding(self, accept_encoding):
+        """Pick the encoding to use for an Accept-Encoding header value.
+
+        The encoding with the highest q-value is used, and ties are
+        broken by the order of ``algorithms``.  Returns ``None`` if none
+        of the algorithms are acceptable.
+
+        """
+        if not accept_encoding:
+            return None
+        weights = {}
+        for part in accept_encoding.split(','):
+            coding, _, params = part.partition(';')
+            weight = 1.0
+            params = params.strip()
+            if params.startswith('q='):
+                try:
+                    weight = float(params[2:])
+                except ValueError:
+                    weight = 0.0
+            weights[coding.strip().lower()] = weight
+        default_weight = weights.get('*', 0.0)
+        selected = None
+        selected_weight = 0.0
+        for algorithm in self.algorithms:
+            weight = weights.get(algorithm, default_weight)
+            if weight > selected_weight:
+                selected = algorithm
+                selected_weight = weight
+        return selected
+
+    def compress(self, body, encoding):
+        if encoding == 'gzip':
+            # A wbits value of 16 + MAX_WBITS writes a gzip header
+            # and trailer instead of a zlib one.
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            return compressor.compress(body) + compressor.flush()
+        elif encoding == 'deflate':
+            return zlib.compress(body, self.level)
+        return self._load_brotli().compress(body, quality=self.level)
+
+
+class CacheConfig(object):
+    """Cache the responses of a route across warm invocations."""
+
+    def __init__(self, ttl=30, max_entries=1000, vary_on=None,
+                 query_params=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        if vary_on is None:
+            vary_on = []
+        #: The request headers that are part of the cache key.
+        self.vary_on = tuple(header.lower() for header in vary_on)
+        #: The query params that are part of the cache key.  ``None``
+        #: means every query param is part of the key.
+        if query_params is not None:
+            query_params = tuple(query_params)
+        self.query_params = query_params
+
+
+class _ExpiringLRUCache(object):
+    """A bounded LRU cache whose entries expire after ``ttl`` seconds."""
+
+    def __init__(self, ttl, max_entries, clock=time.time):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # Wall clock time is used instead of a monotonic clock because
+        # a monotonic clock may not advance while lambda has frozen the
+        # container between invocations.
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None or entry[0] <= self._clock():
+                self.misses += 1
+                return None
+            # Reinserting the entry marks it as the most recently used.
+            self._entries[key] = entry
+            self.hits += 1
+        return entry[1]
+
+    def put(self, key, value):
+        expires_at = self._clock() + self.ttl
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (expires_at, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self._entries)}
+
+
+class RouteCache(_ExpiringLRUCache):
+    """A bounded LRU cache of the responses of a single route.
+
+    The serialized response dicts are cached, unless the app has http
+    middleware.  Then the view's :class:`Response` is cached so the
+    middleware still runs for every request.
+    """
+
+    def __init__(self, config, clock=time.time):
+        super(RouteCache, self).__init__(config.ttl, config.max_entries,
+                                         clock)
+        self.config = config
+
+    def create_key(self, request, content_encoding=None):
+        uri_params = tuple(sorted((request.uri_params or {}).items()))
+        query_params = request.query_params or MultiDict()
+        if self.config.query_params is None:
+            query_key = tuple(sorted(
+                (name, tuple(query_params.getlist(name)))
+                for name in query_params))
+        else:
+            query_key = tuple(tuple(query_params.getlist(name))
+                              for name in self.config.query_params)
+        header_key = tuple(request._get_header(name)
+                           for name in self.config.vary_on)
+        return (uri_params, query_key, header_key, content_encoding,
+                self._caller_key(request.context or {}))
+
+    def _caller_key(self, context):
+        # A response for one caller is never returned to another caller
+        # when the route has an authorizer.  Custom authorizers set the
+        # principalId, cognito user pools the claims, and IAM only sets
+        # the identity of the caller.
+        authorizer = context.get('authorizer')
+        if authorizer:
+            authorizer = json.dumps(authorizer, sort_keys=True, default=str)
+        identity = context.get('identity') or {}
+        return (authorizer, identity.get('userArn'),
+                identity.get('cognitoIdentityId'))
+
+    def get(self, key):
+        response = super(RouteCache, self).get(key)
+        if response is None:
+            return None
+        return self._copy_response(response)
+
+    def put(self, key, response):
+        super(RouteCache, self).put(key, self._copy_response(response))
+
+    def invalidate(self, uri_params=None):
+        with self._lock:
+            if uri_params is None:
+                self._entries.clear()
+                return
+            uri_key = tuple(sorted(uri_params.items()))
+            for key in [k for k in self._entries if k[0] == uri_key]:
+                del self._entries[key]
+
+    def _copy_response(self, response):
+        # Callers are free to modify the response dict and its headers
+        # (e.g. chalice local decodes the body in place), so neither the
+        # cached value nor the returned value can be shared.
+        if isinstance(response, Response):
+            # Middleware can modify the Response, including its body.
+            body = response.body
+            if not isinstance(body, _ANY_STRING):
+                body = copy.deepcopy(body)
+            return Response(body=body, headers=dict(response.headers),
+                            status_code=response.status_code)
+        copied = dict(response)
+        copied['headers'] = dict(response['headers'])
+        return copied
+
+
+class AuthorizerCache(_ExpiringLRUCache):
+    """A bounded LRU cache of authorizer results keyed on the token.
+
+    This mirrors API Gateway, which caches the policy returned by an
+    authorizer for each token for ``ttl_seconds``, and uses the cached
+    policy for any route the token is used with.
+    """
+
+    def __init__(self, ttl_seconds=300, max_entries=1000, clock=time.time):
+        super(AuthorizerCache, self).__init__(ttl_seconds, max_entries,
+                                              clock)
+
+    def get(self, token):
+        result = super(AuthorizerCache, self).get(token)
+        if result is None:
+            return None
+        return self._copy_result(result)
+
+    def put(self, token, result):
+        super(AuthorizerCache, self).put(token, self._copy_result(result))
+
+    def _copy_result(self, result):
+        # Callers are free to modify the top level result and its context
+        # (e.g. chalice local adds the principalId to the context) so
+        # neither the cached value nor the returned value can be shared.
+        if isinstance(result, dict):
+            result = dict(result)
+            if isinstance(result.get('context'), dict):
+                result['context'] = dict(result['context'])
+        return result
+
+    def invalidate(self, token=None):
+        with self._lock:
+            if token is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(token, None)
+
+
+class ResponseCache(object):
+    """The response caches for all the routes of an app."""
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._route_caches = {}
+
+    def get_route_cache(self, resource_path, method, config):
+        key = (resource_path, method)
+        route_cache = self._route_caches.get(key)
+        if route_cache is None or route_cache.config is not config:
+            route_cache = RouteCache(config, self._clock)
+            self._route_caches[key] = route_cache
+        return route_cache
+
+    def invalidate(self, resource_path=None, uri_params=None):
+        """Remove cached responses.
+
+        With no arguments every cached response is removed.  If
+        ``resource_path`` is provided (e.g. ``/items/{id}``), only the
+        responses for that route are removed, and ``uri_params`` can
+        further limit that to the responses for specific path params
+        (e.g. ``{'id': '123'}``).
+
+        """
+        for (path, _), route_cache in self._route_caches.items():
+            if resource_path is None or path == resource_path:
+                route_cache.invalidate(uri_params)
+
+    @property
+    def hits(self):
+        return sum(c.hits for c in self._route_caches.values())
+
+    @property
+    def misses(self):
+        return sum(c.misses for c in self._route_caches.values())
+
+    def stats(self):
+        return {'%s %s' % (method, path): route_cache.stats()
+                for (path, method), route_cache
+                in self._route_caches.items()}
+
+
+class ClientRegistry(object):
+    """Lazily created boto3 clients shared across invocations.
+
+    Clients are created on first access, either as an attribute
+    (``app.clients.dynamodb``) or with ``get()``
+    (``app.clients.get('s3', region='us-east-1')``), and are reused
+    for the lifetime of the lambda container.  Underscores in attribute
+    names are mapped to dashes, e.g. ``app.clients.cognito_idp``.
+
+    """
+
+    def __init__(self, session=None, max_pool_connections=10,
+                 tcp_keepalive=True):
+        self.max_pool_connections = max_pool_connections
+        self.tcp_keepalive = tcp_keepalive
+        self._session = session
+        self._client_config = None
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def get(self, service_name, region=None):
+        key = (service_name, region)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = self._create_client(service_name, region)
+                    self._clients[key] = client
+        return client
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self.get(name.replace('_', '-'))
+
+    def _create_client(self, service_name, region):
+        if self._session is None:
+            # boto3 is included in the lambda runtime, but it's only
+            # imported when it's needed to keep the import time down.
+            import boto3.session
+            self._session = boto3.session.Session()
+        return self._session.client(service_name, region_name=region,
+                                    config=self._get_client_config())
+
+    def _get_client_config(self):
+        if self._client_config is None:
+            from botocore.config import Config
+            kwargs = {'max_pool_connections': self.max_pool_connections}
+            try:
+                self._client_config = Config(
+                    tcp_keepalive=self.tcp_keepalive, **kwargs)
+            except TypeError:
+                # tcp_keepalive requires botocore>=1.27.
+                self._client_config = Config(**kwargs)
+        return self._client_config
+
+
 class Request(object):
     """The current request from API gateway."""
 
+    # Requests are created for every invocation so we avoid a per
+    # instance __dict__.  The headers are also only converted to a
+    # case insensitive mapping the first time they're accessed.
+    __slots__ = ('query_params', 'uri_params', 'method', 'context',
+                 'stage_vars', 'deadline', '_raw_headers',
+                 '_raw_multi_value_headers', '_headers',
+                 '_is_base64_encoded', '_body', '_json_body', '_raw_body',
+                 '_json_codec')
+
+    _PUBLIC_ATTRS = ('query_params', 'headers', 'uri_params', 'method',
+                     'context', 'stage_vars')
+
     def __init__(self, query_params, headers, uri_params, method, body,
-                 context, stage_vars, is_base64_encoded):
+                 context, stage_vars, is_base64_encoded, json_codec=None,
+                 deadline=None, multi_value_query_params=None,
+                 multi_value_headers=None):
+        if query_params is not None or multi_value_query_params is not None:
+            query_params = MultiDict(query_params, multi_value_query_params)
+        #: A MultiDict of the query string parameters, or None if there
+        #: aren't any.
         self.query_params = query_params
-        self.headers = CaseInsensitiveMapping(headers)
+        self._raw_headers = headers
+        self._raw_multi_value_headers = multi_value_headers
+        self._headers = None
         self.uri_params = uri_params
         self.method = method
         self._is_base64_encoded = is_base64_encoded
@@ -278,6 +1537,36 @@ class Request(object):
         self._raw_body = b''
         self.context = context
         self.stage_vars = stage_vars
+        #: When the view must return by, in seconds since the epoch,
+        #: or None if the app doesn't set a deadline.
+        self.deadline = deadline
+        if json_codec is None:
+            json_codec = _DEFAULT_JSON_CODEC
+        self._json_codec = json_codec
+
+    def remaining_time(self):
+        """Return the seconds left until the deadline, or None."""
+        if self.deadline is None:
+            return None
+        return max(self.deadline - time.time(), 0)
+
+    @property
+    def headers(self):
+        if self._headers is None:
+            self._headers = MultiDict(self._raw_headers,
+                                      self._raw_multi_value_headers,
+                                      case_sensitive=False)
+        return self._headers
+
+    def _get_header(self, name, default=None):
+        # Used internally by chalice to look up a single header
+        # without materializing the ``headers`` mapping.  ``name``
+        # must be lowercase.
+        if self._headers is not None:
+            return self._headers.get(name, default)
+        if not self._raw_headers:
+            return default
+        return _get_header(self._raw_headers, name, default)
 
     def _base64decode(self, encoded):
         if not isinstance(encoded, bytes):
@@ -298,22 +1587,27 @@ class Request(object):
 
     @property
     def json_body(self):
-        if self.headers.get('content-type', '').startswith('application/json'):
+        if self._get_header('content-type', '').startswith(
+                'application/json'):
             if self._json_body is None:
-                self._json_body = json.loads(self.raw_body)
+                self._json_body = self._json_codec.loads(self.raw_body)
             return self._json_body
 
     def to_dict(self):
         # Don't copy internal attributes.
-        copied = {k: v for k, v in self.__dict__.items()
-                  if not k.startswith('_')}
+        copied = {k: getattr(self, k) for k in self._PUBLIC_ATTRS}
         # We want the output of `to_dict()` to be
-        # JSON serializable, so we need to remove the CaseInsensitive dict.
+        # JSON serializable, so we need to remove the MultiDicts.
         copied['headers'] = dict(copied['headers'])
+        if copied['query_params'] is not None:
+            copied['query_params'] = dict(copied['query_params'])
         return copied
 
 
 class Response(object):
+
+    __slots__ = ('body', 'headers', 'status_code')
+
     def __init__(self, body, headers=None, status_code=200):
         self.body = body
         if headers is None:
@@ -321,50 +1615,137 @@ class Response(object):
         self.headers = headers
         self.status_code = status_code
 
-    def to_dict(self, binary_types=None):
+    def to_dict(self, binary_types=None, json_codec=None, compression=None,
+                accept_encoding=None, base64_encode=True):
         body = self.body
         if not isinstance(body, _ANY_STRING):
-            body = json.dumps(body, default=handle_decimals)
+            if json_codec is None:
+                json_codec = _DEFAULT_JSON_CODEC
+            body = json_codec.dumps(body)
         response = {
             'headers': self.headers,
             'statusCode': self.status_code,
             'body': body
         }
-        if binary_types is not None:
-            self._b64encode_body_if_needed(response, binary_types)
+        compressed = False
+        if compression is not None:
+            compressed = self._compress_body_if_needed(
+                response, compression, accept_encoding)
+        if binary_types is not None or compressed:
+            self._b64encode_body_if_needed(response, binary_types,
+                                           compressed, base64_encode)
         return response
 
-    def _b64encode_body_if_needed(self, response_dict, binary_types):
-        response_headers = CaseInsensitiveMapping(response_dict['headers'])
-        content_type = response_headers.get('content-type', '')
+    def _compress_body_if_needed(self, response_dict, compression,
+                                 accept_encoding):
+        body = response_dict['body']
+        headers, encoding = self._get_compression_headers(
+            response_dict['headers'], body, compression, accept_encoding)
+        response_dict['headers'] = headers
+        if encoding is None:
+            return False
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        response_dict['body'] = compression.compress(body, encoding)
+        return True
+
+    def _get_compression_headers(self, headers, body, compression,
+                                 accept_encoding):
+        # Returns the headers of the response once its serialized body
+        # has been compressed, along with the selected encoding or None.
+        # A 304 response uses the same headers without compressing.
+        if _get_header(headers, 'content-encoding') is not None:
+            # The view already encoded the body itself.
+            return headers, None
+        content_type = _get_header(headers, 'content-type',
+                                   'application/json')
+        if body is None or not compression.is_compressible(content_type):
+            return headers, None
+        if not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        if len(body) < compression.minimum_size:
+            return headers, None
+        # The headers are copied because the view may return a dict it
+        # shares between responses, which must not keep these headers.
+        headers = dict(headers)
+        # The response would have been compressed for a client that
+        # asked for it, so caches must key on Accept-Encoding either way.
+        self._add_vary_header(headers, 'Accept-Encoding')
+        encoding = compression.select_encoding(accept_encoding)
+        if encoding is None:
+            return headers, None
+        headers['Content-Encoding'] = encoding
+        self._weaken_etag(headers)
+        return headers, encoding
+
+    def _weaken_etag(self, headers):
+        # A strong ETag identifies the exact bytes of the response, which
+        # are different once compressed, so it's downgraded to a weak one.
+        for key in headers:
+            if key.lower() == 'etag':
+                if not headers[key].startswith('W/'):
+                    headers[key] = 'W/' + headers[key]
+                return
+
+    def _add_vary_header(self, headers, value):
+        for key in headers:
+            if key.lower() == 'vary':
+                if value.lower() not in headers[key].lower():
+                    headers[key] = '%s, %s' % (headers[key], value)
+                return
+        headers['Vary'] = value
+
+    def _b64encode_body_if_needed(self, response_dict, binary_types,
+                                  compressed=False, base64_encode=True):
+        content_type = _get_header(response_dict['headers'],
+                                   'content-type', '')
         body = response_dict['body']
 
-        if _matches_content_type(content_type, binary_types):
-            if _matches_content_type(content_type, ['application/json']):
+        if compressed or self._is_binary_type(content_type, binary_types):
+            if not compressed and _JSON_MEDIA_TYPE.matches(content_type):
                 # There's a special case when a user configures
                 # ``application/json`` as a binary type.  The default
                 # json serialization results in a string type, but for binary
                 # content types we need a type bytes().  So we need to special
                 # case this scenario and encode the JSON body to bytes().
                 body = body.encode('utf-8')
-            body = self._base64encode(body)
-            response_dict['isBase64Encoded'] = True
+            if base64_encode:
+                body = self._base64encode(body)
+                response_dict['isBase64Encoded'] = True
+            else:
+                self._validate_binary_body(body)
         response_dict['body'] = body
 
-    def _base64encode(self, data):
+    def _is_binary_type(self, content_type, binary_types):
+        if binary_types is None:
+            return False
+        if not isinstance(binary_types, MediaTypeMatcher):
+            # A list of binary types, e.g. from a caller of to_dict().
+            binary_types = MediaTypeMatcher(binary_types)
+        return binary_types.matches(content_type)
+
+    def _validate_binary_body(self, data):
         if not isinstance(data, bytes):
             raise ValueError('Expected bytes type for body with binary '
                              'Content-Type. Got %s type body instead.'
                              % type(data))
+
+    def _base64encode(self, data):
+        self._validate_binary_body(data)
         data = base64.b64encode(data)
         return data.decode('ascii')
 
 
 class RouteEntry(object):
 
+    __slots__ = ('view_function', 'view_name', 'uri_pattern', 'method',
+                 'api_key_required', 'view_args', 'content_types', 'cors',
+                 'authorizer', 'etag', 'cache', 'body_schema', 'query_schema')
+
     def __init__(self, view_function, view_name, path, method,
                  api_key_required=None, content_types=None,
-                 cors=False, authorizer=None):
+                 cors=False, authorizer=None, etag=None, cache=None,
+                 body_schema=None, query_schema=None):
         self.view_function = view_function
         self.view_name = view_name
         self.uri_pattern = path
@@ -385,6 +1766,15 @@ class RouteEntry(object):
             cors = None
         self.cors = cors
         self.authorizer = authorizer
+        #: Whether to generate ETags for this route.  ``None`` means
+        #: the ``etag`` value of the app's APIGateway is used.
+        self.etag = etag
+        #: An optional CacheConfig for caching responses in memory.
+        self.cache = cache
+        #: Optional JSONSchemaValidators for the JSON body and the
+        #: query string parameters.
+        self.body_schema = body_schema
+        self.query_schema = query_schema
 
     def _parse_view_args(self):
         if '{' not in self.uri_pattern:
@@ -395,7 +1785,42 @@ class RouteEntry(object):
         return results
 
     def __eq__(self, other):
-        return self.__dict__ == other.__dict__
+        if not isinstance(other, self.__class__):
+            return False
+        return all(getattr(self, attr) == getattr(other, attr)
+                   for attr in self.__slots__)
+
+
+class CompiledRoute(object):
+    """A route entry with its per request values precomputed.
+
+    Instances are created by :meth:`Chalice.freeze` so that
+    ``Chalice.__call__`` doesn't have to recompute the CORS headers
+    or content type sets on every invocation.
+    """
+
+    def __init__(self, route_entry, binary_types, etag=False, cache=None,
+                 handler=None):
+        self.route_entry = route_entry
+        self.view_function = route_entry.view_function
+        self.view_args = tuple(route_entry.view_args)
+        self.content_types = None
+        if route_entry.content_types:
+            self.content_types = MediaTypeMatcher(route_entry.content_types)
+        self.cors_headers = None
+        if route_entry.cors is not None:
+            self.cors_headers = route_entry.cors.get_access_control_headers()
+        self.binary_types = binary_types
+        if route_entry.etag is not None:
+            etag = route_entry.etag
+        self.etag = etag
+        #: The RouteCache for this route, if caching is enabled.
+        self.cache = cache
+        #: The view wrapped in the registered middleware, or None if
+        #: there isn't any middleware.
+        self.handler = handler
+        self.body_schema = route_entry.body_schema
+        self.query_schema = route_entry.query_schema
 
 
 class APIGateway(object):
@@ -421,40 +1846,389 @@ class APIGateway(object):
 
     def __init__(self):
         self.binary_types = self.default_binary_types
+        self._compression = None
+        #: Whether to generate ETags for routes that don't specify
+        #: the ``etag`` option.
+        self.etag = False
 
     @property
     def default_binary_types(self):
         return list(self._DEFAULT_BINARY_TYPES)
 
+    @property
+    def compression(self):
+        return self._compression
+
+    @compression.setter
+    def compression(self, value):
+        # Similar to the ``cors`` route option, ``True`` enables
+        # compression with the default CompressionConfig.
+        if value is True:
+            value = CompressionConfig()
+        elif value is False:
+            value = None
+        self._compression = value
+
+
+class ColdStartInfo(object):
+    """Timestamps for the cold start of a lambda container.
+
+    All the values are seconds since the epoch as returned by
+    ``time.time()``.  The ``first_invocation_*`` values are ``None``
+    until the app handles its first request.
+    """
+
+    def __init__(self, import_time, init_start):
+        #: When ``chalice.app`` was imported.
+        self.import_time = import_time
+        #: When the Chalice object started and finished initializing.
+        self.init_start = init_start
+        self.init_end = None
+        #: When the first request started and finished.
+        self.first_invocation_start = None
+        self.first_invocation_end = None
+
+    def _elapsed_ms(self, start, end):
+        if start is None or end is None:
+            return None
+        return round((end - start) * 1000, 3)
+
+    def to_dict(self):
+        return {
+            # Importing the rest of the app module, including anything
+            # imported before the Chalice object is created.
+            'import_to_init_ms': self._elapsed_ms(
+                self.import_time, self.init_start),
+            'init_ms': self._elapsed_ms(self.init_start, self.init_end),
+            # Registering routes and importing chalicelib, as well as
+            # anything lambda does before invoking the handler.
+            'init_to_first_invocation_ms': self._elapsed_ms(
+                self.init_end, self.first_invocation_start),
+            'first_invocation_ms': self._elapsed_ms(
+                self.first_invocation_start, self.first_invocation_end),
+            'total_ms': self._elapsed_ms(
+                self.import_time, self.first_invocation_end),
+        }
+
+
+class StructuredLogConfig(object):
+    """Configuration for structured JSON logs."""
+
+    def __init__(self, capacity=100, debug_sample_rate=1.0):
+        if capacity < 1:
+            raise ValueError('The log buffer capacity must be at least 1, '
+                             'received: %s' % capacity)
+        if not 0 <= debug_sample_rate <= 1:
+            raise ValueError('The debug_sample_rate must be between 0 and '
+                             '1, received: %s' % debug_sample_rate)
+        #: The number of records buffered before they're written.
+        self.capacity = capacity
+        #: The fraction of DEBUG records that are logged.
+        self.debug_sample_rate = debug_sample_rate
+
+
+class StructuredLogHandler(logging.Handler):
+    """Write log records as JSON objects, one per line.
+
+    During an invocation of the app, records are buffered and written
+    with a single write when the invocation ends or when ``capacity``
+    records have been buffered.  Records logged outside of an
+    invocation are written immediately.  The buffer and the start of
+    the invocation are kept per thread, so concurrent invocations don't
+    write or time each other's records.
+    """
+
+    def __init__(self, app, stream, config=None, rng=random.random):
+        logging.Handler.__init__(self)
+        if config is None:
+            config = StructuredLogConfig()
+        self.config = config
+        self._app = app
+        self._stream = stream
+        self._rng = rng
+        self._local = threading.local()
+
+    def _get_buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = []
+        return buffer
+
+    def _get_invocation_start(self):
+        return getattr(self._local, 'invocation_start', None)
+
+    def start_invocation(self):
+        self._local.invocation_start = time.time()
+
+    def end_invocation(self):
+        self._local.invocation_start = None
+        self.flush()
+
+    def emit(self, record):
+        if record.levelno == logging.DEBUG and \
+                self._rng() >= self.config.debug_sample_rate:
+            return
+        try:
+            entry = self._create_entry(record)
+        except Exception:
+            self.handleError(record)
+            return
+        buffer = self._get_buffer()
+        buffer.append(entry)
+        if self._get_invocation_start() is None or \
+                len(buffer) >= self.config.capacity:
+            self.flush()
+
+    def flush(self):
+        # Only the calling thread's records are written, the other
+        # threads flush their own buffers when their invocations end.
+        buffer = self._get_buffer()
+        if not buffer:
+            return
+        lines = [json.dumps(entry, default=str) for entry in buffer]
+        del buffer[:]
+        self.acquire()
+        try:
+            self._stream.write('\n'.join(lines) + '\n')
+            if hasattr(self._stream, 'flush'):
+                self._stream.flush()
+        finally:
+            self.release()
+
+    def _create_entry(self, record):
+        entry = {
+            'timestamp': '%s.%03dZ' % (
+                time.strftime('%Y-%m-%dT%H:%M:%S',
+                              time.gmtime(record.created)),
+                record.msecs),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exception'] = logging.Formatter().formatException(
+                record.exc_info)
+        invocation_start = self._get_invocation_start()
+        if invocation_start is not None:
+            entry['latency_ms'] = round(
+                (record.created - invocation_start) * 1000, 3)
+            context = self._app.lambda_context
+            if context is not None:
+                entry['request_id'] = getattr(
+                    context, 'aws_request_id', None)
+            request = self._app.current_request
+            if request is not None:
+                entry['method'] = request.method
+                entry['route'] = request.context.get('resourcePath')
+        return entry
+
+
+class _MetricsBuffer(object):
+    # The metrics recorded by a single invocation.
+    def __init__(self):
+        self.metrics = OrderedDict()
+        self.dimensions = None
+
+
+class MetricsRecorder(object):
+    """Record metrics in CloudWatch embedded metric format.
+
+    The metrics recorded during an invocation are written to stdout as a
+    single JSON line when the invocation ends.  CloudWatch Logs extracts
+    the metrics from the line, so no API calls are made to publish them.
+    The metrics are recorded per thread, so concurrent invocations don't
+    publish each other's metrics.
+    """
+
+    _REQUEST_DIMENSIONS = [['Route', 'Method'],
+                           ['Route', 'Method', 'StatusCode']]
+    _RESERVED_NAMES = frozenset(['_aws', 'Route', 'Method', 'StatusCode'])
+
+    def __init__(self, namespace, enabled=False):
+        #: The CloudWatch namespace of the metrics.
+        self.namespace = namespace
+        #: Metrics are only recorded when this is True.
+        self.enabled = enabled
+        self._local = threading.local()
+        # Workers started by parallel_map share the buffer of the
+        # invocation that started them.
+        self._lock = threading.Lock()
+
+    def _get_buffer(self):
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None:
+            buffer = self._local.buffer = _MetricsBuffer()
+        return buffer
+
+    def _set_buffer(self, buffer):
+        self._local.buffer = buffer
+
+    def put(self, name, value, unit='None'):
+        """Record a value of a metric.
+
+        The ``unit`` is a CloudWatch unit such as ``Count`` or
+        ``Milliseconds``.  A metric can be recorded more than once per
+        invocation, in which case all of the values are published.
+        """
+        if not self.enabled:
+            return
+        if name in self._RESERVED_NAMES:
+            raise ValueError('The metric name "%s" is reserved.' % name)
+        metrics = self._get_buffer().metrics
+        with self._lock:
+            metric = metrics.get(name)
+            if metric is None:
+                metrics[name] = (unit, [value])
+            else:
+                metric[1].append(value)
+
+    def record_invocation(self, event, response, latency_ms, cold_start):
+        request_context = event.get('requestContext') or {}
+        resource_path = request_context.get('resourcePath')
+        if resource_path is None:
+            # Not an API Gateway request, e.g. a keep warm event.
+            return
+        status_code = 500
+        if isinstance(response, dict):
+            status_code = response.get('statusCode', status_code)
+        self._get_buffer().dimensions = {
+            'Route': resource_path,
+            'Method': request_context.get('httpMethod'),
+            'StatusCode': str(status_code),
+        }
+        self.put('Latency', round(latency_ms, 3), 'Milliseconds')
+        self.put('Requests', 1, 'Count')
+        self.put('ClientErrors', int(400 <= status_code < 500), 'Count')
+        self.put('Errors', int(status_code >= 500), 'Count')
+        self.put('ColdStarts', int(cold_start), 'Count')
+
+    def flush(self):
+        """Return the recorded metrics as an EMF record and reset them.
+
+        ``None`` is returned if no metrics have been recorded.
+        """
+        with self._lock:
+            buffer = self._get_buffer()
+            self._set_buffer(_MetricsBuffer())
+        metrics = buffer.metrics
+        dimensions = buffer.dimensions
+        if not metrics:
+            return None
+        record = {}
+        definitions = []
+        for name, (unit, values) in metrics.items():
+            definitions.append({'Name': name, 'Unit': unit})
+            record[name] = values[0] if len(values) == 1 else values
+        if dimensions is None:
+            dimension_sets = [[]]
+        else:
+            dimension_sets = self._REQUEST_DIMENSIONS
+            record.update(dimensions)
+        record['_aws'] = {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': self.namespace,
+                'Dimensions': dimension_sets,
+                'Metrics': definitions,
+            }],
+        }
+        return record
+
 
 class Chalice(object):
 
     FORMAT_STRING = '%(name)s - %(levelname)s - %(message)s'
 
-    def __init__(self, app_name, debug=False, configure_logs=True, env=None):
+    def __init__(self, app_name, debug=False, configure_logs=True, env=None,
+                 json_codec=None, log_cold_start=False, structured_logs=False,
+                 metrics=False, deadline_margin_ms=None,
+                 executor_max_workers=None):
+        self.cold_start_info = ColdStartInfo(_IMPORT_TIME, time.time())
+        #: True while the first request of a container is being handled.
+        self.is_cold_start = True
+        self.log_cold_start = log_cold_start
         self.app_name = app_name
         self.api = APIGateway()
         self.routes = defaultdict(dict)
-        self.current_request = None
-        self.lambda_context = None
+        # The current request and lambda context are stored per thread so
+        # that a server handling requests in several threads, such as
+        # ``chalice local``, doesn't mix them up.  The last values set in
+        # any thread are used by threads that haven't set their own.
+        self._request_state = threading.local()
+        self._current_request = None
+        self._lambda_context = None
         self._debug = debug
         self.configure_logs = configure_logs
+        # Similar to the ``cors`` route option, ``True`` enables
+        # structured logs with the default StructuredLogConfig.
+        if structured_logs is True:
+            structured_logs = StructuredLogConfig()
+        elif structured_logs is False:
+            structured_logs = None
+        self.structured_logs = structured_logs
         self.log = logging.getLogger(self.app_name)
+        self._log_handler = None
         self.builtin_auth_handlers = []
         self.event_sources = []
         self.pure_lambda_functions = []
+        self.cache = ResponseCache()
+        self.keep_warm_config = None
+        self.clients = ClientRegistry()
+        self.metrics = MetricsRecorder(app_name, enabled=metrics)
+        #: If set, views must return this many milliseconds before
+        #: lambda's timeout or a 504 response is returned instead.
+        self.deadline_margin_ms = deadline_margin_ms
+        self._middleware = []
+        self._dispatch_table = None
+        # The event loop used to run async views.  There's one per thread,
+        # created on first use and reused for every following invocation.
+        self._event_loops = threading.local()
+        #: The size of ``app.executor``.  If this is None the size is
+        #: computed from the function's memory size when the executor
+        #: is first used.
+        self.executor_max_workers = executor_max_workers
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        if json_codec is None:
+            json_codec = _DEFAULT_JSON_CODEC
+        elif isinstance(json_codec, _ANY_STRING):
+            json_codec = get_json_codec(json_codec)
+        self.json_codec = json_codec
         if env is None:
             env = os.environ
         self._initialize(env)
+        self.cold_start_info.init_end = time.time()
 
     def _initialize(self, env):
         if self.configure_logs:
             self._configure_logging()
+        self._lambda_memory_size = env.get('AWS_LAMBDA_FUNCTION_MEMORY_SIZE')
         env['AWS_EXECUTION_ENV'] = '%s aws-chalice/%s' % (
             env.get('AWS_EXECUTION_ENV', 'AWS_Lambda'),
             __version__,
         )
 
+    @property
+    def current_request(self):
+        return getattr(self._request_state, 'current_request',
+                       self._current_request)
+
+    @current_request.setter
+    def current_request(self, value):
+        self._request_state.current_request = value
+        self._current_request = value
+
+    @property
+    def lambda_context(self):
+        return getattr(self._request_state, 'lambda_context',
+                       self._lambda_context)
+
+    @lambda_context.setter
+    def lambda_context(self, value):
+        self._request_state.lambda_context = value
+        self._lambda_context = value
+
     @property
     def debug(self):
         return self._debug
@@ -467,11 +2241,16 @@ class Chalice(object):
     def _configure_logging(self):
         if self._already_configured(self.log):
             return
-        handler = logging.StreamHandler(sys.stdout)
-        # Timestamp is handled by lambda itself so the
-        # default FORMAT_STRING doesn't need to include it.
-        formatter = logging.Formatter(self.FORMAT_STRING)
-        handler.setFormatter(formatter)
+        if self.structured_logs is not None:
+            handler = StructuredLogHandler(
+                self, sys.stdout, self.structured_logs)
+            self._log_handler = handler
+        else:
+            handler = logging.StreamHandler(sys.stdout)
+            # Timestamp is handled by lambda itself so the
+            # default FORMAT_STRING doesn't need to include it.
+            formatter = logging.Formatter(self.FORMAT_STRING)
+            handler.setFormatter(formatter)
         self.log.propagate = False
         self._configure_log_level()
         self.log.addHandler(handler)
@@ -480,6 +2259,8 @@ class Chalice(object):
         if not log.handlers:
             return False
         for handler in log.handlers:
+            if isinstance(handler, StructuredLogHandler):
+                return True
             if isinstance(handler, logging.StreamHandler):
                 if handler.stream == sys.stdout:
                     return True
@@ -492,6 +2273,113 @@ class Chalice(object):
             level = logging.ERROR
         self.log.setLevel(level)
 
+    @property
+    def executor(self):
+        """A thread pool that is reused across invocations.
+
+        The pool is created on first access.  If the process has forked
+        since then, a new pool is created because the worker threads
+        aren't copied into the child process.
+        """
+        executor = self._executor
+        if executor is None or self._executor_pid != os.getpid():
+            with self._executor_lock:
+                if (self._executor is None or
+                        self._executor_pid != os.getpid()):
+                    self._executor = self._create_executor()
+                    self._executor_pid = os.getpid()
+                executor = self._executor
+        return executor
+
+    def _create_executor(self):
+        # concurrent.futures is only imported when it's needed to keep the
+        # import time down.  On python 2 this requires the futures package.
+        from concurrent.futures import ThreadPoolExecutor
+        max_workers = self.executor_max_workers
+        if max_workers is None:
+            max_workers = self._get_default_max_workers()
+        return ThreadPoolExecutor(max_workers=max_workers)
+
+    def _get_default_max_workers(self):
+        memory_size = getattr(self.lambda_context, 'memory_limit_in_mb',
+                              None)
+        if memory_size is None:
+            memory_size = self._lambda_memory_size
+        if memory_size is None:
+            memory_size = _DEFAULT_LAMBDA_MEMORY_SIZE
+        vcpus = -(-int(memory_size) // _MB_PER_VCPU)
+        vcpus = min(max(vcpus, 1), _MAX_LAMBDA_VCPUS)
+        # The same default as ThreadPoolExecutor in python 3.8, the
+        # extra threads help when the work is waiting on I/O.
+        return min(32, vcpus + 4)
+
+    def parallel_map(self, func, items, timeout=None):
+        """Call ``func`` for every item in ``app.executor``.
+
+        The results are returned as a list in the same order as ``items``.
+        The wait is bounded by ``timeout`` and by the time left in the
+        current invocation.  A ``GatewayTimeoutError`` is raised if the
+        invocation's time runs out, and a
+        ``concurrent.futures.TimeoutError`` is raised if ``timeout``
+        runs out first.  Calls that haven't started are cancelled so
+        they don't run after the invocation has returned.
+        """
+        from concurrent.futures import TimeoutError
+        remaining = self._get_remaining_time()
+        deadline_exceeded = False
+        if remaining is not None and (timeout is None or remaining < timeout):
+            timeout = remaining
+            deadline_exceeded = True
+        call = functools.partial(self._call_with_request_context,
+                                 func, self.current_request,
+                                 self.lambda_context,
+                                 self.metrics._get_buffer())
+        futures = [self.executor.submit(call, item) for item in items]
+        end_time = None
+        if timeout is not None:
+            end_time = time.time() + timeout
+        try:
+            results = []
+            for future in futures:
+                if end_time is None:
+                    results.append(future.result())
+                else:
+                    results.append(
+                        future.result(max(end_time - time.time(), 0)))
+            return results
+        except TimeoutError:
+            if deadline_exceeded:
+                raise GatewayTimeoutError(
+                    'The request did not complete before its deadline.')
+            raise
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _get_remaining_time(self):
+        request = self.current_request
+        if request is not None and request.deadline is not None:
+            return request.remaining_time()
+        context = self.lambda_context
+        if context is None or not hasattr(
+                context, 'get_remaining_time_in_millis'):
+            return None
+        remaining_ms = context.get_remaining_time_in_millis()
+        if remaining_ms is None:
+            # chalice local without a lambda_timeout has no time limit,
+            # so only the caller's timeout applies.
+            return None
+        return max(remaining_ms, 0) / 1000.0
+
+    def _call_with_request_context(self, func, request, context,
+                                   metrics_buffer, item):
+        # The request, context and metrics are captured when the work is
+        # submitted so the workers see the invocation that submitted it.
+        self.current_request = request
+        self.lambda_context = context
+        self.metrics._set_buffer(metrics_buffer)
+        return func(item)
+
     def authorizer(self, name=None, **kwargs):
         def _register_authorizer(auth_func):
             auth_name = name
@@ -526,6 +2414,33 @@ class Chalice(object):
             return ScheduledEventHandler(event_func)
         return _register_schedule
 
+    def keep_warm(self, rate=None, concurrency=1):
+        if rate is None:
+            rate = Rate(5, unit=Rate.MINUTES)
+        if concurrency < 1:
+            raise ValueError('The keep warm concurrency must be at least 1, '
+                             'received: %s' % concurrency)
+        self.keep_warm_config = KeepWarmConfig(rate, concurrency)
+
+    def on_sqs_message(self, queue, batch_size=1, name=None):
+        if not 1 <= batch_size <= _MAX_SQS_BATCH_SIZE:
+            raise ValueError('The batch_size for an SQS event source must '
+                             'be between 1 and %s, received: %s'
+                             % (_MAX_SQS_BATCH_SIZE, batch_size))
+
+        def _register_sqs_message(event_func):
+            handler_name = name
+            if handler_name is None:
+                handler_name = event_func.__name__
+            event_source = SQSEventSource(
+                name=handler_name,
+                handler_string='app.%s' % event_func.__name__,
+                queue=queue,
+                batch_size=batch_size)
+            self.event_sources.append(event_source)
+            return SQSEventHandler(event_func, event_source, self.json_codec)
+        return _register_sqs_message
+
     def lambda_function(self, name=None):
         def _register_lambda_function(lambda_func):
             handler_name = name
@@ -538,6 +2453,21 @@ class Chalice(object):
             return wrapper
         return _register_lambda_function
 
+    def middleware(self, event_type='http'):
+        def _register_middleware(func):
+            self.register_middleware(func, event_type)
+            return func
+        return _register_middleware
+
+    def register_middleware(self, func, event_type='http'):
+        if event_type not in _MIDDLEWARE_EVENT_TYPES:
+            raise ValueError(
+                'Unsupported middleware event type "%s", must be one '
+                'of: %s' % (event_type,
+                            ', '.join(sorted(_MIDDLEWARE_EVENT_TYPES))))
+        self._middleware.append(func)
+        self._dispatch_table = None
+
     def route(self, path, **kwargs):
         def _register_view(view_func):
             self._add_route(path, view_func, **kwargs)
@@ -551,13 +2481,26 @@ class Chalice(object):
         api_key_required = kwargs.pop('api_key_required', None)
         content_types = kwargs.pop('content_types', ['application/json'])
         cors = kwargs.pop('cors', False)
+        etag = kwargs.pop('etag', None)
+        cache = kwargs.pop('cache', None)
+        body_schema = kwargs.pop('body_schema', None)
+        query_schema = kwargs.pop('query_schema', None)
         if not isinstance(content_types, list):
             raise ValueError('In view function "%s", the content_types '
                              'value must be a list, not %s: %s'
                              % (name, type(content_types), content_types))
+        if cache is not None and set(methods) - set(['GET', 'HEAD']):
+            raise ValueError('In view function "%s", the cache option can '
+                             'only be used with GET and HEAD methods.'
+                             % name)
         if kwargs:
             raise TypeError('TypeError: route() got unexpected keyword '
                             'arguments: %s' % ', '.join(list(kwargs)))
+        # The schemas are compiled once here rather than on every request.
+        if body_schema is not None:
+            body_schema = JSONSchemaValidator(body_schema, 'body')
+        if query_schema is not None:
+            query_schema = _QueryParamsValidator(query_schema)
         for method in methods:
             if method in self.routes[path]:
                 raise ValueError(
@@ -570,11 +2513,173 @@ class Chalice(object):
                 )
             entry = RouteEntry(view_func, name, path, method,
                                api_key_required, content_types,
-                               cors, authorizer)
+                               cors, authorizer, etag, cache,
+                               body_schema, query_schema)
             self.routes[path][method] = entry
+        # Any previously compiled dispatch table no longer reflects
+        # the registered routes.  It will be rebuilt on the next request.
+        self._dispatch_table = None
+
+    def freeze(self):
+        """Compile the registered routes into a dispatch table.
+
+        The dispatch table maps ``(resource_path, method)`` to a
+        :class:`CompiledRoute`.  This is done automatically on the first
+        request, but it can be called explicitly (e.g. at import time)
+        to move the work out of the first invocation.  The current values
+        of ``api.binary_types`` and ``api.etag`` are captured when the table
+        is built.  The registered middleware is also composed into a
+        single handler for each route at this point.  Registering a new
+        route or middleware invalidates the table.
+
+        """
+        binary_types = MediaTypeMatcher(self.api.binary_types)
+        dispatch_table = {}
+        for path, methods in self.routes.items():
+            for method, route_entry in methods.items():
+                route_cache = None
+                if route_entry.cache is not None:
+                    route_cache = self.cache.get_route_cache(
+                        path, method, route_entry.cache)
+                compiled = CompiledRoute(
+                    route_entry, binary_types, self.api.etag, route_cache)
+                if _is_coroutine_function(route_entry.view_function):
+                    compiled.view_function = self._wrap_async_view(
+                        route_entry.view_function)
+                if self._middleware:
+                    compiled.handler = self._compose_middleware(compiled)
+                dispatch_table[(path, method)] = compiled
+        self._dispatch_table = dispatch_table
+        return dispatch_table
+
+    def _wrap_async_view(self, view_function):
+        @functools.wraps(view_function)
+        def run_async_view(**kwargs):
+            loop = self._get_event_loop()
+            task = loop.create_task(view_function(**kwargs))
+            try:
+                return loop.run_until_complete(task)
+            except BaseException:
+                # The loop is reused by the next request, so a view that's
+                # interrupted (e.g. by the deadline alarm) is cancelled
+                # rather than left to resume during that request.
+                import asyncio
+                task.cancel()
+                loop.run_until_complete(
+                    asyncio.gather(task, return_exceptions=True))
+                raise
+        return run_async_view
+
+    def _get_event_loop(self):
+        loop = getattr(self._event_loops, 'loop', None)
+        if loop is None or loop.is_closed():
+            import asyncio
+            try:
+                # Use the thread's current loop so that anything created
+                # for it at import time, e.g. a client session, works.
+                loop = asyncio.get_event_loop()
+            except RuntimeError:
+                # Only the main thread gets a loop by default.
+                loop = None
+            if loop is None or loop.is_closed():
+                loop = asyncio.new_event_loop()
+                asyncio.set_event_loop(loop)
+            self._event_loops.loop = loop
+        return loop
+
+    def _compose_middleware(self, route):
+        view_function = route.view_function
+        view_args = route.view_args
+
+        def get_view_response(request):
+            function_args = {}
+            if view_args:
+                uri_params = request.uri_params
+                function_args = {name: uri_params[name]
+                                 for name in view_args}
+            return self._get_view_function_response(view_function,
+                                                    function_args)
+
+        if route.cache is not None:
+            get_view_response = _cache_view_response(route.cache,
+                                                     get_view_response)
+        # The first registered middleware is the outermost one, so it's
+        # the first to see the request and the last to see the response.
+        handler = get_view_response
+        for middleware in reversed(self._middleware):
+            handler = _wrap_middleware(middleware, handler)
+        return handler
 
     def __call__(self, event, context):
         # This is what's invoked via lambda.
+        log_handler = self._log_handler
+        if log_handler is not None:
+            log_handler.start_invocation()
+            try:
+                return self._invoke(event, context)
+            finally:
+                log_handler.end_invocation()
+        return self._invoke(event, context)
+
+    def _invoke(self, event, context):
+        if self.metrics.enabled:
+            return self._invoke_with_metrics(event, context)
+        return self._dispatch(event, context)
+
+    def _invoke_with_metrics(self, event, context):
+        cold_start = self.is_cold_start
+        start = time.time()
+        response = None
+        try:
+            response = self._dispatch(event, context)
+            return response
+        finally:
+            self._emit_metrics(event, response,
+                               (time.time() - start) * 1000, cold_start)
+
+    def _emit_metrics(self, event, response, latency_ms, cold_start):
+        # A failure to emit the metrics must not replace the response
+        # (or the exception) of the invocation.
+        try:
+            self.metrics.record_invocation(event, response, latency_ms,
+                                           cold_start)
+            record = self.metrics.flush()
+            if record is not None:
+                sys.stdout.write(json.dumps(record, default=str) + '\n')
+        except Exception:
+            self.log.exception("Unable to emit the invocation metrics.")
+
+    def _dispatch(self, event, context):
+        if self.cold_start_info.first_invocation_start is None:
+            return self._handle_cold_start(event, context)
+        return self._handle_request(event, context)
+
+    def _handle_cold_start(self, event, context):
+        cold_start_info = self.cold_start_info
+        cold_start_info.first_invocation_start = time.time()
+        try:
+            return self._handle_request(event, context)
+        finally:
+            cold_start_info.first_invocation_end = time.time()
+            self.is_cold_start = False
+            if self.log_cold_start:
+                self._emit_cold_start_info(context)
+
+    def _emit_cold_start_info(self, context):
+        record = self.cold_start_info.to_dict()
+        record['type'] = 'chalice.cold_start'
+        record['app_name'] = self.app_name
+        record['aws_request_id'] = getattr(context, 'aws_request_id', None)
+        record['function_name'] = getattr(context, 'function_name', None)
+        record['memory_limit_in_mb'] = getattr(
+            context, 'memory_limit_in_mb', None)
+        # This is written directly to stdout, which lambda sends to
+        # CloudWatch Logs, so it isn't affected by the log level.
+        sys.stdout.write(json.dumps(record, sort_keys=True) + '\n')
+
+    def _handle_request(self, event, context):
+        if _KEEP_WARM_KEY in event:
+            return self._handle_keep_warm(event[_KEEP_WARM_KEY], context)
         # Sometimes the event can be something that's not
         # what we specified in our request_template mapping.
         # When that happens, we want to give a better error message here.
@@ -582,20 +2687,17 @@ class Chalice(object):
         if resource_path is None:
             return error_response(error_code='InternalServerError',
                                   message='Unknown request.',
-                                  http_status_code=500)
+                                  http_status_code=500,
+                                  json_codec=self.json_codec)
         http_method = event['requestContext']['httpMethod']
-        if resource_path not in self.routes:
-            raise ChaliceError("No view function for: %s" % resource_path)
-        if http_method not in self.routes[resource_path]:
-            return error_response(
-                error_code='MethodNotAllowedError',
-                message='Unsupported method: %s' % http_method,
-                http_status_code=405)
-        route_entry = self.routes[resource_path][http_method]
-        view_function = route_entry.view_function
-        function_args = {name: event['pathParameters'][name]
-                         for name in route_entry.view_args}
+        dispatch_table = self._dispatch_table
+        if dispatch_table is None:
+            dispatch_table = self.freeze()
+        route = dispatch_table.get((resource_path, http_method))
+        if route is None:
+            return self._handle_unknown_route(resource_path, http_method)
         self.lambda_context = context
+        self._request_state.raw_body = event.get(_RAW_BODY_KEY, False)
         self.current_request = Request(event['queryStringParameters'],
                                        event['headers'],
                                        event['pathParameters'],
@@ -603,57 +2705,263 @@ class Chalice(object):
                                        event['body'],
                                        event['requestContext'],
                                        event['stageVariables'],
-                                       event.get('isBase64Encoded', False))
-        # We're doing the header validation after creating the request
-        # so can leverage the case insensitive dict that the Request class
-        # uses for headers.
-        if route_entry.content_types:
-            content_type = self.current_request.headers.get(
+                                       event.get('isBase64Encoded', False),
+                                       self.json_codec,
+                                       self._get_deadline(context),
+                                       event.get(
+                                           'multiValueQueryStringParameters'),
+                                       event.get('multiValueHeaders'))
+        if route.content_types is not None:
+            content_type = self.current_request._get_header(
                 'content-type', 'application/json')
-            if not _matches_content_type(content_type,
-                                         route_entry.content_types):
+            if not route.content_types.matches(content_type):
                 return error_response(
                     error_code='UnsupportedMediaType',
                     message='Unsupported media type: %s' % content_type,
                     http_status_code=415,
+                    json_codec=self.json_codec,
                 )
-        response = self._get_view_function_response(view_function,
-                                                    function_args)
-        if self._cors_enabled_for_route(route_entry):
-            self._add_cors_headers(response, route_entry.cors)
+        validation_error = self._validate_request(route, self.current_request)
+        if validation_error is not None:
+            return validation_error
+        if route.cache is not None and route.handler is None:
+            return self._call_cached_view(route, event)
+        return self._call_view(route, event)
+
+    def _validate_request(self, route, request):
+        # Returns an error response if the request doesn't match the
+        # route's schemas, otherwise None.
+        if route.body_schema is None and route.query_schema is None:
+            return None
+        try:
+            if route.query_schema is not None:
+                route.query_schema.validate(dict(request.query_params or {}))
+            if route.body_schema is not None:
+                route.body_schema.validate(self._get_json_body(request))
+        except BadRequestError as e:
+            response = self._error_to_response(e, route.view_function)
+            return self._convert_response(route, response)
+        return None
+
+    def _get_json_body(self, request):
+        try:
+            return request.json_body
+        except ValueError:
+            raise BadRequestError('Invalid JSON body')
+
+    def _get_deadline(self, context):
+        margin_ms = self.deadline_margin_ms
+        if margin_ms is None or context is None:
+            return None
+        remaining_ms = context.get_remaining_time_in_millis()
+        if remaining_ms is None:
+            # chalice local without a lambda_timeout has no time limit.
+            return None
+        return time.time() + (remaining_ms - margin_ms) / 1000.0
+
+    def _handle_keep_warm(self, keep_warm_event, context):
+        # Invoked by the keep warm rule.  This only needs to make sure a
+        # container is initialized, so nothing is dispatched to a view.
+        concurrency = keep_warm_event.get('concurrency', 1)
+        hold_seconds = keep_warm_event.get('hold_seconds')
+        if concurrency > 1:
+            self._fan_out_keep_warm(concurrency - 1, context)
+            hold_seconds = _KEEP_WARM_HOLD_SECONDS
+        if hold_seconds:
+            time.sleep(hold_seconds)
+        return {_KEEP_WARM_KEY: True}
+
+    def _fan_out_keep_warm(self, count, context):
+        function_arn = getattr(context, 'invoked_function_arn', None)
+        if not function_arn:
+            return
+        payload = json.dumps({_KEEP_WARM_KEY: {
+            'concurrency': 1, 'hold_seconds': _KEEP_WARM_HOLD_SECONDS}})
+        try:
+            client = self.clients.get('lambda')
+            for _ in range(count):
+                client.invoke(FunctionName=function_arn,
+                              InvocationType='Event', Payload=payload)
+        except Exception:
+            # Failing to keep other containers warm shouldn't fail
+            # the invocation.
+            self.log.error("Unable to invoke %s to keep it warm.",
+                           function_arn, exc_info=True)
+
+    def _call_view(self, route, event):
+        deadline = self.current_request.deadline
+        if deadline is None:
+            response = self._get_route_response(route, event)
+        else:
+            response = self._get_response_before_deadline(route, event,
+                                                          deadline)
+        return self._convert_response(route, response)
+
+    def _get_response_before_deadline(self, route, event, deadline):
+        # Only the view (and its middleware) run while the alarm is
+        # armed, so it can't fire while a finished response is being
+        # converted.
+        try:
+            if deadline <= time.time():
+                raise GatewayTimeoutError(
+                    'The request did not complete before its deadline.')
+            with _DeadlineAlarm(deadline):
+                return self._get_route_response(route, event)
+        except GatewayTimeoutError as e:
+            # Timeouts raised in the view are already converted to a
+            # response, this handles the alarm firing anywhere else.
+            return self._error_to_response(e, route.view_function)
+
+    def _get_route_response(self, route, event):
+        if route.handler is not None:
+            return self._get_middleware_response(route)
+        function_args = {}
+        if route.view_args:
+            path_params = event['pathParameters']
+            function_args = {name: path_params[name]
+                             for name in route.view_args}
+        return self._get_view_function_response(route.view_function,
+                                                function_args)
+
+    def _call_cached_view(self, route, event):
+        # The response is cached after it's been serialized (and
+        # compressed) so a cache hit skips both the view and the encoding.
+        # The selected content encoding is part of the key so a client
+        # never gets an encoding it didn't ask for.
+        cache_key = route.cache.create_key(self.current_request,
+                                           self._select_content_encoding())
+        if self._request_state.raw_body:
+            # Raw and base64 encoded bodies can't be served from
+            # the same entry.
+            cache_key += (_RAW_BODY_KEY,)
+        cached = route.cache.get(cache_key)
+        if cached is not None:
+            return self._convert_cached_response(route, cached)
+        response = self._call_view(route, event)
+        if response['statusCode'] == 200:
+            route.cache.put(cache_key, response)
+        return response
 
-        response_headers = CaseInsensitiveMapping(response.headers)
+    def _convert_cached_response(self, route, response):
+        headers = response['headers']
+        response_content_type = _get_header(
+            headers, 'content-type', 'application/json')
         if not self._validate_binary_response(
-                self.current_request.headers, response_headers):
-            content_type = response_headers.get('content-type', '')
-            return error_response(
-                error_code='BadRequest',
-                message=('Request did not specify an Accept header with %s, '
-                         'The response has a Content-Type of %s. If a '
-                         'response has a binary Content-Type then the request '
-                         'must specify an Accept header that matches.'
-                         % (content_type, content_type)),
-                http_status_code=400
-            )
-        response = response.to_dict(self.api.binary_types)
+                self.current_request, response_content_type,
+                route.binary_types):
+            return self._binary_response_error(response_content_type)
+        if route.etag:
+            if_none_match = self.current_request._get_header('if-none-match')
+            etag = _get_header(headers, 'etag')
+            if if_none_match is not None and etag is not None and \
+                    _etag_matches(if_none_match, etag):
+                return self._not_modified_response(headers)
         return response
 
-    def _validate_binary_response(self, request_headers, response_headers):
+    def _select_content_encoding(self):
+        compression = self.api.compression
+        if compression is None:
+            return None
+        return compression.select_encoding(
+            self.current_request._get_header('accept-encoding'))
+
+    def _convert_response(self, route, response):
+        # Converts the Response returned from a view into the dict
+        # that's returned to lambda.
+        if route.cors_headers is not None:
+            self._add_cors_headers(response, route.cors_headers)
+        response_content_type = _get_header(
+            response.headers, 'content-type', 'application/json')
+        if not self._validate_binary_response(
+                self.current_request, response_content_type,
+                route.binary_types):
+            return self._binary_response_error(response_content_type)
+        if route.etag and self._is_not_modified(response):
+            return self._not_modified_response(
+                self._get_not_modified_headers(response))
+        compression = self.api.compression
+        accept_encoding = None
+        if compression is not None:
+            accept_encoding = self.current_request._get_header(
+                'accept-encoding')
+        return response.to_dict(route.binary_types, self.json_codec,
+                                compression, accept_encoding,
+                                not self._request_state.raw_body)
+
+    def _binary_response_error(self, response_content_type):
+        return error_response(
+            error_code='BadRequest',
+            message=('Request did not specify an Accept header with %s, '
+                     'The response has a Content-Type of %s. If a '
+                     'response has a binary Content-Type then the request '
+                     'must specify an Accept header that matches.'
+                     % (response_content_type, response_content_type)),
+            http_status_code=400,
+            json_codec=self.json_codec,
+        )
+
+    def _is_not_modified(self, response):
+        # Adds an ETag header to the response if the view didn't provide
+        # one and checks it against the request's If-None-Match header.
+        if response.status_code != 200 or \
+                self.current_request.method not in ('GET', 'HEAD'):
+            return False
+        etag = _get_header(response.headers, 'etag')
+        if etag is None:
+            body = response.body
+            if not isinstance(body, _ANY_STRING):
+                # Serialize the body once so the hash and the response
+                # use the same value.
+                body = self.json_codec.dumps(body)
+                response.body = body
+            etag = _compute_etag(body)
+            # Copied so a headers dict the view shares between responses
+            # doesn't keep this response's ETag.
+            response.headers = dict(response.headers, ETag=etag)
+        if_none_match = self.current_request._get_header('if-none-match')
+        if if_none_match is None:
+            return False
+        return _etag_matches(if_none_match, etag)
+
+    def _get_not_modified_headers(self, response):
+        # The 304 has the ETag and Vary headers the 200 would have had
+        # once it was compressed, so caches see the same validator.
+        compression = self.api.compression
+        if compression is None:
+            return response.headers
+        body = response.body
+        if not isinstance(body, _ANY_STRING):
+            body = self.json_codec.dumps(body)
+        headers, _ = response._get_compression_headers(
+            response.headers, body, compression,
+            self.current_request._get_header('accept-encoding'))
+        return headers
+
+    def _not_modified_response(self, response_headers):
+        headers = {k: v for k, v in response_headers.items()
+                   if k.lower() not in ('content-type', 'content-encoding')}
+        return {'headers': headers, 'statusCode': 304, 'body': ''}
+
+    def _handle_unknown_route(self, resource_path, http_method):
+        if resource_path not in self.routes:
+            raise ChaliceError("No view function for: %s" % resource_path)
+        return error_response(
+            error_code='MethodNotAllowedError',
+            message='Unsupported method: %s' % http_method,
+            http_status_code=405,
+            json_codec=self.json_codec)
+
+    def _validate_binary_response(self, request, response_content_type,
+                                  binary_types):
         # Validates that a response is valid given the request. If the response
         # content-type specifies a binary type, there must be an accept header
         # that is a binary type as well.
-        request_accept_header = request_headers.get('accept')
-        response_content_type = response_headers.get(
-            'content-type', 'application/json')
-        response_is_binary = _matches_content_type(response_content_type,
-                                                   self.api.binary_types)
-        expects_binary_response = False
-        if request_accept_header is not None:
-            expects_binary_response = _matches_content_type(
-                request_accept_header, self.api.binary_types)
-        if response_is_binary and not expects_binary_response:
+        if not binary_types.matches(response_content_type):
+            return True
+        request_accept_header = request._get_header('accept')
+        if request_accept_header is None:
             return False
-        return True
+        return binary_types.accepts(request_accept_header)
 
     def _get_view_function_response(self, view_function, function_args):
         try:
@@ -661,13 +2969,30 @@ class Chalice(object):
             if not isinstance(response, Response):
                 response = Response(body=response)
             self._validate_response(response)
-        except ChaliceViewError as e:
+        except Exception as e:
+            response = self._error_to_response(e, view_function)
+        return response
+
+    def _get_middleware_response(self, route):
+        # Errors raised by the view itself have already been converted
+        # to a Response, so this only handles errors from the middleware.
+        try:
+            response = route.handler(self.current_request)
+            self._validate_response(response)
+        except Exception as e:
+            response = self._error_to_response(e, route.view_function)
+        return response
+
+    def _error_to_response(self, e, view_function):
+        # This must be called from within an except block so the
+        # stack trace of the current exception is available.
+        if isinstance(e, ChaliceViewError):
             # Any chalice view error should propagate.  These
             # get mapped to various HTTP status codes in API Gateway.
             response = Response(body={'Code': e.__class__.__name__,
                                       'Message': str(e)},
                                 status_code=e.STATUS_CODE)
-        except Exception as e:
+        else:
             headers = {}
             if self.debug:
                 # If the user has turned on debug mode,
@@ -690,15 +3015,22 @@ class Chalice(object):
                 raise ChaliceError("Bad value for header '%s': %r" %
                                    (header, value))
 
-    def _cors_enabled_for_route(self, route_entry):
-        return route_entry.cors is not None
-
-    def _add_cors_headers(self, response, cors):
-        for name, value in cors.get_access_control_headers().items():
+    def _add_cors_headers(self, response, cors_headers):
+        for name, value in cors_headers.items():
             if name not in response.headers:
                 response.headers[name] = value
 
 
+class KeepWarmConfig(object):
+    def __init__(self, rate, concurrency=1):
+        self.rate = rate
+        self.concurrency = concurrency
+
+    def to_event(self):
+        """Return the event the keep warm rule sends to the function."""
+        return {_KEEP_WARM_KEY: {'concurrency': self.concurrency}}
+
+
 class BuiltinAuthConfig(object):
     def __init__(self, name, handler_string, ttl_seconds=None,
                  execution_role=None):
@@ -714,8 +3046,29 @@ class ChaliceAuthorizer(object):
         self.name = name
         self.func = func
         self.config = config
+        ttl_seconds = config.ttl_seconds
+        if ttl_seconds is None:
+            # This is the default TTL API Gateway uses for authorizers.
+            ttl_seconds = _DEFAULT_AUTHORIZER_TTL
+        #: Results of the authorizer keyed on the token, or None if
+        #: ttl_seconds is 0, which disables caching.
+        self.cache = None
+        if ttl_seconds > 0:
+            self.cache = AuthorizerCache(ttl_seconds)
 
     def __call__(self, event, content):
+        cache = self.cache
+        if cache is None:
+            return self._authorize(event)
+        token = event.get('authorizationToken')
+        result = cache.get(token)
+        if result is None:
+            result = self._authorize(event)
+            if result is not None:
+                cache.put(token, result)
+        return result
+
+    def _authorize(self, event):
         auth_request = self._transform_event(event)
         result = self.func(auth_request)
         if isinstance(result, AuthResponse):
@@ -834,6 +3187,13 @@ class CloudWatchEventSource(EventSource):
         self.schedule_expression = schedule_expression
 
 
+class SQSEventSource(EventSource):
+    def __init__(self, name, handler_string, queue, batch_size=1):
+        super(SQSEventSource, self).__init__(name, handler_string)
+        self.queue = queue
+        self.batch_size = batch_size
+
+
 class ScheduleExpression(object):
     def to_string(self):
         raise NotImplementedError("to_string")
@@ -906,6 +3266,112 @@ class CloudWatchEvent(object):
         return self._event_dict
 
 
+class SQSEventHandler(object):
+    def __init__(self, func, event_source, json_codec=None):
+        self.func = func
+        self.event_source = event_source
+        self._json_codec = json_codec
+
+    def __call__(self, event, context):
+        event_obj = SQSEvent(event, context, self._json_codec)
+        self.func(event_obj)
+        # The event source mapping is created with ReportBatchItemFailures
+        # so only the messages listed here are retried.  An empty list
+        # means the whole batch was processed.
+        return {
+            'batchItemFailures': [
+                {'itemIdentifier': message_id}
+                for message_id in event_obj.failed_message_ids
+            ]
+        }
+
+
+class SQSEvent(object):
+    """A batch of messages received from an SQS queue.
+
+    Iterating over the event yields an :class:`SQSRecord` for each
+    message.  The records are created as they're iterated over, and the
+    message bodies are only parsed when ``json_body`` is accessed.
+    """
+
+    def __init__(self, event_dict, context=None, json_codec=None):
+        self.context = context
+        self._event_dict = event_dict
+        self._json_codec = json_codec
+        self._failed_message_ids = []
+
+    def __iter__(self):
+        json_codec = self._json_codec
+        for record in self._event_dict['Records']:
+            yield SQSRecord(record, json_codec)
+
+    def __len__(self):
+        return len(self._event_dict['Records'])
+
+    def report_failure(self, record):
+        """Mark a message as failed so it's delivered again.
+
+        Messages that aren't reported as failed are deleted from the
+        queue once the handler returns.
+        """
+        self._failed_message_ids.append(record.message_id)
+
+    @property
+    def failed_message_ids(self):
+        return list(self._failed_message_ids)
+
+    def to_dict(self):
+        return self._event_dict
+
+
+class SQSRecord(object):
+    __slots__ = ('_record', '_json_codec', '_json_body')
+
+    def __init__(self, record, json_codec=None):
+        self._record = record
+        if json_codec is None:
+            json_codec = _DEFAULT_JSON_CODEC
+        self._json_codec = json_codec
+        self._json_body = None
+
+    @property
+    def body(self):
+        return self._record['body']
+
+    @property
+    def json_body(self):
+        if self._json_body is None:
+            self._json_body = self._json_codec.loads(self.body)
+        return self._json_body
+
+    @property
+    def message_id(self):
+        return self._record['messageId']
+
+    @property
+    def receipt_handle(self):
+        return self._record['receiptHandle']
+
+    @property
+    def attributes(self):
+        return self._record.get('attributes', {})
+
+    @property
+    def message_attributes(self):
+        return self._record.get('messageAttributes', {})
+
+    @property
+    def event_source_arn(self):
+        return self._record['eventSourceARN']
+
+    @property
+    def queue(self):
+        return self.event_source_arn.rsplit(':', 1)[-1]
+
+    def to_dict(self):
+        return self._record
+
+
 class LambdaFunction(object):
     def __init__(self, func, name, handler_string):
         self.func = func
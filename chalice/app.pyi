@@ -1,7 +1,13 @@
-from typing import Dict, List, Any, Callable, Union, Optional
+import logging
+
+from typing import (
+    Dict, List, Any, Callable, Union, Optional, Tuple, FrozenSet, Iterator,
+    Iterable, Mapping,
+)
 from chalice.local import LambdaContext
 
 __version__ = ... # type: str
+_RAW_BODY_KEY = ... # type: str
 
 class ChaliceError(Exception): ...
 class ChaliceViewError(ChaliceError):
@@ -14,6 +20,7 @@ class NotFoundError(ChaliceViewError): ...
 class ConflictError(ChaliceViewError): ...
 class UnprocessableEntityError(ChaliceViewError): ...
 class TooManyRequestsError(ChaliceViewError): ...
+class GatewayTimeoutError(ChaliceViewError): ...
 
 
 ALL_ERRORS = ... # type: List[ChaliceViewError]
@@ -33,6 +40,21 @@ class IAMAuthorizer(Authorizer): ...
 class CustomAuthorizer(Authorizer): ...
 
 
+class JSONCodec(object):
+    name = ... # type: str
+
+    def dumps(self, obj: Any) -> str: ...
+    def loads(self, data: Union[str, bytes]) -> Any: ...
+
+
+class OrjsonCodec(JSONCodec): ...
+class RapidJSONCodec(JSONCodec): ...
+class UJSONCodec(JSONCodec): ...
+
+
+def get_json_codec(name: str) -> JSONCodec: ...
+
+
 class CORSConfig:
     allow_origin = ... # type: str
     allow_headers = ... # type: str
@@ -41,15 +63,78 @@ class CORSConfig:
     def __eq__(self, other: object) -> bool: ...
 
 
+class CacheConfig(object):
+    ttl = ... # type: float
+    max_entries = ... # type: int
+    vary_on = ... # type: Tuple[str, ...]
+    query_params = ... # type: Optional[Tuple[str, ...]]
+
+    def __init__(self, ttl: float=30, max_entries: int=1000,
+                 vary_on: Optional[List[str]]=None,
+                 query_params: Optional[List[str]]=None) -> None: ...
+
+
+_CacheKey = Tuple[Any, ...]
+
+
+class RouteCache(object):
+    config = ... # type: CacheConfig
+    hits = ... # type: int
+    misses = ... # type: int
+    evictions = ... # type: int
+
+    def __init__(self, config: CacheConfig,
+                 clock: Callable[[], float]=...) -> None: ...
+    def create_key(self, request: Request,
+                   content_encoding: Optional[str]=None) -> _CacheKey: ...
+    def get(self, key: _CacheKey) -> Optional[Dict[str, Any]]: ...
+    def put(self, key: _CacheKey, response: Dict[str, Any]) -> None: ...
+    def invalidate(self, uri_params: Optional[Dict[str, str]]=None) -> None: ...
+    def stats(self) -> Dict[str, int]: ...
+
+
+class ResponseCache(object):
+    hits = ... # type: int
+    misses = ... # type: int
+
+    def __init__(self, clock: Callable[[], float]=...) -> None: ...
+    def get_route_cache(self, resource_path: str, method: str,
+                        config: CacheConfig) -> RouteCache: ...
+    def invalidate(self, resource_path: Optional[str]=None,
+                   uri_params: Optional[Dict[str, str]]=None) -> None: ...
+    def stats(self) -> Dict[str, Dict[str, int]]: ...
+
+
+class ClientRegistry(object):
+    max_pool_connections = ... # type: int
+    tcp_keepalive = ... # type: bool
+
+    def __init__(self, session: Any=None, max_pool_connections: int=10,
+                 tcp_keepalive: bool=True) -> None: ...
+    def get(self, service_name: str, region: Optional[str]=None) -> Any: ...
+    def __getattr__(self, name: str) -> Any: ...
+
+
+class MultiDict(Mapping[str, str]):
+    def __init__(self, mapping: Optional[Dict[str, str]]=None,
+                 multi_mapping: Optional[Dict[str, List[str]]]=None,
+                 case_sensitive: bool=True) -> None: ...
+    def getlist(self, key: str) -> List[str]: ...
+    def __getitem__(self, key: str) -> str: ...
+    def __iter__(self) -> Iterator[str]: ...
+    def __len__(self) -> int: ...
+
+
 class Request:
-    query_params = ... # type: Dict[str, str]
-    headers = ... # type: Dict[str, str]
+    query_params = ... # type: Optional[MultiDict]
+    headers = ... # type: MultiDict
     uri_params = ... # type: Dict[str, str]
     method = ... # type: str
     body = ... # type: Any
     base64_body = ... # type: str
     context = ... # type: Dict[str, str]
     stage_vars = ... # type: Dict[str, str]
+    deadline = ... # type: Optional[float]
 
     def __init__(
         self,
@@ -60,7 +145,12 @@ class Request:
         body: Any,
         base64_body: str,
         context: Dict[str, str],
-        stage_vars: Dict[str, str]) -> None: ...
+        stage_vars: Dict[str, str],
+        json_codec: Optional[JSONCodec]=None,
+        deadline: Optional[float]=None,
+        multi_value_query_params: Optional[Dict[str, List[str]]]=None,
+        multi_value_headers: Optional[Dict[str, List[str]]]=None) -> None: ...
+    def remaining_time(self) -> Optional[float]: ...
     def to_dict(self) -> Dict[Any, Any]: ...
 
 
@@ -74,7 +164,12 @@ class Response:
                  headers: Dict[str, str],
                  status_code: int) -> None: ...
 
-    def to_dict(self) -> Dict[str, Any]: ...
+    def to_dict(self,
+                binary_types: Union[List[str], MediaTypeMatcher, None]=None,
+                json_codec: Optional[JSONCodec]=None,
+                compression: Optional[CompressionConfig]=None,
+                accept_encoding: Optional[str]=None,
+                base64_encode: bool=True) -> Dict[str, Any]: ...
 
 
 class RouteEntry(object):
@@ -89,21 +184,131 @@ class RouteEntry(object):
     content_types = ... # type: List[str]
     view_args = ... # type: List[str]
     cors = ... # type: CORSConfig
+    etag = ... # type: Optional[bool]
+    cache = ... # type: Optional[CacheConfig]
+    body_schema = ... # type: Optional[JSONSchemaValidator]
+    query_schema = ... # type: Optional[JSONSchemaValidator]
 
     def __init__(self, view_function: Callable[..., Any],
                  view_name: str, path: str, methods: List[str],
                  authorizer_name: str=None,
                  api_key_required: bool=None,
                  content_types: List[str]=None,
-                 cors: Union[bool, CORSConfig]=False) -> None: ...
+                 cors: Union[bool, CORSConfig]=False,
+                 etag: Optional[bool]=None,
+                 cache: Optional[CacheConfig]=None,
+                 body_schema: Optional[JSONSchemaValidator]=None,
+                 query_schema: Optional[JSONSchemaValidator]=None
+                 ) -> None: ...
 
     def _parse_view_args(self) -> List[str]: ...
 
     def __eq__(self, other: object) -> bool: ...
 
 
+class JSONSchemaValidator(object):
+    schema = ... # type: Dict[str, Any]
+    name = ... # type: str
+
+    def __init__(self, schema: Dict[str, Any], name: str='body') -> None: ...
+    def validate(self, value: Any) -> None: ...
+
+
+class MediaTypeMatcher(object):
+    media_ranges = ... # type: Tuple[str, ...]
+
+    def __init__(self, media_ranges: Iterable[str]) -> None: ...
+    def __contains__(self, media_type: object) -> bool: ...
+    def __iter__(self) -> Iterator[str]: ...
+    def __len__(self) -> int: ...
+    def matches(self, media_type: str) -> bool: ...
+    def accepts(self, accept: str) -> bool: ...
+    def best_match(self, accept: str) -> Optional[str]: ...
+
+
+class CompiledRoute(object):
+    route_entry = ... # type: RouteEntry
+    view_function = ... # type: Callable[..., Any]
+    view_args = ... # type: Tuple[str, ...]
+    content_types = ... # type: Optional[MediaTypeMatcher]
+    cors_headers = ... # type: Optional[Dict[str, str]]
+    binary_types = ... # type: MediaTypeMatcher
+    etag = ... # type: bool
+    cache = ... # type: Optional[RouteCache]
+    handler = ... # type: Optional[Callable[[Request], Response]]
+    body_schema = ... # type: Optional[JSONSchemaValidator]
+    query_schema = ... # type: Optional[JSONSchemaValidator]
+
+    def __init__(self, route_entry: RouteEntry,
+                 binary_types: MediaTypeMatcher,
+                 etag: bool=False,
+                 cache: Optional[RouteCache]=None,
+                 handler: Optional[Callable[[Request], Response]]=None
+                 ) -> None: ...
+
+
+class CompressionConfig(object):
+    minimum_size = ... # type: int
+    level = ... # type: int
+    algorithms = ... # type: List[str]
+    content_types = ... # type: FrozenSet[str]
+
+    def __init__(self, minimum_size: int=1024,
+                 algorithms: Optional[List[str]]=None,
+                 content_types: Optional[List[str]]=None,
+                 level: int=6) -> None: ...
+    def is_compressible(self, content_type: str) -> bool: ...
+    def select_encoding(self, accept_encoding: Optional[str]) -> Optional[str]: ...
+    def compress(self, body: bytes, encoding: str) -> bytes: ...
+
+
+class ColdStartInfo(object):
+    import_time = ... # type: float
+    init_start = ... # type: float
+    init_end = ... # type: Optional[float]
+    first_invocation_start = ... # type: Optional[float]
+    first_invocation_end = ... # type: Optional[float]
+
+    def __init__(self, import_time: float, init_start: float) -> None: ...
+    def to_dict(self) -> Dict[str, Optional[float]]: ...
+
+
 class APIGateway(object):
     binary_types = ... # type: List[str]
+    compression = ... # type: Optional[CompressionConfig]
+    etag = ... # type: bool
+
+
+class StructuredLogConfig(object):
+    capacity = ... # type: int
+    debug_sample_rate = ... # type: float
+
+    def __init__(self, capacity: int=100,
+                 debug_sample_rate: float=1.0) -> None: ...
+
+
+class StructuredLogHandler(logging.Handler):
+    config = ... # type: StructuredLogConfig
+
+    def __init__(self, app: Chalice, stream: Any,
+                 config: Optional[StructuredLogConfig]=None,
+                 rng: Callable[[], float]=...) -> None: ...
+    def start_invocation(self) -> None: ...
+    def end_invocation(self) -> None: ...
+    def emit(self, record: logging.LogRecord) -> None: ...
+    def flush(self) -> None: ...
+
+
+class MetricsRecorder(object):
+    namespace = ... # type: str
+    enabled = ... # type: bool
+
+    def __init__(self, namespace: str, enabled: bool=False) -> None: ...
+    def put(self, name: str, value: Union[int, float],
+            unit: str='None') -> None: ...
+    def record_invocation(self, event: Dict[str, Any], response: Any,
+                          latency_ms: float, cold_start: bool) -> None: ...
+    def flush(self) -> Optional[Dict[str, Any]]: ...
 
 
 class Chalice(object):
@@ -115,13 +320,44 @@ class Chalice(object):
     debug = ... # type: bool
     authorizers = ... # type: Dict[str, Dict[str, Any]]
     builtin_auth_handlers = ... # type: List[BuiltinAuthConfig]
-    event_sources = ... # type: List[CloudWatchEventSource]
+    event_sources = ... # type: List[EventSource]
     pure_lambda_functions = ... # type: List[LambdaFunction]
-
-    def __init__(self, app_name: str) -> None: ...
-
+    json_codec = ... # type: JSONCodec
+    cache = ... # type: ResponseCache
+    cold_start_info = ... # type: ColdStartInfo
+    is_cold_start = ... # type: bool
+    log_cold_start = ... # type: bool
+    keep_warm_config = ... # type: Optional[KeepWarmConfig]
+    structured_logs = ... # type: Optional[StructuredLogConfig]
+    metrics = ... # type: MetricsRecorder
+    deadline_margin_ms = ... # type: Optional[int]
+    clients = ... # type: ClientRegistry
+    executor_max_workers = ... # type: Optional[int]
+    executor = ... # type: Any
+
+    def __init__(self, app_name: str, debug: bool=False,
+                 configure_logs: bool=True,
+                 env: Optional[Dict[str, str]]=None,
+                 json_codec: Union[str, JSONCodec, None]=None,
+                 log_cold_start: bool=False,
+                 structured_logs: Union[bool, StructuredLogConfig]=False,
+                 metrics: bool=False,
+                 deadline_margin_ms: Optional[int]=None,
+                 executor_max_workers: Optional[int]=None) -> None: ...
+
+    def middleware(self, event_type: str='http') -> Callable[..., Any]: ...
+    def register_middleware(self, func: Callable[..., Any],
+                            event_type: str='http') -> None: ...
     def route(self, path: str, **kwargs: Any) -> Callable[..., Any]: ...
+    def keep_warm(self,
+                  rate: Union[str, ScheduleExpression, None]=None,
+                  concurrency: int=1) -> None: ...
+    def on_sqs_message(self, queue: str, batch_size: int=1,
+                       name: Optional[str]=None) -> Callable[..., Any]: ...
     def _add_route(self, path: str, view_func: Callable[..., Any], **kwargs: Any) -> None: ...
+    def freeze(self) -> Dict[Tuple[str, str], CompiledRoute]: ...
+    def parallel_map(self, func: Callable[[Any], Any], items: Iterable[Any],
+                     timeout: Optional[float]=None) -> List[Any]: ...
     def __call__(self, event: Any, context: Any) -> Any: ...
     def _get_view_function_response(self,
                                     view_function: Callable[..., Any],
@@ -132,11 +368,39 @@ class ChaliceAuthorizer(object):
     name = ... # type: str
     func = ... # type: _BUILTIN_AUTH_FUNC
     config = ... # type: BuiltinAuthConfig
+    cache = ... # type: Optional[AuthorizerCache]
+
+    def __call__(self, event: Dict[str, Any], content: Any) -> Any: ...
+
+
+class AuthorizerCache(object):
+    ttl = ... # type: int
+    max_entries = ... # type: int
+    hits = ... # type: int
+    misses = ... # type: int
+    evictions = ... # type: int
+
+    def __init__(self, ttl_seconds: int=300, max_entries: int=1000,
+                 clock: Callable[[], float]=...) -> None: ...
+    def get(self, token: str) -> Any: ...
+    def put(self, token: str, result: Any) -> None: ...
+    def invalidate(self, token: Optional[str]=None) -> None: ...
+    def stats(self) -> Dict[str, int]: ...
+
+
+class KeepWarmConfig(object):
+    rate = ... # type: Union[str, ScheduleExpression]
+    concurrency = ... # type: int
+
+    def __init__(self, rate: Union[str, ScheduleExpression],
+                 concurrency: int=1) -> None: ...
+    def to_event(self) -> Dict[str, Any]: ...
 
 
 class BuiltinAuthConfig(object):
     name = ... # type: str
     handler_string = ... # type: str
+    ttl_seconds = ... # type: Optional[int]
 
 
 class AuthRequest(object):
@@ -166,6 +430,11 @@ class CloudWatchEventSource(EventSource):
     schedule_expression = ...  # type: Union[str, ScheduleExpression]
 
 
+class SQSEventSource(EventSource):
+    queue = ... # type: str
+    batch_size = ... # type: int
+
+
 class ScheduleExpression(object):
     def to_string(self) -> str: ...
 
@@ -192,3 +461,41 @@ class LambdaFunction(object):
     name = ... # type: str
     handler_string = ... # type: str
     func = ... # type: Callable[..., Any]
+
+
+class SQSEventHandler(object):
+    func = ... # type: Callable[..., Any]
+    event_source = ... # type: SQSEventSource
+
+    def __init__(self, func: Callable[..., Any],
+                 event_source: SQSEventSource,
+                 json_codec: Optional[JSONCodec]=None) -> None: ...
+    def __call__(self, event: Dict[str, Any],
+                 context: Any) -> Dict[str, Any]: ...
+
+
+class SQSRecord(object):
+    body = ... # type: str
+    json_body = ... # type: Any
+    message_id = ... # type: str
+    receipt_handle = ... # type: str
+    attributes = ... # type: Dict[str, str]
+    message_attributes = ... # type: Dict[str, Any]
+    event_source_arn = ... # type: str
+    queue = ... # type: str
+
+    def __init__(self, record: Dict[str, Any],
+                 json_codec: Optional[JSONCodec]=None) -> None: ...
+    def to_dict(self) -> Dict[str, Any]: ...
+
+
+class SQSEvent(object):
+    context = ... # type: Any
+    failed_message_ids = ... # type: List[str]
+
+    def __init__(self, event_dict: Dict[str, Any], context: Any=None,
+                 json_codec: Optional[JSONCodec]=None) -> None: ...
+    def __iter__(self) -> Iterator[SQSRecord]: ...
+    def __len__(self) -> int: ...
+    def report_failure(self, record: SQSRecord) -> None: ...
+    def to_dict(self) -> Dict[str, Any]: ...
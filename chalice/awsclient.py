@@ -163,6 +163,10 @@ class TypedAWSClient(object):
         message = error.response['Error'].get('Message', '')
         if re.search('role.*cannot be assumed', message):
             return True
+        # A newly created role may not have its SQS permissions yet
+        # when an event source mapping is created for it.
+        if re.search('role does not have permissions', message):
+            return True
         return False
 
     def _get_lambda_code_deployment_error(self, error, context):
@@ -622,11 +626,15 @@ class TypedAWSClient(object):
         events.remove_targets(Rule=rule_name, Ids=['1'])
         events.delete_rule(Name=rule_name)
 
-    def connect_rule_to_lambda(self, rule_name, function_arn):
-        # type: (str, str) -> None
+    def connect_rule_to_lambda(self, rule_name, function_arn, input_json=None):
+        # type: (str, str, Optional[str]) -> None
         events = self._client('events')
-        events.put_targets(Rule=rule_name,
-                           Targets=[{'Id': '1', 'Arn': function_arn}])
+        target = {'Id': '1', 'Arn': function_arn}
+        if input_json is not None:
+            # The rule sends this constant JSON document as the event
+            # instead of the CloudWatch event.
+            target['Input'] = input_json
+        events.put_targets(Rule=rule_name, Targets=[target])
 
     def add_permission_for_scheduled_event(self, rule_arn,
                                            function_arn):
@@ -646,6 +654,55 @@ class TypedAWSClient(object):
             SourceArn=rule_arn,
         )
 
+    def get_sqs_queue_arn(self, queue_name):
+        # type: (str) -> str
+        sqs = self._client('sqs')
+        try:
+            queue_url = sqs.get_queue_url(QueueName=queue_name)['QueueUrl']
+        except sqs.exceptions.QueueDoesNotExist:
+            raise ResourceDoesNotExistError(queue_name)
+        attributes = sqs.get_queue_attributes(
+            QueueUrl=queue_url, AttributeNames=['QueueArn'])['Attributes']
+        return attributes['QueueArn']
+
+    def create_sqs_event_source(self, queue_arn, function_name, batch_size):
+        # type: (str, str, int) -> str
+        lambda_client = self._client('lambda')
+        existing = lambda_client.list_event_source_mappings(
+            EventSourceArn=queue_arn,
+            FunctionName=function_name)['EventSourceMappings']
+        kwargs = {
+            'FunctionName': function_name,
+            'BatchSize': batch_size,
+            # This lets the handler report which messages in a batch
+            # failed so the rest of the batch isn't retried.
+            'FunctionResponseTypes': ['ReportBatchItemFailures'],
+        }  # type: Dict[str, Any]
+        if existing:
+            uuid = existing[0]['UUID']
+            lambda_client.update_event_source_mapping(UUID=uuid, **kwargs)
+            return uuid
+        kwargs['EventSourceArn'] = queue_arn
+        response = self._call_client_method_with_retries(
+            lambda_client.create_event_source_mapping, kwargs)
+        return response['UUID']
+
+    def remove_sqs_event_sources(self, function_name):
+        # type: (str) -> None
+        # Deleting a lambda function doesn't delete its event source
+        # mappings so they need to be removed explicitly.
+        lambda_client = self._client('lambda')
+        paginator = lambda_client.get_paginator('list_event_source_mappings')
+        for page in paginator.paginate(FunctionName=function_name):
+            for mapping in page['EventSourceMappings']:
+                if mapping['EventSourceArn'].split(':')[2] != 'sqs':
+                    continue
+                try:
+                    lambda_client.delete_event_source_mapping(
+                        UUID=mapping['UUID'])
+                except lambda_client.exceptions.ResourceNotFoundException:
+                    pass
+
     def _random_id(self):
         # type: () -> str
         return str(uuid.uuid4())
@@ -80,15 +80,35 @@ def cli(ctx, project_dir, debug=False):
 @click.option('--port', default=8000, type=click.INT)
 @click.option('--stage', default=DEFAULT_STAGE_NAME,
               help='Name of the Chalice stage for the local server to use.')
+@click.option('--workers', type=click.IntRange(min=1),
+              help=('Handle requests with a fixed pool of this many '
+                    'threads instead of a new thread per connection.'))
+@click.option('--backlog', type=click.IntRange(min=1),
+              help=('The number of connections that can wait for a worker '
+                    'before new connections are sent a 503 response.  '
+                    'Only used with --workers.'))
+@click.option('--keep-alive-timeout', type=float,
+              help=('The number of seconds an idle keep-alive connection '
+                    'is held open.  Only used with --workers.'))
+@click.option('--processes', type=click.IntRange(min=1),
+              help=('Serve requests from this many forked processes '
+                    'instead of a single process.  Crashed processes '
+                    'are restarted.'))
 @click.pass_context
-def local(ctx, host='127.0.0.1', port=8000, stage=DEFAULT_STAGE_NAME):
-    # type: (click.Context, str, int, str) -> None
+def local(ctx, host='127.0.0.1', port=8000, stage=DEFAULT_STAGE_NAME,
+          workers=None, backlog=None, keep_alive_timeout=None,
+          processes=None):
+    # type: (click.Context, str, int, str, Optional[int], Optional[int], Optional[float], Optional[int]) -> None  # noqa
     factory = ctx.obj['factory']  # type: CLIFactory
-    run_local_server(factory, host, port, stage, os.environ)
+    run_local_server(factory, host, port, stage, os.environ,
+                     workers=workers, backlog=backlog,
+                     keep_alive_timeout=keep_alive_timeout,
+                     processes=processes)
 
 
-def run_local_server(factory, host, port, stage, env):
-    # type: (CLIFactory, str, int, str, MutableMapping) -> None
+def run_local_server(factory, host, port, stage, env, workers=None,
+                     backlog=None, keep_alive_timeout=None, processes=None):
+    # type: (CLIFactory, str, int, str, MutableMapping, Optional[int], Optional[int], Optional[float], Optional[int]) -> None  # noqa
     config = factory.create_config_obj(
         chalice_stage_name=stage
     )
@@ -107,7 +127,11 @@ def run_local_server(factory, host, port, stage, env):
     # The app-specific logger (app.log) will still continue
     # to work.
     logging.basicConfig(stream=sys.stdout)
-    server = factory.create_local_server(app_obj, config, host, port)
+    # The server is created after the app is loaded so that with
+    # multiple processes, each forked worker shares the imported app.
+    server = factory.create_local_server(
+        app_obj, config, host, port, workers=workers, backlog=backlog,
+        keep_alive_timeout=keep_alive_timeout, processes=processes)
     server.serve_forever()
 
 
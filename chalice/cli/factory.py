@@ -192,6 +192,10 @@ class CLIFactory(object):
         with open(config_file) as f:
             return json.loads(f.read())
 
-    def create_local_server(self, app_obj, config, host, port):
-        # type: (Chalice, Config, str, int) -> local.LocalDevServer
-        return local.create_local_server(app_obj, config, host, port)
+    def create_local_server(self, app_obj, config, host, port, workers=None,
+                            backlog=None, keep_alive_timeout=None,
+                            processes=None):
+        # type: (Chalice, Config, str, int, Optional[int], Optional[int], Optional[float], Optional[int]) -> local.LocalDevServer  # noqa
+        return local.create_local_server(
+            app_obj, config, host, port, workers=workers, backlog=backlog,
+            keep_alive_timeout=keep_alive_timeout, processes=processes)
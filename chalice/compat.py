@@ -97,6 +97,7 @@ else:
 
 if six.PY3:
     from urllib.parse import urlparse, parse_qs
+    import queue
     lambda_abi = 'cp36m'
 
     def is_broken_pipe_error(error):
@@ -104,6 +105,7 @@ if six.PY3:
         return isinstance(error, BrokenPipeError)  # noqa
 else:
     from urlparse import urlparse, parse_qs
+    import Queue as queue
     lambda_abi = 'cp27mu'
 
     def is_broken_pipe_error(error):
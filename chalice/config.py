@@ -296,10 +296,18 @@ class Config(object):
 
 
 class DeployedResources(object):
-    def __init__(self, backend, api_handler_arn,
-                 api_handler_name, rest_api_id, api_gateway_stage,
-                 region, chalice_version, lambda_functions):
-        # type: (str, str, str, str, str, str, str, StrMap) -> None
+    def __init__(self,
+                 backend,              # type: str
+                 api_handler_arn,      # type: str
+                 api_handler_name,     # type: str
+                 rest_api_id,          # type: str
+                 api_gateway_stage,    # type: str
+                 region,               # type: str
+                 chalice_version,      # type: str
+                 lambda_functions,     # type: StrMap
+                 keep_warm_rule=None,  # type: Optional[str]
+                 ):
+        # type: (...) -> None
         self.backend = backend
         self.api_handler_arn = api_handler_arn
         self.api_handler_name = api_handler_name
@@ -308,6 +316,8 @@ class DeployedResources(object):
         self.region = region
         self.chalice_version = chalice_version
         self.lambda_functions = lambda_functions
+        # The name of the CloudWatch rule that keeps the API handler warm.
+        self.keep_warm_rule = keep_warm_rule
         self._fixup_lambda_functions_if_needed()
 
     def _fixup_lambda_functions_if_needed(self):
@@ -343,4 +353,5 @@ class DeployedResources(object):
             # the 'lambda_functions' key, so we have
             # to default this if it's missing.
             data.get('lambda_functions', {}),
+            data.get('keep_warm_rule'),
         )
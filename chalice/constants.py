@@ -80,6 +80,15 @@ CLOUDWATCH_LOGS = {
 }
 
 
+# The permissions lambda needs to poll an SQS queue on behalf of
+# a function.  The Resource is filled in with the queue ARNs.
+SQS_EVENT_SOURCE_ACTIONS = [
+    "sqs:ReceiveMessage",
+    "sqs:DeleteMessage",
+    "sqs:GetQueueAttributes",
+]
+
+
 CODEBUILD_POLICY = {
     "Version": "2012-10-17",
     # This is the policy straight from the console.
@@ -16,7 +16,7 @@ import botocore.session  # noqa
 from botocore.vendored.requests import ConnectionError as \
     RequestsConnectionError
 from typing import Any, Tuple, Callable, List, Dict, Optional  # noqa
-from typing import Set, Iterator  # noqa
+from typing import Set, Iterator, Union  # noqa
 
 from chalice import app  # noqa
 from chalice.app import CloudWatchEventSource  # noqa
@@ -140,8 +140,9 @@ def validate_route_content_types(routes, binary_types):
 def _validate_entry_content_type(route_entry, binary_types):
     # type: (app.RouteEntry, List[str]) -> None
     binary, non_binary = [], []
+    binary_matcher = app.MediaTypeMatcher(binary_types)
     for content_type in route_entry.content_types:
-        if content_type in binary_types:
+        if binary_matcher.matches(content_type):
             binary.append(content_type)
         else:
             non_binary.append(content_type)
@@ -195,6 +196,13 @@ def _validate_manage_iam_role(config):
             )
 
 
+def _schedule_expression_to_string(expression):
+    # type: (Union[str, app.ScheduleExpression]) -> str
+    if isinstance(expression, app.ScheduleExpression):
+        return expression.to_string()
+    return expression
+
+
 def validate_unique_function_names(config):
     # type: (Config) -> None
     names = set()   # type: Set[str]
@@ -416,8 +424,10 @@ class LambdaDeployer(object):
     def delete(self, existing_resources):
         # type: (DeployedResources) -> None
         self._delete_api_handler(existing_resources)
+        self._delete_sqs_event_sources(existing_resources)
         self._delete_auth_handlers(existing_resources)
         self._delete_cloudwatch_events(existing_resources)
+        self._delete_keep_warm_rule(existing_resources)
         role_arn = self._get_lambda_role_arn(
             existing_resources.api_handler_name)
         if role_arn is not None:
@@ -441,6 +451,24 @@ class LambdaDeployer(object):
                 self._ui.write('Deleting cloud watch event %s\n' % event_key)
                 self._aws_client.delete_rule(rule_name=event_key)
 
+    def _delete_keep_warm_rule(self, existing_resources):
+        # type: (DeployedResources) -> None
+        rule_name = existing_resources.keep_warm_rule
+        if rule_name is not None:
+            self._ui.write('Deleting keep warm rule %s\n' % rule_name)
+            self._aws_client.delete_rule(rule_name=rule_name)
+
+    def _delete_sqs_event_sources(self, existing_resources):
+        # type: (DeployedResources) -> None
+        funcs = existing_resources.lambda_functions
+        if not funcs:
+            return
+        for function in funcs.values():
+            if function.get('type') == 'sqs_event':
+                self._ui.write('Deleting SQS event source for %s\n'
+                               % function['arn'])
+                self._aws_client.remove_sqs_event_sources(function['arn'])
+
     def _delete_api_handler(self, existing_resources):
         # type: (DeployedResources) -> None
         LOGGER.debug("Deleting rest API handler")
@@ -473,6 +501,8 @@ class LambdaDeployer(object):
         deployed_values = {}  # type: Dict[str, Any]
         self._deploy_api_handler(config, existing_resources, stage_name,
                                  deployed_values)
+        self._deploy_keep_warm_rule(config, existing_resources,
+                                    deployed_values)
         self._deploy_auth_handlers(config, existing_resources, stage_name,
                                    deployed_values)
         self._deploy_event_sources(config, existing_resources, stage_name,
@@ -502,12 +532,17 @@ class LambdaDeployer(object):
         # type: (DeployedResources, Dict[str, Any]) -> None
         existing = [
             v['arn'] for v in existing_resources.lambda_functions.values()]
+        sqs_functions = set(
+            v['arn'] for v in existing_resources.lambda_functions.values()
+            if v.get('type') == 'sqs_event')
         just_deployed = [
             v['arn'] for v in deployed_values['lambda_functions'].values()
         ]
         unreferenced = set(existing) - set(just_deployed)
         LOGGER.debug("Unreferenced lambda functions: %s", unreferenced)
         for function_arn in unreferenced:
+            if function_arn in sqs_functions:
+                self._aws_client.remove_sqs_event_sources(function_arn)
             self._delete_lambda_function(function_arn)
 
     def _deploy_api_handler(self, config, existing_resources, stage_name,
@@ -529,6 +564,27 @@ class LambdaDeployer(object):
             deployed_values['api_handler_name'] = function_name
         deployed_values['api_handler_arn'] = function_arn
 
+    def _deploy_keep_warm_rule(self, config, existing_resources,
+                               deployed_values):
+        # type: (Config, OPT_RESOURCES, Dict[str, Any]) -> None
+        keep_warm = config.chalice_app.keep_warm_config
+        if keep_warm is None:
+            if existing_resources is not None and \
+                    existing_resources.keep_warm_rule is not None:
+                self._delete_keep_warm_rule(existing_resources)
+            return
+        rule_name = deployed_values['api_handler_name'] + '-keep-warm'
+        function_arn = deployed_values['api_handler_arn']
+        self._ui.write("Creating keep warm rule: %s\n" % rule_name)
+        rule_arn = self._aws_client.get_or_create_rule_arn(
+            rule_name, _schedule_expression_to_string(keep_warm.rate))
+        self._aws_client.connect_rule_to_lambda(
+            rule_name, function_arn,
+            input_json=json.dumps(keep_warm.to_event()))
+        self._aws_client.add_permission_for_scheduled_event(
+            rule_arn, function_arn)
+        deployed_values['keep_warm_rule'] = rule_name
+
     def _deploy_event_sources(self, config, existing_resources, stage_name,
                               deployed_values):
         # type: (Config, OPT_RESOURCES, str, Dict[str, Any]) -> None
@@ -545,25 +601,39 @@ class LambdaDeployer(object):
 
     def _deploy_event_source(self, config, event_source,
                              stage_name, deployed_values):
-        # type: (Config, CloudWatchEventSource, str, Dict[str, Any]) -> None
+        # type: (Config, app.EventSource, str, Dict[str, Any]) -> None
+        if isinstance(event_source, app.SQSEventSource):
+            function_type = 'sqs_event'
+        else:
+            function_type = 'scheduled_event'
         function_name, function_arn = self._deploy_single_lambda_function(
             config, event_source.name, event_source.handler_string,
-            stage_name, deployed_values, 'scheduled_event'
+            stage_name, deployed_values, function_type
         )
         # Event handlers have an extra step where they also need
-        # to create the corresponding event rule if it doesn't exist.
-        self._configure_event_source(function_name, function_arn, event_source)
+        # to connect the lambda function to the source of its events.
+        if isinstance(event_source, app.SQSEventSource):
+            self._configure_sqs_event_source(function_arn, event_source)
+        elif isinstance(event_source, app.CloudWatchEventSource):
+            self._configure_event_source(function_name, function_arn,
+                                         event_source)
+
+    def _configure_sqs_event_source(self, function_arn, event_source):
+        # type: (str, app.SQSEventSource) -> None
+        # As with CloudWatch rules, a mapping for a queue that's no
+        # longer referenced by the handler isn't removed.
+        self._ui.write("Subscribing to SQS queue: %s\n" % event_source.queue)
+        queue_arn = self._aws_client.get_sqs_queue_arn(event_source.queue)
+        self._aws_client.create_sqs_event_source(
+            queue_arn, function_arn, event_source.batch_size)
 
     def _configure_event_source(self, rule_name, function_arn,
                                 event_source):
         # type: (str, str, CloudWatchEventSource) -> None
         # This doesn't have any logic about removing event sources
         # when they're not longer referenced.
-        if isinstance(event_source.schedule_expression,
-                      (app.ScheduleExpression)):
-            expression = event_source.schedule_expression.to_string()
-        else:
-            expression = event_source.schedule_expression
+        expression = _schedule_expression_to_string(
+            event_source.schedule_expression)
         self._ui.write("Creating CloudWatch rule: %s\n" % rule_name)
         rule_arn = self._aws_client.get_or_create_rule_arn(
             rule_name, expression)
@@ -9,6 +9,21 @@ from chalice.utils import to_cfn_resource_name
 
 class SwaggerGenerator(object):
 
+    _REQUEST_VALIDATORS = {
+        'all': {
+            'validateRequestBody': True,
+            'validateRequestParameters': True,
+        },
+        'body-only': {
+            'validateRequestBody': True,
+            'validateRequestParameters': False,
+        },
+        'params-only': {
+            'validateRequestBody': False,
+            'validateRequestParameters': True,
+        },
+    }
+
     _BASE_TEMPLATE = {
         'swagger': '2.0',
         'info': {
@@ -40,7 +55,15 @@ class SwaggerGenerator(object):
 
     def _add_binary_types(self, api, app):
         # type: (Dict[str, Any], Chalice) -> None
-        api['x-amazon-apigateway-binary-media-types'] = app.api.binary_types
+        binary_types = app.api.binary_types
+        if app.api.compression is not None and '*/*' not in binary_types:
+            # Compressed responses are base64 encoded, and API Gateway
+            # only decodes them if the request's Accept header matches one
+            # of the binary media types.  JSON responses are typically
+            # requested with an Accept header of application/json so we
+            # need to match every type.
+            binary_types = binary_types + ['*/*']
+        api['x-amazon-apigateway-binary-media-types'] = binary_types
 
     def _add_route_paths(self, api, app):
         # type: (Dict[str, Any], Chalice) -> None
@@ -55,6 +78,8 @@ class SwaggerGenerator(object):
                 if 'security' in current:
                     self._add_to_security_definition(
                         current['security'], api, view)
+                if 'x-amazon-apigateway-request-validator' in current:
+                    self._add_request_validation_definitions(api, view)
                 swagger_for_path[http_method.lower()] = current
                 if view.cors is not None:
                     cors_config = view.cors
@@ -139,8 +164,55 @@ class SwaggerGenerator(object):
                 {view.authorizer.name: []})
         if view.view_args:
             self._add_view_args(current, view.view_args)
+        if view.body_schema is not None or view.query_schema is not None:
+            self._add_request_validation(current, view)
         return current
 
+    def _add_request_validation(self, single_method, view):
+        # type: (Dict[str, Any], RouteEntry) -> None
+        # The same schemas the view is validated with in lambda are used
+        # so that API Gateway rejects invalid requests without invoking
+        # the lambda function.
+        parameters = single_method.setdefault('parameters', [])
+        if view.query_schema is not None:
+            query_schema = view.query_schema.schema
+            required = query_schema.get('required', [])
+            properties = query_schema.get('properties', {})
+            for name in sorted(properties):
+                param_type = properties[name].get('type')
+                if param_type not in ('integer', 'number', 'boolean'):
+                    param_type = 'string'
+                parameters.append({'name': name, 'in': 'query',
+                                   'required': name in required,
+                                   'type': param_type})
+        if view.body_schema is not None:
+            parameters.append({
+                'name': 'body', 'in': 'body', 'required': True,
+                'schema': {
+                    '$ref': '#/definitions/%s' % self._request_model_name(
+                        view),
+                },
+            })
+        if view.body_schema is None:
+            validator = 'params-only'
+        elif view.query_schema is None:
+            validator = 'body-only'
+        else:
+            validator = 'all'
+        single_method['x-amazon-apigateway-request-validator'] = validator
+
+    def _add_request_validation_definitions(self, api, view):
+        # type: (Dict[str, Any], RouteEntry) -> None
+        api['x-amazon-apigateway-request-validators'] = copy.deepcopy(
+            self._REQUEST_VALIDATORS)
+        if view.body_schema is not None:
+            model = copy.deepcopy(view.body_schema.schema)
+            api['definitions'][self._request_model_name(view)] = model
+
+    def _request_model_name(self, view):
+        # type: (RouteEntry) -> str
+        return to_cfn_resource_name('%sRequestBody' % view.view_name)
+
     def _generate_precanned_responses(self):
         # type: () -> Dict[str, Any]
         responses = {
@@ -4,11 +4,18 @@ This is intended only for local development purposes.
 
 """
 from __future__ import print_function
+import os
 import re
 import time
+import errno
+import signal
 import uuid
 import base64
+import socket
+import hashlib
 import functools
+import threading
+import traceback
 import warnings
 from collections import namedtuple
 
@@ -16,6 +23,7 @@ from six.moves.BaseHTTPServer import HTTPServer
 from six.moves.BaseHTTPServer import BaseHTTPRequestHandler
 from six.moves.socketserver import ThreadingMixIn
 from typing import List, Any, Dict, Tuple, Callable, Optional, Union  # noqa
+from typing import Pattern  # noqa
 
 from chalice.app import Chalice  # noqa
 from chalice.app import CORSConfig  # noqa
@@ -24,19 +32,27 @@ from chalice.app import RouteEntry  # noqa
 from chalice.app import Request  # noqa
 from chalice.app import AuthResponse  # noqa
 from chalice.app import BuiltinAuthConfig  # noqa
+from chalice.app import SQSEventHandler  # noqa
+from chalice.app import MediaTypeMatcher
+from chalice.app import _RAW_BODY_KEY
 from chalice.config import Config  # noqa
+from chalice.constants import DEFAULT_LAMBDA_MEMORY_SIZE
 
-from chalice.compat import urlparse, parse_qs
+from chalice.compat import urlparse, parse_qs, queue
 
 
 MatchResult = namedtuple('MatchResult', ['route', 'captured', 'query_params'])
 EventType = Dict[str, Any]
 ContextType = Dict[str, Any]
 HeaderType = Dict[str, Any]
+MultiHeaderType = Dict[str, List[str]]
 ResponseType = Dict[str, Any]
 HandlerCls = Callable[..., 'ChaliceRequestHandler']
 ServerCls = Callable[..., 'HTTPServer']
 
+DEFAULT_BACKLOG = 64
+DEFAULT_KEEP_ALIVE_TIMEOUT = 5
+
 
 class Clock(object):
     def time(self):
@@ -44,9 +60,31 @@ class Clock(object):
         return time.time()
 
 
-def create_local_server(app_obj, config, host, port):
-    # type: (Chalice, Config, str, int) -> LocalDevServer
-    return LocalDevServer(app_obj, config, host, port)
+def create_local_server(app_obj, config, host, port, workers=None,
+                        backlog=None, keep_alive_timeout=None, processes=None):
+    # type: (Chalice, Config, str, int, Optional[int], Optional[int], Optional[float], Optional[int]) -> LocalDevServer  # noqa
+    server_cls = _create_server_cls(workers, backlog, keep_alive_timeout)
+    if processes is not None:
+        return PreforkLocalDevServer(app_obj, config, host, port, processes,
+                                     server_cls=server_cls)
+    return LocalDevServer(app_obj, config, host, port, server_cls=server_cls)
+
+
+def _create_server_cls(workers, backlog, keep_alive_timeout):
+    # type: (Optional[int], Optional[int], Optional[float]) -> ServerCls
+    if workers is None:
+        return ThreadedHTTPServer
+    pool_options = {
+        'workers': workers,
+        'backlog': backlog or DEFAULT_BACKLOG,
+        'keep_alive_timeout': keep_alive_timeout or DEFAULT_KEEP_ALIVE_TIMEOUT,
+    }  # type: Dict[str, Any]
+
+    def server_cls(server_address, handler_cls):
+        # type: (Tuple[str, int], HandlerCls) -> HTTPServer
+        return BoundedThreadPoolHTTPServer(
+            server_address, handler_cls, **pool_options)
+    return server_cls
 
 
 class LocalARNBuilder(object):
@@ -76,21 +114,40 @@ class LocalARNBuilder(object):
 
 
 class ARNMatcher(object):
+    # The compiled regex for each resource that's been matched against.
+    # Authorizer results are cached, so the same policy resources are
+    # matched against on every request that uses the same token.
+    _COMPILED_RESOURCES = {}  # type: Dict[str, Pattern]
+    _MAX_COMPILED_RESOURCES = 1000
+
     def __init__(self, target_arn):
         # type: (str) -> None
         self._arn = target_arn
 
+    @classmethod
+    def _compile_resource(cls, resource):
+        # type: (str) -> Pattern
+        compiled = cls._COMPILED_RESOURCES.get(resource)
+        if compiled is None:
+            # Arn matching supports two special case characetrs that are not
+            # escapable. * represents a glob which translates to a non-greedy
+            # match of any number of characters. ? which is any single
+            # character.  These are easy to translate to a regex using .*?
+            # and . respectivly.
+            escaped_resource = re.escape(resource)
+            resource_regex = escaped_resource.replace(r'\?', '.').replace(
+                r'\*', '.*?')
+            compiled = re.compile('^%s$' % resource_regex)
+            if len(cls._COMPILED_RESOURCES) >= cls._MAX_COMPILED_RESOURCES:
+                cls._COMPILED_RESOURCES.clear()
+            cls._COMPILED_RESOURCES[resource] = compiled
+        return compiled
+
     def _resource_match(self, resource):
         # type: (str) -> bool
-        # Arn matching supports two special case characetrs that are not
-        # escapable. * represents a glob which translates to a non-greedy
-        # match of any number of characters. ? which is any single character.
-        # These are easy to translate to a regex using .*? and . respectivly.
-        escaped_resource = re.escape(resource)
-        resource_regex = escaped_resource.replace(r'\?', '.').replace(
-            r'\*', '.*?')
-        resource_regex = '^%s$' % resource_regex
-        return re.match(resource_regex, self._arn) is not None
+        if '*' not in resource and '?' not in resource:
+            return resource == self._arn
+        return self._compile_resource(resource).match(self._arn) is not None
 
     def does_any_resource_match(self, resources):
         # type: (List[str]) -> bool
@@ -100,14 +157,49 @@ class ARNMatcher(object):
         return False
 
 
+class _RouteNode(object):
+    """A node in the segment trie used by :class:`RouteMatcher`."""
+
+    __slots__ = ('children', 'capture_child', 'route_url', 'capture_names')
+
+    def __init__(self):
+        # type: () -> None
+        self.children = {}  # type: Dict[str, _RouteNode]
+        self.capture_child = None  # type: Optional[_RouteNode]
+        # Only set on the node at the end of a route.  The names are in
+        # the same order as the captured segments of the route.
+        self.route_url = None  # type: Optional[str]
+        self.capture_names = []  # type: List[str]
+
+
 class RouteMatcher(object):
     def __init__(self, route_urls):
         # type: (List[str]) -> None
-        # Sorting the route_urls ensures we always check
-        # the concrete routes for a prefix before the
-        # variable/capture parts of the route, e.g
-        # '/foo/bar' before '/foo/{capture}'
         self.route_urls = sorted(route_urls)
+        # The routes are stored in a trie with one level per path
+        # segment, so matching a url only looks at the routes that
+        # share its prefix instead of every route.
+        self._root = _RouteNode()
+        for route_url in self.route_urls:
+            self._insert(route_url)
+
+    def _insert(self, route_url):
+        # type: (str) -> None
+        node = self._root
+        capture_names = []
+        for part in route_url.split('/')[1:]:
+            if part.startswith('{') and part.endswith('}'):
+                capture_names.append(part[1:-1])
+                if node.capture_child is None:
+                    node.capture_child = _RouteNode()
+                node = node.capture_child
+            else:
+                child = node.children.get(part)
+                if child is None:
+                    child = node.children[part] = _RouteNode()
+                node = child
+        node.route_url = route_url
+        node.capture_names = capture_names
 
     def match_route(self, url):
         # type: (str) -> MatchResult
@@ -120,50 +212,79 @@ class RouteMatcher(object):
 
             match_route('/foo/bar') -> '/foo/{name}'
 
+        A concrete segment takes precedence over a captured one, so
+        ``/foo/bar`` is matched by ``/foo/bar`` rather than by
+        ``/foo/{name}`` when both routes exist.
         """
-        # Otherwise we need to check for param substitution
         parsed_url = urlparse(url)
-        query_params = {k: v[0] for k, v in parse_qs(parsed_url.query).items()}
+        # Every value of a repeated query string parameter is kept, in
+        # the order they appear, like API Gateway's multi value map.
+        query_params = parse_qs(parsed_url.query)
         path = parsed_url.path
         # API Gateway removes the trailing slash if the route is not the root
         # path. We do the same here so our route matching works the same way.
         if path != '/' and path.endswith('/'):
             path = path[:-1]
-        parts = path.split('/')
-        captured = {}
-        for route_url in self.route_urls:
-            url_parts = route_url.split('/')
-            if len(parts) == len(url_parts):
-                for i, j in zip(parts, url_parts):
-                    if j.startswith('{') and j.endswith('}'):
-                        captured[j[1:-1]] = i
-                        continue
-                    if i != j:
-                        break
-                else:
-                    return MatchResult(route_url, captured, query_params)
-        raise ValueError("No matching route found for: %s" % url)
+        parts = path.split('/')[1:]
+        captured_values = []  # type: List[str]
+        node = self._match(self._root, parts, 0, captured_values)
+        if node is None:
+            raise ValueError("No matching route found for: %s" % url)
+        captured = dict(zip(node.capture_names, captured_values))
+        return MatchResult(node.route_url, captured, query_params)
+
+    def _match(self, node, parts, index, captured_values):
+        # type: (_RouteNode, List[str], int, List[str]) -> Optional[_RouteNode]
+        if index == len(parts):
+            if node.route_url is not None:
+                return node
+            return None
+        part = parts[index]
+        child = node.children.get(part)
+        if child is not None:
+            match = self._match(child, parts, index + 1, captured_values)
+            if match is not None:
+                return match
+        if node.capture_child is not None:
+            # Only fall back to a captured segment if the concrete
+            # segment didn't lead to a route.
+            captured_values.append(part)
+            match = self._match(node.capture_child, parts, index + 1,
+                                captured_values)
+            if match is not None:
+                return match
+            captured_values.pop()
+        return None
 
 
 class LambdaEventConverter(object):
 
     LOCAL_SOURCE_IP = '127.0.0.1'
 
-    """Convert an HTTP request to an event dict used by lambda."""
-    def __init__(self, route_matcher, binary_types=None):
-        # type: (RouteMatcher, List[str]) -> None
+    """Convert an HTTP request to an event dict used by lambda.
+
+    With ``raw_body`` the request body is put in the event as is, even
+    for binary content types, and the event asks the app to return
+    binary response bodies as bytes, so neither is base64 encoded.
+    """
+    def __init__(self, route_matcher, binary_types=None, raw_body=False):
+        # type: (RouteMatcher, List[str], bool) -> None
         self._route_matcher = route_matcher
         if binary_types is None:
             binary_types = []
-        self._binary_types = binary_types
+        self._binary_types = MediaTypeMatcher(binary_types)
+        self._raw_body = raw_body
 
     def _is_binary(self, headers):
         # type: (Dict[str,Any]) -> bool
-        return headers.get('content-type', '') in self._binary_types
+        return self._binary_types.matches(headers.get('content-type', ''))
 
-    def create_lambda_event(self, method, path, headers, body=None):
-        # type: (str, str, Dict[str, str], str) -> EventType
+    def create_lambda_event(self, method, path, headers, body=None,
+                            multi_value_headers=None):
+        # type: (str, str, HeaderType, str, MultiHeaderType) -> EventType
         view_route = self._route_matcher.match_route(path)
+        if multi_value_headers is None:
+            multi_value_headers = {k: [v] for k, v in headers.items()}
         event = {
             'requestContext': {
                 'httpMethod': method,
@@ -173,16 +294,25 @@ class LambdaEventConverter(object):
                 },
             },
             'headers': {k.lower(): v for k, v in headers.items()},
+            'multiValueHeaders': {k.lower(): v for k, v
+                                  in multi_value_headers.items()},
             'pathParameters': view_route.captured,
             'stageVariables': {},
         }
         if view_route.query_params:
-            event['queryStringParameters'] = view_route.query_params
+            # The single value map has the last value of each parameter.
+            event['queryStringParameters'] = {
+                k: v[-1] for k, v in view_route.query_params.items()}
+            event['multiValueQueryStringParameters'] = view_route.query_params
         else:
             # If no query parameters are provided, API gateway maps
             # this to None so we're doing this for parity.
             event['queryStringParameters'] = None
-        if self._is_binary(headers) and body is not None:
+            event['multiValueQueryStringParameters'] = None
+        if self._raw_body:
+            event['body'] = body
+            event[_RAW_BODY_KEY] = True
+        elif self._is_binary(headers) and body is not None:
             event['body'] = base64.b64encode(body).decode('ascii')
             event['isBase64Encoded'] = True
         else:
@@ -214,7 +344,7 @@ class NotAuthorizedError(LocalGatewayException):
 class LambdaContext(object):
     def __init__(self, function_name, memory_size,
                  max_runtime_ms=3000, time_source=None):
-        # type: (str, int, int, Optional[Clock]) -> None
+        # type: (str, int, Optional[int], Optional[Clock]) -> None
         if time_source is None:
             time_source = Clock()
         self._time_source = time_source
@@ -276,7 +406,11 @@ class LambdaContext(object):
         return self._time_source.time() * 1000
 
     def get_remaining_time_in_millis(self):
-        # type: () -> float
+        # type: () -> Optional[float]
+        if self._max_runtime is None:
+            # There's no lambda_timeout configured, so the invocation
+            # can run for as long as it needs to.
+            return None
         runtime = self._current_time_millis() - self._start_time
         return self._max_runtime - runtime
 
@@ -365,7 +499,7 @@ class LocalGatewayAuthorizer(object):
 
     def _update_lambda_event(self, lambda_event, auth_result):
         # type: (EventType, ResponseType) -> EventType
-        auth_context = auth_result['context']
+        auth_context = dict(auth_result['context'])
         auth_context.update({
             'principalId': auth_result['principalId']
         })
@@ -390,14 +524,20 @@ class LocalGatewayAuthorizer(object):
 
 
 class LocalGateway(object):
-    """A class for faking the behavior of API Gateway."""
-    def __init__(self, app_object, config):
-        # type: (Chalice, Config) -> None
+    """A class for faking the behavior of API Gateway.
+
+    The route matcher and authorizer are built once, and nothing about a
+    request is stored on the gateway, so a single instance can be shared
+    by every thread of a server.
+    """
+    def __init__(self, app_object, config, raw_body=False):
+        # type: (Chalice, Config, bool) -> None
         self._app_object = app_object
         self._config = config
         self.event_converter = LambdaEventConverter(
             RouteMatcher(list(app_object.routes)),
-            self._app_object.api.binary_types
+            self._app_object.api.binary_types,
+            raw_body=raw_body,
         )
         self._authorizer = LocalGatewayAuthorizer(app_object)
 
@@ -413,11 +553,12 @@ class LocalGateway(object):
             max_runtime_ms=timeout
         )
 
-    def _generate_lambda_event(self, method, path, headers, body):
-        # type: (str, str, HeaderType, str) -> EventType
+    def _generate_lambda_event(self, method, path, headers, body,
+                               multi_value_headers=None):
+        # type: (str, str, HeaderType, Optional[str], MultiHeaderType) -> EventType  # noqa
         lambda_event = self.event_converter.create_lambda_event(
             method=method, path=path, headers=headers,
-            body=body,
+            body=body, multi_value_headers=multi_value_headers,
         )
         return lambda_event
 
@@ -426,12 +567,13 @@ class LocalGateway(object):
         route_key = lambda_event['requestContext']['resourcePath']
         return 'OPTIONS' in self._app_object.routes[route_key]
 
-    def handle_request(self, method, path, headers, body):
-        # type: (str, str, HeaderType, str) -> ResponseType
+    def handle_request(self, method, path, headers, body,
+                       multi_value_headers=None):
+        # type: (str, str, HeaderType, Optional[str], MultiHeaderType) -> ResponseType  # noqa
         lambda_context = self._generate_lambda_context()
         try:
             lambda_event = self._generate_lambda_event(
-                method, path, headers, body)
+                method, path, headers, body, multi_value_headers)
         except ValueError:
             # API Gateway will return a different error on route not found
             # depending on whether or not we have an authorization token in our
@@ -522,14 +664,17 @@ class ChaliceRequestHandler(BaseHTTPRequestHandler):
     """A class for mapping raw HTTP events to and from LocalGateway."""
     protocol_version = 'HTTP/1.1'
 
-    def __init__(self, request, client_address, server, app_object, config):
-        # type: (bytes, Tuple[str, int], HTTPServer, Chalice, Config) -> None
-        self.local_gateway = LocalGateway(app_object, config)
+    def __init__(self, request, client_address, server, app_object, config,
+                 local_gateway=None):
+        # type: (bytes, Tuple[str, int], HTTPServer, Chalice, Config, Optional[LocalGateway]) -> None  # noqa
+        if local_gateway is None:
+            local_gateway = LocalGateway(app_object, config)
+        self.local_gateway = local_gateway
         BaseHTTPRequestHandler.__init__(
             self, request, client_address, server)  # type: ignore
 
     def _parse_payload(self):
-        # type: () -> Tuple[HeaderType, str]
+        # type: () -> Tuple[HeaderType, MultiHeaderType, str]
         body = None
         content_length = int(self.headers.get('content-length', '0'))
         if content_length > 0:
@@ -537,17 +682,21 @@ class ChaliceRequestHandler(BaseHTTPRequestHandler):
         # mypy doesn't like dict(self.headers) so I had to use a
         # dictcomp instead to make it happy.
         converted_headers = {key: value for key, value in self.headers.items()}
-        return converted_headers, body
+        multi_value_headers = {}  # type: MultiHeaderType
+        for key, value in self.headers.items():
+            multi_value_headers.setdefault(key, []).append(value)
+        return converted_headers, multi_value_headers, body
 
     def _generic_handle(self):
         # type: () -> None
-        headers, body = self._parse_payload()
+        headers, multi_value_headers, body = self._parse_payload()
         try:
             response = self.local_gateway.handle_request(
                 method=self.command,
                 path=self.path,
                 headers=headers,
-                body=body
+                body=body,
+                multi_value_headers=multi_value_headers,
             )
             status_code = response['statusCode']
             headers = response['headers']
@@ -609,6 +758,99 @@ class ThreadedHTTPServer(ThreadingMixIn, HTTPServer):
     daemon_threads = True
 
 
+class BoundedThreadPoolHTTPServer(HTTPServer):
+    """HTTP server that handles connections with a fixed pool of threads.
+
+    Accepted connections are put on a queue of at most ``backlog``
+    connections that ``workers`` threads take from.  When the queue is
+    full the connection is sent a ``503`` response and closed instead of
+    starting another thread.  A connection that is kept alive by the
+    client is closed after ``keep_alive_timeout`` seconds without a
+    request so idle browser connections don't hold on to a worker.
+    """
+
+    SERVICE_UNAVAILABLE_RESPONSE = (
+        b'HTTP/1.1 503 Service Unavailable\r\n'
+        b'Content-Type: application/json\r\n'
+        b'Content-Length: 34\r\n'
+        b'Retry-After: 1\r\n'
+        b'Connection: close\r\n'
+        b'\r\n'
+        b'{"message": "Service Unavailable"}'
+    )
+
+    def __init__(self, server_address, handler_cls, workers=1,
+                 backlog=DEFAULT_BACKLOG,
+                 keep_alive_timeout=DEFAULT_KEEP_ALIVE_TIMEOUT):
+        # type: (Tuple[str, int], HandlerCls, int, int, float) -> None
+        if workers < 1:
+            raise ValueError("workers must be at least 1, got: %s" % workers)
+        self.workers = workers
+        self.backlog = backlog
+        self.keep_alive_timeout = keep_alive_timeout
+        # This is also used as the backlog passed to listen().
+        self.request_queue_size = backlog
+        self._requests = queue.Queue(maxsize=backlog)  # type: queue.Queue
+        self._threads = []  # type: List[threading.Thread]
+        self._threads_lock = threading.Lock()
+        HTTPServer.__init__(self, server_address, handler_cls)
+
+    def _start_workers(self):
+        # type: () -> None
+        with self._threads_lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(
+                    target=self._process_request_thread,
+                    name='chalice-local-worker-%s' % i)
+                thread.daemon = True
+                thread.start()
+                self._threads.append(thread)
+
+    def process_request(self, request, client_address):
+        # type: (Any, Tuple[str, int]) -> None
+        self._start_workers()
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            self._reject_request(request)
+
+    def _reject_request(self, request):
+        # type: (Any) -> None
+        try:
+            request.sendall(self.SERVICE_UNAVAILABLE_RESPONSE)
+        except socket.error:
+            pass
+        self.shutdown_request(request)
+
+    def _process_request_thread(self):
+        # type: () -> None
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            try:
+                request.settimeout(self.keep_alive_timeout)
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    def server_close(self):
+        # type: () -> None
+        HTTPServer.server_close(self)
+        with self._threads_lock:
+            threads = self._threads
+            self._threads = []
+        for _ in threads:
+            self._requests.put(None)
+        for thread in threads:
+            thread.join()
+
+
 class LocalDevServer(object):
     def __init__(self, app_object, config, host, port,
                  handler_cls=ChaliceRequestHandler,
@@ -617,8 +859,12 @@ class LocalDevServer(object):
         self.app_object = app_object
         self.host = host
         self.port = port
+        # A handler is created for every connection, so they all share
+        # one gateway instead of each building their own route matcher.
+        self.local_gateway = LocalGateway(app_object, config)
         self._wrapped_handler = functools.partial(
-            handler_cls, app_object=app_object, config=config)
+            handler_cls, app_object=app_object, config=config,
+            local_gateway=self.local_gateway)
         self.server = server_cls((host, port), self._wrapped_handler)
 
     def handle_single_request(self):
@@ -629,3 +875,222 @@ class LocalDevServer(object):
         # type: () -> None
         print("Serving on %s:%s" % (self.host, self.port))
         self.server.serve_forever()
+
+
+class PreforkLocalDevServer(LocalDevServer):
+    """Serve requests from several forked worker processes.
+
+    The listening socket is bound before forking so every worker accepts
+    connections from the same socket, and the app imported by the parent
+    is shared copy-on-write with the workers.  The parent only waits on
+    its workers and starts a new one whenever a worker exits.
+    """
+
+    # Workers that exit sooner than this after being started are
+    # restarted after a delay so a broken app doesn't fork in a loop.
+    MIN_WORKER_UPTIME = 1.0
+
+    def __init__(self, app_object, config, host, port, processes,
+                 handler_cls=ChaliceRequestHandler,
+                 server_cls=ThreadedHTTPServer, clock=None):
+        # type: (Chalice, Config, str, int, int, HandlerCls, ServerCls, Optional[Clock]) -> None  # noqa
+        if not hasattr(os, 'fork'):
+            raise RuntimeError(
+                "Serving from multiple processes requires os.fork(), "
+                "which is not available on this platform.")
+        if processes < 1:
+            raise ValueError(
+                "processes must be at least 1, got: %s" % processes)
+        LocalDevServer.__init__(self, app_object, config, host, port,
+                                handler_cls=handler_cls,
+                                server_cls=server_cls)
+        self.processes = processes
+        if clock is None:
+            clock = Clock()
+        self._clock = clock
+        # Maps the pid of each running worker to the time it started.
+        self._workers = {}  # type: Dict[int, float]
+        self._stopping = False
+
+    def serve_forever(self):
+        # type: () -> None
+        print("Serving on %s:%s with %s processes" % (
+            self.host, self.port, self.processes))
+        previous_handler = signal.signal(signal.SIGTERM, self._handle_sigterm)
+        try:
+            for _ in range(self.processes):
+                self._start_worker()
+            self._supervise()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._stopping = True
+            self._stop_workers()
+            signal.signal(signal.SIGTERM, previous_handler)
+            self.server.server_close()
+
+    def _handle_sigterm(self, signum, frame):
+        # type: (int, Any) -> None
+        self._stopping = True
+        self._signal_workers(signal.SIGTERM)
+
+    def _start_worker(self):
+        # type: () -> None
+        pid = os.fork()
+        if pid == 0:
+            self._run_worker()
+        self._workers[pid] = self._clock.time()
+
+    def _run_worker(self):
+        # type: () -> None
+        # This runs in the forked child and never returns, the child
+        # must not go back into the parent's supervisor loop.
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        exit_code = 1
+        try:
+            self.server.serve_forever()
+            exit_code = 0
+        except KeyboardInterrupt:
+            exit_code = 0
+        except Exception:
+            traceback.print_exc()
+        finally:
+            os._exit(exit_code)
+
+    def _supervise(self):
+        # type: () -> None
+        while self._workers:
+            pid, status = self._wait_for_worker()
+            if pid not in self._workers:
+                continue
+            started = self._workers.pop(pid)
+            if self._stopping:
+                continue
+            print("Worker %s exited with status %s, starting a new "
+                  "worker." % (pid, status))
+            if self._clock.time() - started < self.MIN_WORKER_UPTIME:
+                time.sleep(self.MIN_WORKER_UPTIME)
+            if not self._stopping:
+                self._start_worker()
+
+    def _wait_for_worker(self):
+        # type: () -> Tuple[int, int]
+        while True:
+            try:
+                return os.wait()
+            except OSError as e:
+                # Python 2 doesn't retry system calls interrupted
+                # by a signal handler.
+                if e.errno != errno.EINTR:
+                    raise
+
+    def _signal_workers(self, signum):
+        # type: (int) -> None
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signum)
+            except OSError:
+                pass
+
+    def _stop_workers(self):
+        # type: () -> None
+        self._signal_workers(signal.SIGTERM)
+        while self._workers:
+            pid, _ = self._wait_for_worker()
+            if pid in self._workers:
+                del self._workers[pid]
+
+
+class LocalSQSQueue(object):
+    """An in memory stand in for an SQS queue.
+
+    Messages sent to the queue are delivered to a handler registered
+    with ``@app.on_sqs_message()`` by calling ``process()``.  The handler
+    receives the same event lambda would send it, and messages it reports
+    as failed are put back on the queue, so SQS handlers can be tested
+    without deploying them.
+    """
+    def __init__(self, name, region='us-west-2',
+                 account_id='123456789012', time_source=None):
+        # type: (str, str, str, Optional[Clock]) -> None
+        if time_source is None:
+            time_source = Clock()
+        self.name = name
+        self.region = region
+        self.account_id = account_id
+        self.arn = 'arn:aws:sqs:%s:%s:%s' % (region, account_id, name)
+        self._time_source = time_source
+        self._messages = []  # type: List[Dict[str, Any]]
+
+    def __len__(self):
+        # type: () -> int
+        return len(self._messages)
+
+    def send_message(self, body, message_attributes=None):
+        # type: (str, Optional[Dict[str, Any]]) -> str
+        message_id = str(uuid.uuid4())
+        sent_timestamp = str(int(self._time_source.time() * 1000))
+        self._messages.append({
+            'messageId': message_id,
+            'body': body,
+            'attributes': {
+                'ApproximateReceiveCount': '0',
+                'SentTimestamp': sent_timestamp,
+                'SenderId': self.account_id,
+                'ApproximateFirstReceiveTimestamp': sent_timestamp,
+            },
+            'messageAttributes': message_attributes or {},
+            'md5OfBody': hashlib.md5(body.encode('utf-8')).hexdigest(),
+            'eventSource': 'aws:sqs',
+            'eventSourceARN': self.arn,
+            'awsRegion': self.region,
+        })
+        return message_id
+
+    def process(self, handler, context=None):
+        # type: (SQSEventHandler, Optional[LambdaContext]) -> List[str]
+        """Deliver the queued messages to an SQS handler.
+
+        The messages are delivered in batches of the handler's
+        ``batch_size``.  Messages the handler reports as failed are put
+        back on the queue and the list of their message ids is returned.
+        If the handler raises an exception the whole batch is put back on
+        the queue and the exception is propagated.
+
+        """
+        event_source = handler.event_source
+        if event_source.queue != self.name:
+            raise ValueError(
+                'The handler %s is subscribed to the queue "%s", not "%s".'
+                % (event_source.name, event_source.queue, self.name))
+        pending, self._messages = self._messages, []
+        failed = []  # type: List[str]
+        batch_size = event_source.batch_size
+        for i in range(0, len(pending), batch_size):
+            batch = [self._receive(message)
+                     for message in pending[i:i + batch_size]]
+            batch_context = context
+            if batch_context is None:
+                batch_context = LambdaContext(event_source.name,
+                                              DEFAULT_LAMBDA_MEMORY_SIZE)
+            try:
+                response = handler({'Records': batch}, batch_context)
+            except Exception:
+                self._messages.extend(pending[i:])
+                raise
+            failed_ids = set(
+                failure['itemIdentifier']
+                for failure in response['batchItemFailures'])
+            for message in batch:
+                if message['messageId'] in failed_ids:
+                    self._messages.append(message)
+                    failed.append(message['messageId'])
+        return failed
+
+    def _receive(self, message):
+        # type: (Dict[str, Any]) -> Dict[str, Any]
+        attributes = message['attributes']
+        attributes['ApproximateReceiveCount'] = str(
+            int(attributes['ApproximateReceiveCount']) + 1)
+        message['receiptHandle'] = str(uuid.uuid4())
+        return message
@@ -1,4 +1,5 @@
 import os
+import json
 import copy
 
 from typing import Any, Dict  # noqa
@@ -13,6 +14,7 @@ from chalice.constants import DEFAULT_LAMBDA_MEMORY_SIZE
 from chalice.utils import OSUtils, UI, serialize_to_json, to_cfn_resource_name
 from chalice.config import Config  # noqa
 from chalice.app import Chalice  # noqa
+from chalice.app import SQSEventSource, ScheduleExpression
 from chalice.policy import AppPolicyGenerator
 
 
@@ -83,6 +85,7 @@ class SAMTemplateGenerator(object):
                 config.chalice_app, config.api_gateway_stage),
         }
         self._add_auth_handlers(resources, config, code_uri)
+        self._add_sqs_handlers(resources, config, code_uri)
         template['Resources'] = resources
         self._update_endpoint_url_output(template, config)
         return template
@@ -98,6 +101,17 @@ class SAMTemplateGenerator(object):
             resources[auth_resource_name + 'InvokePermission'] = \
                 self._generate_lambda_permission(auth_resource_name)
 
+    def _add_sqs_handlers(self, resources, config, code_uri):
+        # type: (Dict[str, Any], Config, str) -> None
+        for event_source in config.chalice_app.event_sources:
+            if not isinstance(event_source, SQSEventSource):
+                continue
+            resource_name = to_cfn_resource_name(event_source.name)
+            new_config = config.scope(chalice_stage=config.chalice_stage,
+                                      function_name=event_source.name)
+            resources[resource_name] = self._generate_serverless_function(
+                new_config, code_uri, event_source.handler_string, 'sqs')
+
     def _generate_lambda_permission(self, lambda_ref):
         # type: (str) -> Dict[str, Any]
         return {
@@ -122,8 +136,7 @@ class SAMTemplateGenerator(object):
             'Runtime': config.lambda_python_version,
             'Handler': handler_string,
             'CodeUri': code_uri,
-            'Events': self._generate_function_events(
-                config.chalice_app, function_type),
+            'Events': self._generate_function_events(config, function_type),
             'Tags': config.tags,
             'Timeout': DEFAULT_LAMBDA_TIMEOUT,
             'MemorySize': DEFAULT_LAMBDA_MEMORY_SIZE
@@ -145,14 +158,27 @@ class SAMTemplateGenerator(object):
             'Properties': properties,
         }
 
-    def _generate_function_events(self, app, function_type):
-        # type: (Chalice, str) -> Dict[str, Any]
+    def _generate_function_events(self, config, function_type):
+        # type: (Config, str) -> Dict[str, Any]
         return getattr(
-            self, '_generate_' + function_type + '_function_events')(app)
+            self, '_generate_' + function_type + '_function_events')(config)
 
-    def _generate_api_function_events(self, app):
-        # type: (Chalice) -> Dict[str, Any]
-        events = {}
+    def _generate_api_function_events(self, config):
+        # type: (Config) -> Dict[str, Any]
+        app = config.chalice_app
+        events = {}  # type: Dict[str, Any]
+        keep_warm = app.keep_warm_config
+        if keep_warm is not None:
+            rate = keep_warm.rate
+            if isinstance(rate, ScheduleExpression):
+                rate = rate.to_string()
+            events['KeepWarm'] = {
+                'Type': 'Schedule',
+                'Properties': {
+                    'Schedule': rate,
+                    'Input': json.dumps(keep_warm.to_event()),
+                }
+            }
         for methods in app.routes.values():
             for http_method, view in methods.items():
                 key_name = to_cfn_resource_name(
@@ -167,10 +193,38 @@ class SAMTemplateGenerator(object):
                 }
         return events
 
-    def _generate_authorizer_function_events(self, app):
-        # type: (Chalice) -> Dict[str, Any]
+    def _generate_authorizer_function_events(self, config):
+        # type: (Config) -> Dict[str, Any]
         return {}
 
+    def _generate_sqs_function_events(self, config):
+        # type: (Config) -> Dict[str, Any]
+        # The config is scoped to the handler's function name, which is
+        # also the name of its event source.
+        for event_source in config.chalice_app.event_sources:
+            if isinstance(event_source, SQSEventSource) and \
+                    event_source.name == config.function_name:
+                break
+        else:
+            raise ValueError("No SQS event source for function: %s"
+                             % config.function_name)
+        resource_name = to_cfn_resource_name(event_source.name)
+        return {
+            resource_name + 'SQSEventSource': {
+                'Type': 'SQS',
+                'Properties': {
+                    'Queue': {
+                        'Fn::Sub': (
+                            'arn:aws:sqs:${AWS::Region}:'
+                            '${AWS::AccountId}:%s' % event_source.queue
+                        )
+                    },
+                    'BatchSize': event_source.batch_size,
+                    'FunctionResponseTypes': ['ReportBatchItemFailures'],
+                }
+            }
+        }
+
     def _generate_rest_api(self, app, api_gateway_stage):
         # type: (Chalice, str) -> Dict[str, Any]
         swagger_definition = self._swagger_generator.generate_swagger(app)
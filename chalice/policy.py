@@ -10,10 +10,11 @@ import os
 import json
 import uuid
 
-from typing import Any, List, Dict, Set  # noqa
+from typing import Any, List, Dict, Set, Optional  # noqa
 import botocore.session
 
-from chalice.constants import CLOUDWATCH_LOGS
+from chalice.app import SQSEventSource
+from chalice.constants import CLOUDWATCH_LOGS, SQS_EVENT_SOURCE_ACTIONS
 from chalice.utils import OSUtils  # noqa
 from chalice.config import Config  # noqa
 
@@ -79,8 +80,45 @@ class AppPolicyGenerator(object):
         app_source = self._osutils.get_file_contents(app_py, binary=False)
         app_policy = policy_from_source_code(app_source)
         app_policy['Statement'].append(CLOUDWATCH_LOGS)
+        sqs_statement = self._generate_sqs_statement(config)
+        if sqs_statement is not None:
+            app_policy['Statement'].append(sqs_statement)
+        keep_warm_statement = self._generate_keep_warm_statement(config)
+        if keep_warm_statement is not None:
+            app_policy['Statement'].append(keep_warm_statement)
         return app_policy
 
+    def _generate_keep_warm_statement(self, config):
+        # type: (Config) -> Optional[Dict[str, Any]]
+        # Keeping more than one container warm requires the API handler
+        # to invoke itself.
+        chalice_app = config.chalice_app
+        if chalice_app is None or chalice_app.keep_warm_config is None or \
+                chalice_app.keep_warm_config.concurrency <= 1:
+            return None
+        return {
+            'Effect': 'Allow',
+            'Action': ['lambda:InvokeFunction'],
+            'Resource': ['arn:aws:lambda:*:*:function:%s-%s' % (
+                config.app_name, config.chalice_stage)],
+        }
+
+    def _generate_sqs_statement(self, config):
+        # type: (Config) -> Optional[Dict[str, Any]]
+        chalice_app = config.chalice_app
+        if chalice_app is None:
+            return None
+        queues = sorted(set(
+            event_source.queue for event_source in chalice_app.event_sources
+            if isinstance(event_source, SQSEventSource)))
+        if not queues:
+            return None
+        return {
+            'Effect': 'Allow',
+            'Action': list(SQS_EVENT_SOURCE_ACTIONS),
+            'Resource': ['arn:aws:sqs:*:*:%s' % queue for queue in queues],
+        }
+
 
 class PolicyBuilder(object):
     VERSION = '2012-10-17'
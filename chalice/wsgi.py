@@ -0,0 +1,152 @@
+"""Run a Chalice app under a WSGI server.
+
+This lets the same app that's deployed to lambda be served by a WSGI
+server such as gunicorn or uwsgi, for example in a container::
+
+    # wsgi.py
+    from chalice.wsgi import make_wsgi_app
+
+    from app import app
+
+    application = make_wsgi_app(app)
+
+    $ gunicorn --workers 4 wsgi:application
+
+Requests are converted to the same events ``chalice local`` creates,
+including running authorizers and answering CORS preflight requests,
+and are dispatched by calling the app just like lambda does.  Request
+and response bodies are passed through as bytes instead of being base64
+encoded like they are for lambda.
+"""
+import six
+from six.moves import http_client
+from six.moves.urllib.parse import quote
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple  # noqa
+
+from chalice.app import Chalice  # noqa
+from chalice.config import Config
+from chalice.constants import DEFAULT_LAMBDA_MEMORY_SIZE
+from chalice.constants import DEFAULT_LAMBDA_TIMEOUT
+from chalice.local import LocalGateway
+from chalice.local import LocalGatewayException
+
+
+EnvironType = Dict[str, Any]
+StartResponseType = Callable[..., Any]
+
+
+def make_wsgi_app(app_object, config=None):
+    # type: (Chalice, Optional[Config]) -> WSGIApp
+    """Create a WSGI application that dispatches to ``app_object``.
+
+    The ``config`` is used for the lambda context given to the app, if
+    it's not provided the default lambda timeout and memory size are used.
+    """
+    if config is None:
+        config = Config.create(lambda_timeout=DEFAULT_LAMBDA_TIMEOUT,
+                               lambda_memory_size=DEFAULT_LAMBDA_MEMORY_SIZE)
+    return WSGIApp(app_object, config)
+
+
+class WSGIApp(object):
+    """A WSGI application for a Chalice app.
+
+    The gateway, and the route trie it matches requests with, are built
+    once and shared by every request and every thread of the server.
+    """
+
+    def __init__(self, app_object, config):
+        # type: (Chalice, Config) -> None
+        self.app_object = app_object
+        self.local_gateway = LocalGateway(app_object, config, raw_body=True)
+
+    def __call__(self, environ, start_response):
+        # type: (EnvironType, StartResponseType) -> Iterable[bytes]
+        headers = self._get_headers(environ)
+        try:
+            response = self.local_gateway.handle_request(
+                method=environ['REQUEST_METHOD'],
+                path=self._get_url(environ),
+                headers=headers,
+                body=self._read_body(environ),
+            )
+            status_code = response['statusCode']
+            response_headers = response['headers']
+            body = response['body']
+        except LocalGatewayException as e:
+            status_code = e.CODE
+            response_headers = e.headers
+            body = e.body
+        return self._send_response(start_response, status_code,
+                                   response_headers, body)
+
+    def _get_url(self, environ):
+        # type: (EnvironType) -> str
+        # Servers such as gunicorn and uwsgi also pass the URI as it was
+        # sent, which doesn't need to be quoted again.  It includes the
+        # SCRIPT_NAME, so it's only used when the app is mounted at "/".
+        raw_uri = environ.get('RAW_URI') or environ.get('REQUEST_URI')
+        if raw_uri and raw_uri.startswith('/') and \
+                not environ.get('SCRIPT_NAME'):
+            return raw_uri
+        path = environ.get('PATH_INFO') or '/'
+        if six.PY3:
+            # WSGI servers decode the path as latin-1, so this gets back
+            # the bytes that were sent before quoting them again.
+            path = path.encode('latin-1')
+        # The characters that are allowed in a path segment are left
+        # as they are, e.g. "/users/a:b" is still matched as "a:b".
+        url = quote(path, safe="/:@!$&'()*+,;=~")
+        query_string = environ.get('QUERY_STRING')
+        if query_string:
+            url = '%s?%s' % (url, query_string)
+        return url
+
+    def _get_headers(self, environ):
+        # type: (EnvironType) -> Dict[str, str]
+        headers = {}
+        for key, value in environ.items():
+            if key.startswith('HTTP_'):
+                headers[key[5:].replace('_', '-').lower()] = value
+        if environ.get('CONTENT_TYPE'):
+            headers['content-type'] = environ['CONTENT_TYPE']
+        if environ.get('CONTENT_LENGTH'):
+            headers['content-length'] = environ['CONTENT_LENGTH']
+        return headers
+
+    def _read_body(self, environ):
+        # type: (EnvironType) -> Optional[bytes]
+        try:
+            content_length = int(environ.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            content_length = 0
+        if content_length > 0:
+            return environ['wsgi.input'].read(content_length)
+        if environ.get('wsgi.input_terminated'):
+            # The server has removed the chunked transfer encoding, so
+            # the body can be read until the end.
+            return environ['wsgi.input'].read() or None
+        return None
+
+    def _send_response(self, start_response, status_code, headers, body):
+        # type: (StartResponseType, int, Dict[str, Any], Any) -> List[bytes]
+        if body is None:
+            body = b''
+        elif not isinstance(body, bytes):
+            body = body.encode('utf-8')
+        header_list = []  # type: List[Tuple[str, str]]
+        has_content_type = False
+        for name, value in headers.items():
+            lowered = name.lower()
+            if lowered == 'content-length':
+                continue
+            if lowered == 'content-type':
+                has_content_type = True
+            header_list.append((str(name), str(value)))
+        if not has_content_type and body:
+            header_list.append(('Content-Type', 'application/json'))
+        header_list.append(('Content-Length', str(len(body))))
+        status = '%s %s' % (status_code,
+                            http_client.responses.get(status_code, ''))
+        start_response(status.rstrip(), header_list)
+        return [body]
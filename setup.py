@@ -8,7 +8,7 @@ with open('README.rst') as readme_file:
 
 install_requires = [
     'click==6.6',
-    'botocore>=1.5.40,<2.0.0',
+    'botocore>=1.19.63,<2.0.0',
     'typing==3.5.3.0',
     'six>=1.10.0,<2.0.0',
     'pip>=9,<10'
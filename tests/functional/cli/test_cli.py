@@ -397,6 +397,40 @@ def test_env_vars_set_in_local(runner, mock_cli_factory,
         assert actual_env['foo'] == 'bar'
 
 
+def test_can_pass_worker_pool_options_to_local(runner, mock_cli_factory):
+    local_server = mock.Mock(spec=local.LocalDevServer)
+    mock_cli_factory.create_local_server.return_value = local_server
+    mock_cli_factory.create_config_obj.return_value = Config.create(
+        project_dir='.', chalice_app=mock.Mock(routes={}))
+    with runner.isolated_filesystem():
+        cli.create_new_project_skeleton('testproject')
+        os.chdir('testproject')
+        result = _run_cli_command(runner, cli.local,
+                                  ['--workers', '4', '--backlog', '16',
+                                   '--keep-alive-timeout', '2.5'],
+                                  cli_factory=mock_cli_factory)
+        assert result.exit_code == 0, result.output
+    kwargs = mock_cli_factory.create_local_server.call_args[1]
+    assert kwargs == {'workers': 4, 'backlog': 16,
+                      'keep_alive_timeout': 2.5, 'processes': None}
+
+
+def test_can_pass_processes_to_local(runner, mock_cli_factory):
+    local_server = mock.Mock(spec=local.LocalDevServer)
+    mock_cli_factory.create_local_server.return_value = local_server
+    mock_cli_factory.create_config_obj.return_value = Config.create(
+        project_dir='.', chalice_app=mock.Mock(routes={}))
+    with runner.isolated_filesystem():
+        cli.create_new_project_skeleton('testproject')
+        os.chdir('testproject')
+        result = _run_cli_command(runner, cli.local, ['--processes', '4'],
+                                  cli_factory=mock_cli_factory)
+        assert result.exit_code == 0, result.output
+    kwargs = mock_cli_factory.create_local_server.call_args[1]
+    assert kwargs['processes'] == 4
+    local_server.serve_forever.assert_called_with()
+
+
 def test_can_specify_profile_for_logs(runner, mock_cli_factory):
     with runner.isolated_filesystem():
         cli.create_new_project_skeleton('testproject')
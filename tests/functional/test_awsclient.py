@@ -1152,6 +1152,20 @@ def test_can_connect_rule_to_lambda(stubbed_session):
     stubbed_session.verify_stubs()
 
 
+def test_can_connect_rule_to_lambda_with_input(stubbed_session):
+    events = stubbed_session.stub('events')
+    events.put_targets(
+        Rule='rule-name',
+        Targets=[{'Id': '1', 'Arn': 'function-arn',
+                  'Input': '{"foo": "bar"}'}]).returns({})
+
+    stubbed_session.activate_stubs()
+    awsclient = TypedAWSClient(stubbed_session)
+    awsclient.connect_rule_to_lambda('rule-name', 'function-arn',
+                                     input_json='{"foo": "bar"}')
+    stubbed_session.verify_stubs()
+
+
 def test_add_permission_for_scheduled_event(stubbed_session):
     lambda_client = stubbed_session.stub('lambda')
     lambda_client.get_policy(FunctionName='function-arn').returns(
@@ -1212,3 +1226,88 @@ def test_can_delete_rule(stubbed_session):
     awsclient = TypedAWSClient(stubbed_session)
     awsclient.delete_rule('rule-name')
     stubbed_session.verify_stubs()
+
+
+class TestSQSEventSources(object):
+    def test_can_get_queue_arn(self, stubbed_session):
+        sqs = stubbed_session.stub('sqs')
+        sqs.get_queue_url(QueueName='myqueue').returns(
+            {'QueueUrl': 'https://queue-url'})
+        sqs.get_queue_attributes(
+            QueueUrl='https://queue-url',
+            AttributeNames=['QueueArn']).returns(
+                {'Attributes': {'QueueArn': 'queue-arn'}})
+
+        stubbed_session.activate_stubs()
+        awsclient = TypedAWSClient(stubbed_session)
+        assert awsclient.get_sqs_queue_arn('myqueue') == 'queue-arn'
+        stubbed_session.verify_stubs()
+
+    def test_queue_does_not_exist(self, stubbed_session):
+        sqs = stubbed_session.stub('sqs')
+        sqs.get_queue_url(QueueName='myqueue').raises_error(
+            error_code='AWS.SimpleQueueService.NonExistentQueue',
+            message='The specified queue does not exist.')
+
+        stubbed_session.activate_stubs()
+        awsclient = TypedAWSClient(stubbed_session)
+        with pytest.raises(ResourceDoesNotExistError):
+            awsclient.get_sqs_queue_arn('myqueue')
+        stubbed_session.verify_stubs()
+
+    def test_can_create_sqs_event_source(self, stubbed_session):
+        lambda_stub = stubbed_session.stub('lambda')
+        lambda_stub.list_event_source_mappings(
+            EventSourceArn='queue-arn',
+            FunctionName='function-arn').returns({'EventSourceMappings': []})
+        lambda_stub.create_event_source_mapping(
+            EventSourceArn='queue-arn',
+            FunctionName='function-arn',
+            BatchSize=5,
+            FunctionResponseTypes=['ReportBatchItemFailures'],
+        ).returns({'UUID': 'my-uuid'})
+
+        stubbed_session.activate_stubs()
+        awsclient = TypedAWSClient(stubbed_session)
+        uuid = awsclient.create_sqs_event_source(
+            'queue-arn', 'function-arn', 5)
+        assert uuid == 'my-uuid'
+        stubbed_session.verify_stubs()
+
+    def test_updates_existing_sqs_event_source(self, stubbed_session):
+        lambda_stub = stubbed_session.stub('lambda')
+        lambda_stub.list_event_source_mappings(
+            EventSourceArn='queue-arn',
+            FunctionName='function-arn').returns(
+                {'EventSourceMappings': [{'UUID': 'my-uuid'}]})
+        lambda_stub.update_event_source_mapping(
+            UUID='my-uuid',
+            FunctionName='function-arn',
+            BatchSize=10,
+            FunctionResponseTypes=['ReportBatchItemFailures'],
+        ).returns({'UUID': 'my-uuid'})
+
+        stubbed_session.activate_stubs()
+        awsclient = TypedAWSClient(stubbed_session)
+        uuid = awsclient.create_sqs_event_source(
+            'queue-arn', 'function-arn', 10)
+        assert uuid == 'my-uuid'
+        stubbed_session.verify_stubs()
+
+    def test_can_remove_sqs_event_sources(self, stubbed_session):
+        lambda_stub = stubbed_session.stub('lambda')
+        lambda_stub.list_event_source_mappings(
+            FunctionName='function-arn').returns({
+                'EventSourceMappings': [
+                    {'UUID': 'sqs-uuid',
+                     'EventSourceArn': 'arn:aws:sqs:us-west-2:1:myqueue'},
+                    {'UUID': 'kinesis-uuid',
+                     'EventSourceArn': 'arn:aws:kinesis:us-west-2:1:stream'},
+                ]
+            })
+        lambda_stub.delete_event_source_mapping(UUID='sqs-uuid').returns({})
+
+        stubbed_session.activate_stubs()
+        awsclient = TypedAWSClient(stubbed_session)
+        awsclient.remove_sqs_event_sources('function-arn')
+        stubbed_session.verify_stubs()
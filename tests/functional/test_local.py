@@ -1,8 +1,16 @@
+import os
+import json
+import socket
+import signal
+import threading
+
 from pytest import fixture
+from six.moves import http_client
 
 from chalice import app
 from chalice.config import Config
 from chalice.local import LocalDevServer
+from chalice.local import create_local_server
 
 
 @fixture
@@ -14,6 +22,8 @@ def sample_app():
     def index():
         return {'hello': 'world'}
 
+    return demo
+
 
 def test_does_use_daemon_threads(sample_app):
     server = LocalDevServer(
@@ -21,3 +31,73 @@ def test_does_use_daemon_threads(sample_app):
     )
 
     assert server.server.daemon_threads is True
+
+
+def test_worker_pool_serves_keep_alive_requests(sample_app):
+    server = create_local_server(sample_app, Config(), '127.0.0.1', 0,
+                                 workers=2, backlog=4)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        port = server.server.server_port
+        conn = http_client.HTTPConnection('127.0.0.1', port, timeout=5)
+        # Both requests are sent on the same kept alive connection.
+        for _ in range(2):
+            conn.request('GET', '/index')
+            response = conn.getresponse()
+            assert response.status == 200
+            assert json.loads(response.read().decode('utf-8')) == {
+                'hello': 'world'}
+        conn.close()
+    finally:
+        server.server.shutdown()
+        server.server.server_close()
+
+
+def test_prefork_server_restarts_crashed_workers():
+    demo = app.Chalice('demo-app')
+
+    @demo.route('/pid')
+    def pid():
+        return {'pid': os.getpid()}
+
+    @demo.route('/crash')
+    def crash():
+        os._exit(1)
+
+    server = create_local_server(demo, Config(), '127.0.0.1', 0, processes=2)
+    port = server.server.server_port
+    supervisor_pid = os.fork()
+    if supervisor_pid == 0:
+        try:
+            server.serve_forever()
+        finally:
+            os._exit(0)
+    server.server.server_close()
+
+    def get(path):
+        conn = http_client.HTTPConnection('127.0.0.1', port, timeout=5)
+        try:
+            conn.request('GET', path)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read().decode('utf-8'))
+        finally:
+            conn.close()
+
+    try:
+        status, body = get('/pid')
+        assert status == 200
+        assert body['pid'] != supervisor_pid
+        try:
+            get('/crash')
+        except (http_client.HTTPException, socket.error):
+            pass
+        # The other worker keeps serving while the crashed one restarts.
+        for _ in range(5):
+            status, body = get('/pid')
+            assert status == 200
+    finally:
+        os.kill(supervisor_pid, signal.SIGTERM)
+        _, status = os.waitpid(supervisor_pid, 0)
+    assert os.WIFEXITED(status)
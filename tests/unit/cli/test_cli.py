@@ -23,6 +23,22 @@ def test_run_local_server():
         chalice_stage_name=local_stage_test)
 
 
+def test_run_local_server_with_worker_pool():
+    factory = mock.Mock(spec=CLIFactory)
+    factory.create_config_obj.return_value.environment_variables = {}
+    factory.create_config_obj.return_value.chalice_app.routes = {}
+    local_server = mock.Mock(spec=LocalDevServer)
+    factory.create_local_server.return_value = local_server
+    cli.run_local_server(factory, '127.0.0.1', 8000, 'local_test', {},
+                         workers=4, backlog=16, keep_alive_timeout=2)
+    factory.create_local_server.assert_called_with(
+        factory.load_chalice_app.return_value,
+        factory.create_config_obj.return_value,
+        '127.0.0.1', 8000, workers=4, backlog=16, keep_alive_timeout=2,
+        processes=None)
+    local_server.serve_forever.assert_called_with()
+
+
 def test_cannot_run_local_mode_with_trailing_slash_route():
     local_stage_test = 'local_test'
     factory = mock.Mock(spec=CLIFactory)
@@ -200,6 +200,43 @@ def test_policy_autogenerated_when_enabled(app_policy,
     assert 'Version' in generated
 
 
+def test_policy_grants_access_to_sqs_queues(app_policy,
+                                            in_memory_osutils,
+                                            sample_app):
+    @sample_app.on_sqs_message(queue='myqueue')
+    def handler(event):
+        pass
+
+    in_memory_osutils.filemap[os.path.join('.', 'app.py')] = ''
+    config = Config.create(project_dir='.', autogen_policy=True,
+                           chalice_app=sample_app)
+    generated = app_policy.generate_policy_from_app_source(config)
+    sqs_statements = [s for s in generated['Statement']
+                      if 'sqs:ReceiveMessage' in s['Action']]
+    assert sqs_statements == [{
+        'Effect': 'Allow',
+        'Action': ['sqs:ReceiveMessage', 'sqs:DeleteMessage',
+                   'sqs:GetQueueAttributes'],
+        'Resource': ['arn:aws:sqs:*:*:myqueue'],
+    }]
+
+
+def test_policy_allows_keep_warm_fan_out(app_policy,
+                                         in_memory_osutils,
+                                         sample_app):
+    sample_app.keep_warm(concurrency=2)
+    in_memory_osutils.filemap[os.path.join('.', 'app.py')] = ''
+    config = Config.create(project_dir='.', autogen_policy=True,
+                           app_name='myapp', chalice_stage='dev',
+                           chalice_app=sample_app)
+    generated = app_policy.generate_policy_from_app_source(config)
+    assert {
+        'Effect': 'Allow',
+        'Action': ['lambda:InvokeFunction'],
+        'Resource': ['arn:aws:lambda:*:*:function:myapp-dev'],
+    } in generated['Statement']
+
+
 def test_can_load_non_stage_specific_name(app_policy, in_memory_osutils):
     # This is a test for backcompat loading of .chalice/policy.json
     # for the dev stage.  The default name is suppose to include
@@ -858,6 +895,39 @@ def test_lambda_deployer_delete_rule(ui):
     aws_client.delete_rule.assert_called_with(rule_name='name')
 
 
+def test_lambda_deployer_delete_sqs_event_source(ui):
+    aws_client = mock.Mock(spec=TypedAWSClient)
+    aws_client.get_role_arn_for_name.return_value = 'arn_prefix/role_name'
+    deployed = DeployedResources(
+        'api', 'api_handler_arn/lambda_name', 'api-handler',
+        None, 'dev', None, None, {'name': {'arn': 'sqs-arn',
+                                           'type': 'sqs_event'}})
+    ui.confirm.return_value = True
+    d = LambdaDeployer(
+        aws_client, None, ui, None, None)
+    d.delete(deployed)
+
+    aws_client.remove_sqs_event_sources.assert_called_with('sqs-arn')
+    assert aws_client.delete_function.call_args_list == [
+        mock.call('api-handler'),
+        mock.call('sqs-arn'),
+    ]
+
+
+def test_lambda_deployer_delete_keep_warm_rule(ui):
+    aws_client = mock.Mock(spec=TypedAWSClient)
+    aws_client.get_role_arn_for_name.return_value = None
+    deployed = DeployedResources(
+        'api', 'api_handler_arn/lambda_name', 'api-handler',
+        None, 'dev', None, None, {}, keep_warm_rule='api-handler-keep-warm')
+    d = LambdaDeployer(
+        aws_client, None, ui, None, None)
+    d.delete(deployed)
+
+    aws_client.delete_rule.assert_called_with(
+        rule_name='api-handler-keep-warm')
+
+
 def test_lambda_deployer_delete_already_deleted(ui):
     lambda_function_name = 'lambda_name'
     aws_client = mock.Mock(spec=TypedAWSClient)
@@ -1117,6 +1187,18 @@ def test_can_validate_updated_custom_binary_types(sample_app):
                                         sample_app.api.binary_types) is None
 
 
+def test_can_validate_wildcard_binary_types(sample_app):
+    sample_app.api.binary_types.append('text/*')
+
+    @sample_app.route('/index', content_types=['application/octet-stream',
+                                               'text/csv'])
+    def index():
+        return {'hello': 'world'}
+
+    assert validate_route_content_types(sample_app.routes,
+                                        sample_app.api.binary_types) is None
+
+
 class TestAuthHandlersAreAuthorized(object):
     def tests_apigateway_adds_auth_handler_policy(self, sample_app_with_auth,
                                                   ui):
@@ -1273,6 +1355,68 @@ class TestLambdaInitialDeploymentWithConfigurations(object):
         self.aws_client.get_or_create_rule_arn.assert_called_with(
             'myapp-dev-foo', 'rate(1 hour)')
 
+    def test_can_create_sqs_event_source(self, sample_app):
+        @sample_app.on_sqs_message(queue='myqueue', batch_size=5)
+        def foo(event):
+            pass
+
+        config = self.create_config_obj(sample_app)
+        deployer = LambdaDeployer(
+            self.aws_client, self.packager, self.ui, self.osutils,
+            self.app_policy)
+        self.aws_client.lambda_function_exists.return_value = False
+        self.aws_client.get_sqs_queue_arn.return_value = 'queue-arn'
+        self.aws_client.create_function.side_effect = [
+            self.lambda_arn, 'arn:sqs-function']
+        deployed = deployer.deploy(config, None, stage_name='dev')
+        assert deployed['lambda_functions'] == {
+            'myapp-dev-foo': {'arn': 'arn:sqs-function',
+                              'type': 'sqs_event'}
+        }
+        self.aws_client.get_sqs_queue_arn.assert_called_with('myqueue')
+        self.aws_client.create_sqs_event_source.assert_called_with(
+            'queue-arn', 'arn:sqs-function', 5)
+        assert not self.aws_client.get_or_create_rule_arn.called
+
+    def test_can_create_keep_warm_rule(self, sample_app):
+        sample_app.keep_warm(rate='rate(5 minutes)', concurrency=2)
+        config = self.create_config_obj(sample_app)
+        deployer = LambdaDeployer(
+            self.aws_client, self.packager, self.ui, self.osutils,
+            self.app_policy)
+        self.aws_client.lambda_function_exists.return_value = False
+        self.aws_client.get_or_create_rule_arn.return_value = 'rule-arn'
+        self.aws_client.create_function.return_value = self.lambda_arn
+        deployed = deployer.deploy(config, None, stage_name='dev')
+        assert deployed['keep_warm_rule'] == 'myapp-dev-keep-warm'
+        self.aws_client.get_or_create_rule_arn.assert_called_with(
+            'myapp-dev-keep-warm', 'rate(5 minutes)')
+        self.aws_client.connect_rule_to_lambda.assert_called_with(
+            'myapp-dev-keep-warm', self.lambda_arn,
+            input_json='{"chalice_keep_warm": {"concurrency": 2}}')
+        self.aws_client.add_permission_for_scheduled_event.assert_called_with(
+            'rule-arn', self.lambda_arn)
+
+    def test_keep_warm_rule_deleted_when_removed(self, sample_app):
+        config = self.create_config_obj(sample_app)
+        deployer = LambdaDeployer(
+            self.aws_client, self.packager, self.ui, self.osutils,
+            self.app_policy)
+        self.aws_client.lambda_function_exists.return_value = True
+        self.aws_client.update_function.return_value = {
+            'FunctionArn': self.lambda_arn}
+        existing = DeployedResources(
+            backend='api', api_handler_arn=self.lambda_arn,
+            api_handler_name='myapp-dev', rest_api_id='rest-api-id',
+            api_gateway_stage='dev', region='us-west-2',
+            chalice_version='0', lambda_functions={},
+            keep_warm_rule='myapp-dev-keep-warm')
+        deployed = deployer.deploy(config, existing, stage_name='dev')
+        assert 'keep_warm_rule' not in deployed
+        self.aws_client.delete_rule.assert_called_with(
+            rule_name='myapp-dev-keep-warm')
+        assert not self.aws_client.get_or_create_rule_arn.called
+
     def test_can_create_pure_lambda_functions(self, sample_app):
         @sample_app.lambda_function()
         def foo(event, context):
@@ -21,6 +21,16 @@ def test_can_add_binary_media_types(swagger_gen):
     assert sorted(media_types) == sorted(app.api.binary_types)
 
 
+def test_compression_adds_wildcard_binary_media_type(swagger_gen):
+    app = Chalice('test-binary')
+    app.api.compression = True
+    doc = swagger_gen.generate_swagger(app)
+    media_types = doc.get('x-amazon-apigateway-binary-media-types')
+    assert sorted(media_types) == sorted(app.api.binary_types + ['*/*'])
+    # The app's own binary types are unchanged.
+    assert '*/*' not in app.api.binary_types
+
+
 def test_can_produce_swagger_top_level_keys(sample_app, swagger_gen):
     swagger_doc = swagger_gen.generate_swagger(sample_app)
     assert swagger_doc['swagger'] == '2.0'
@@ -510,3 +520,57 @@ def test_will_custom_auth_with_cfn(sample_app):
             }
         }
     }
+
+
+def test_body_schema_added_as_request_model(sample_app, swagger_gen):
+    schema = {'type': 'object', 'properties': {'name': {'type': 'string'}},
+              'required': ['name']}
+
+    @sample_app.route('/users', methods=['POST'], body_schema=schema)
+    def create_user():
+        pass
+
+    doc = swagger_gen.generate_swagger(sample_app)
+    single_method = doc['paths']['/users']['post']
+    model_ref = single_method['parameters'][0]['schema']['$ref']
+    model_name = model_ref.split('/')[-1]
+    assert model_name.isalnum()
+    assert single_method['parameters'] == [
+        {'name': 'body', 'in': 'body', 'required': True,
+         'schema': {'$ref': '#/definitions/%s' % model_name}}]
+    assert doc['definitions'][model_name] == schema
+    assert single_method['x-amazon-apigateway-request-validator'] == (
+        'body-only')
+    validators = doc['x-amazon-apigateway-request-validators']
+    assert validators['body-only'] == {
+        'validateRequestBody': True, 'validateRequestParameters': False}
+    # Routes without schemas aren't validated.
+    assert 'x-amazon-apigateway-request-validator' not in (
+        doc['paths']['/']['get'])
+
+
+def test_query_schema_added_as_request_parameters(sample_app, swagger_gen):
+    @sample_app.route('/users/{user_id}', query_schema={
+        'type': 'object',
+        'properties': {'limit': {'type': 'integer'},
+                       'after': {'type': 'string'},
+                       'sort': {'enum': ['asc', 'desc']}},
+        'required': ['limit'],
+    })
+    def list_users(user_id):
+        pass
+
+    doc = swagger_gen.generate_swagger(sample_app)
+    single_method = doc['paths']['/users/{user_id}']['get']
+    assert single_method['parameters'] == [
+        {'name': 'user_id', 'in': 'path', 'required': True,
+         'type': 'string'},
+        {'name': 'after', 'in': 'query', 'required': False,
+         'type': 'string'},
+        {'name': 'limit', 'in': 'query', 'required': True,
+         'type': 'integer'},
+        {'name': 'sort', 'in': 'query', 'required': False,
+         'type': 'string'},
+    ]
+    assert single_method['x-amazon-apigateway-request-validator'] == (
+        'params-only')
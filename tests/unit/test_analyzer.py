@@ -557,6 +557,60 @@ def test_can_analyze_schedule():
     """) == {'s3': set(['list_buckets'])}
 
 
+def test_can_analyze_sqs_handler():
+    assert chalice_aws_calls("""\
+        from chalice import Chalice
+        import boto3
+        app = Chalice(app_name='james1')
+        s3cli = boto3.client('s3')
+        @app.on_sqs_message(queue='myqueue')
+        def index(event):
+            s3cli.list_buckets()
+            return {}
+    """) == {'s3': set(['list_buckets'])}
+
+
+def test_can_analyze_client_registry_attributes():
+    assert chalice_aws_calls("""\
+        from chalice import Chalice
+        app = Chalice(app_name='james1')
+        @app.route('/')
+        def index():
+            app.clients.dynamodb.put_item()
+            app.clients.cognito_idp.list_users()
+            return {}
+    """) == {'dynamodb': set(['put_item']),
+             'cognito-idp': set(['list_users'])}
+
+
+def test_can_analyze_client_registry_get():
+    assert chalice_aws_calls("""\
+        import chalice
+        app = chalice.Chalice(app_name='james1')
+        s3 = app.clients.get('s3', region='us-east-1')
+        @app.on_sqs_message(queue='myqueue')
+        def index(event):
+            s3.put_object()
+    """) == {'s3': set(['put_object'])}
+
+
+def test_can_analyze_client_registry_with_aliased_import():
+    assert aws_calls("""\
+        from chalice import Chalice as App
+        app = App(app_name='james1')
+        clients = app.clients
+        clients.sqs.send_message()
+    """) == {'sqs': set(['send_message'])}
+
+
+def test_client_registry_requires_chalice_app():
+    assert aws_calls("""\
+        from somewhere import Chalice
+        app = Chalice(app_name='james1')
+        app.clients.dynamodb.put_item()
+    """) == {}
+
+
 def test_can_analyze_combination():
     assert chalice_aws_calls("""\
         from chalice import Chalice
@@ -1,8 +1,15 @@
 import sys
+import os
 import base64
 import logging
 import json
+import zlib
+import signal
+import time
+import threading
+import decimal
 
+import mock
 import pytest
 from pytest import fixture
 import hypothesis.strategies as st
@@ -131,6 +138,28 @@ def test_can_encode_binary_body_as_base64(sample_app):
     assert encoded_response['body'] == 'Zm9vYmFy'
 
 
+def test_can_return_binary_body_without_base64(sample_app):
+    response = app.Response(
+        status_code=200,
+        body=b'foobar',
+        headers={'Content-Type': 'application/octet-stream'}
+    )
+    encoded_response = response.to_dict(sample_app.api.binary_types,
+                                        base64_encode=False)
+    assert encoded_response['body'] == b'foobar'
+    assert 'isBase64Encoded' not in encoded_response
+
+
+def test_invalid_binary_body_throws_value_error_without_base64(sample_app):
+    response = app.Response(
+        status_code=200,
+        body=u'foobar',
+        headers={'Content-Type': 'application/octet-stream'}
+    )
+    with pytest.raises(ValueError):
+        response.to_dict(sample_app.api.binary_types, base64_encode=False)
+
+
 def test_can_return_unicode_body(sample_app):
     unicode_data = u'\u2713'
     response = app.Response(
@@ -159,7 +188,7 @@ def test_can_encode_binary_json(sample_app):
         headers={'Content-Type': 'application/json'}
     )
     encoded_response = response.to_dict(sample_app.api.binary_types)
-    assert encoded_response['body'] == 'eyJmb28iOiAiYmFyIn0='
+    assert encoded_response['body'] == 'eyJmb28iOiJiYXIifQ=='
 
 
 def test_can_parse_route_view_args():
@@ -266,6 +295,41 @@ def test_no_view_function_found(sample_app, create_event):
         sample_app(bad_path, context=None)
 
 
+def test_freeze_compiles_dispatch_table(sample_app):
+    dispatch_table = sample_app.freeze()
+    assert sorted(dispatch_table) == [('/index', 'GET'),
+                                      ('/name/{name}', 'GET')]
+    compiled = dispatch_table[('/name/{name}', 'GET')]
+    assert compiled.route_entry is sample_app.routes['/name/{name}']['GET']
+    assert compiled.view_args == ('name',)
+    assert compiled.content_types.media_ranges == ('application/json',)
+    assert compiled.cors_headers is None
+    assert compiled.binary_types.media_ranges == tuple(
+        sample_app.api.binary_types)
+
+
+def test_compiled_route_precomputes_cors_headers():
+    demo = app.Chalice('app-name')
+
+    @demo.route('/cors', cors=app.CORSConfig(max_age=600))
+    def cors():
+        return {}
+
+    compiled = demo.freeze()[('/cors', 'GET')]
+    assert compiled.cors_headers['Access-Control-Max-Age'] == '600'
+
+
+def test_routes_added_after_freeze_are_dispatched(sample_app, create_event):
+    sample_app.freeze()
+
+    @sample_app.route('/late')
+    def late():
+        return {'late': True}
+
+    response = sample_app(create_event('/late', 'GET', {}), context=None)
+    assert json_response_body(response) == {'late': True}
+
+
 def test_can_access_context(create_event):
     demo = app.Chalice('app-name')
 
@@ -282,6 +346,28 @@ def test_can_access_context(create_event):
     assert result == serialized_lambda_context
 
 
+def test_request_headers_are_case_insensitive():
+    request = app.Request({}, {'Content-Type': 'text/plain'}, {}, 'GET',
+                          None, {}, {}, False)
+    assert request.headers['content-type'] == 'text/plain'
+    assert request.headers['CONTENT-TYPE'] == 'text/plain'
+
+
+def test_json_body_when_request_has_no_headers():
+    request = app.Request({}, None, {}, 'GET', '{}', {}, {}, False)
+    assert request.json_body is None
+    assert dict(request.headers) == {}
+
+
+@pytest.mark.parametrize('obj', [
+    app.Request({}, {}, {}, 'GET', None, {}, {}, False),
+    app.Response(body='foo'),
+    app.RouteEntry(lambda: None, 'view', '/', 'GET'),
+])
+def test_hot_path_objects_use_slots(obj):
+    assert not hasattr(obj, '__dict__')
+
+
 def test_can_access_raw_body(create_event):
     demo = app.Chalice('app-name')
 
@@ -476,7 +562,7 @@ def test_can_return_response_object(create_event):
 
     event = create_event('/index', 'GET', {})
     response = demo(event, context=None)
-    assert response == {'statusCode': 200, 'body': '{"foo": "bar"}',
+    assert response == {'statusCode': 200, 'body': '{"foo":"bar"}',
                         'headers': {'Content-Type': 'application/json'}}
 
 
@@ -1339,3 +1425,2093 @@ def test_handles_binary_responses(body, content_type):
     assert serialized['isBase64Encoded']
     assert isinstance(serialized['body'], six.string_types)
     assert isinstance(base64.b64decode(serialized['body']), bytes)
+
+
+class UppercaseKeysCodec(app.JSONCodec):
+    # A codec that makes it obvious in a test when it was used.
+    def dumps(self, obj):
+        if isinstance(obj, dict):
+            obj = {k.upper(): v for k, v in obj.items()}
+        return super(UppercaseKeysCodec, self).dumps(obj)
+
+    def loads(self, data):
+        obj = super(UppercaseKeysCodec, self).loads(data)
+        return {k.upper(): v for k, v in obj.items()}
+
+
+def test_default_json_codec_is_compact_and_handles_decimals():
+    codec = app.JSONCodec()
+    assert codec.dumps({'a': [1, decimal.Decimal('1.5')]}) == '{"a":[1,1.5]}'
+    assert codec.loads(b'{"a":1}') == {'a': 1}
+
+
+def test_can_create_json_codec_by_name():
+    assert isinstance(app.get_json_codec('json'), app.JSONCodec)
+    assert app.Chalice('app-name', json_codec='json').json_codec.name == 'json'
+
+
+def test_unknown_json_codec_name_raises_error():
+    with pytest.raises(ValueError):
+        app.get_json_codec('unknown-codec')
+
+
+def test_auto_json_codec_falls_back_to_stdlib():
+    # A value of None in sys.modules makes the import raise ImportError.
+    missing = {'orjson': None, 'rapidjson': None, 'ujson': None}
+    with mock.patch.dict(sys.modules, missing):
+        codec = app.get_json_codec('auto')
+    assert codec.name == 'json'
+
+
+@pytest.mark.parametrize('name', ['orjson', 'rapidjson', 'ujson'])
+def test_third_party_json_codecs(name):
+    pytest.importorskip(name)
+    codec = app.get_json_codec(name)
+    body = codec.dumps({'a': [1, decimal.Decimal('1.5')], 'b': 'c'})
+    assert isinstance(body, str)
+    assert json.loads(body) == {'a': [1, 1.5], 'b': 'c'}
+    assert codec.loads(b'{"a":1}') == {'a': 1}
+
+
+class StrictJSONCodec(app._ThirdPartyJSONCodec):
+    # Rejects the values the third party libraries reject: keys that
+    # aren't strings and mappings that aren't dicts.
+    def _dumps(self, obj):
+        self._check_keys(obj)
+        return json.dumps(obj, separators=(',', ':'))
+
+    def _check_keys(self, obj):
+        if isinstance(obj, dict):
+            for key, value in obj.items():
+                if not isinstance(key, six.string_types):
+                    raise TypeError('Dict key must be str')
+                self._check_keys(value)
+        elif isinstance(obj, list):
+            for value in obj:
+                self._check_keys(value)
+
+
+def test_third_party_codecs_normalized_like_stdlib_codec():
+    value = {
+        'params': [app.MultiDict({'a': 'b'}, {'a': ['a', 'b']})],
+        2: 'int', 1.5: 'float', True: 'bool', None: 'none',
+        'total': decimal.Decimal('1.5'),
+    }
+    assert StrictJSONCodec().dumps(value) == app.JSONCodec().dumps(value)
+    with pytest.raises(TypeError):
+        StrictJSONCodec().dumps({(1, 2): 'tuple'})
+
+
+@pytest.mark.parametrize('name', ['orjson', 'rapidjson', 'ujson'])
+def test_third_party_codecs_serialize_multidict_and_int_keys(name):
+    pytest.importorskip(name)
+    codec = app.get_json_codec(name)
+    value = {'params': app.MultiDict({'a': 'b'}), 1: 'one'}
+    assert json.loads(codec.dumps(value)) == {
+        'params': {'a': 'b'}, '1': 'one'}
+
+
+def test_ujson_codec_writes_bool_keys_with_str():
+    pytest.importorskip('ujson')
+    # A documented difference from the stdlib codec.
+    assert json.loads(app.get_json_codec('ujson').dumps({True: 1})) == {
+        'True': 1}
+
+
+def test_json_codec_used_for_request_and_response(create_event_with_body):
+    demo = app.Chalice('app-name', json_codec=UppercaseKeysCodec())
+
+    @demo.route('/', methods=['POST'])
+    def index():
+        return demo.current_request.json_body
+
+    event = create_event_with_body({'foo': 'bar'})
+    response = demo(event, context=None)
+    assert json_response_body(response) == {'FOO': 'bar'}
+
+
+def test_json_codec_used_for_error_responses(create_event):
+    demo = app.Chalice('app-name', json_codec=UppercaseKeysCodec())
+
+    @demo.route('/')
+    def index():
+        return {}
+
+    response = demo(create_event('/', 'PUT', {}), context=None)
+    assert response['statusCode'] == 405
+    assert json_response_body(response)['CODE'] == 'MethodNotAllowedError'
+
+
+@fixture
+def compressed_app():
+    demo = app.Chalice('app-name')
+    demo.api.compression = app.CompressionConfig(minimum_size=10)
+
+    @demo.route('/large')
+    def large():
+        return {'data': 'x' * 100}
+
+    @demo.route('/small')
+    def small():
+        return {'a': 1}
+
+    @demo.route('/binary')
+    def binary():
+        return app.Response(body=b'\x00' * 100,
+                            headers={'Content-Type': 'image/png'})
+
+    @demo.route('/encoded')
+    def encoded():
+        return app.Response(body='x' * 100,
+                            headers={'Content-Type': 'text/plain',
+                                     'Content-Encoding': 'identity'})
+
+    return demo
+
+
+def create_event_with_accept_encoding(create_event, uri, accept_encoding):
+    event = create_event(uri, 'GET', {})
+    event['headers']['Accept-Encoding'] = accept_encoding
+    return event
+
+
+def test_can_enable_compression_with_bool():
+    demo = app.Chalice('app-name')
+    assert demo.api.compression is None
+    demo.api.compression = True
+    assert isinstance(demo.api.compression, app.CompressionConfig)
+    demo.api.compression = False
+    assert demo.api.compression is None
+
+
+def test_can_gzip_response(compressed_app, create_event):
+    event = create_event_with_accept_encoding(
+        create_event, '/large', 'gzip, deflate')
+    response = compressed_app(event, context=None)
+    assert response['isBase64Encoded']
+    assert response['headers']['Content-Encoding'] == 'gzip'
+    assert response['headers']['Vary'] == 'Accept-Encoding'
+    body = zlib.decompress(base64.b64decode(response['body']),
+                           16 + zlib.MAX_WBITS)
+    assert json.loads(body.decode('utf-8')) == {'data': 'x' * 100}
+
+
+def test_can_deflate_response(compressed_app, create_event):
+    event = create_event_with_accept_encoding(
+        create_event, '/large', 'gzip;q=0.5, deflate')
+    response = compressed_app(event, context=None)
+    assert response['headers']['Content-Encoding'] == 'deflate'
+    body = zlib.decompress(base64.b64decode(response['body']))
+    assert json.loads(body.decode('utf-8')) == {'data': 'x' * 100}
+
+
+def test_no_compression_without_accept_encoding(compressed_app, create_event):
+    response = compressed_app(create_event('/large', 'GET', {}),
+                              context=None)
+    assert 'Content-Encoding' not in response['headers']
+    assert response['headers']['Vary'] == 'Accept-Encoding'
+    assert json_response_body(response) == {'data': 'x' * 100}
+
+
+def test_no_compression_below_minimum_size(compressed_app, create_event):
+    event = create_event_with_accept_encoding(create_event, '/small', 'gzip')
+    response = compressed_app(event, context=None)
+    assert 'Content-Encoding' not in response['headers']
+    assert json_response_body(response) == {'a': 1}
+
+
+def test_no_compression_for_binary_types(compressed_app, create_event):
+    event = create_event_with_accept_encoding(create_event, '/binary', 'gzip')
+    event['headers']['Accept'] = 'image/png'
+    response = compressed_app(event, context=None)
+    assert 'Content-Encoding' not in response['headers']
+    assert base64.b64decode(response['body']) == b'\x00' * 100
+
+
+def test_no_compression_if_view_sets_encoding(compressed_app, create_event):
+    event = create_event_with_accept_encoding(create_event, '/encoded', 'gzip')
+    response = compressed_app(event, context=None)
+    assert response['headers']['Content-Encoding'] == 'identity'
+    assert response['body'] == 'x' * 100
+
+
+def test_etag_is_not_added_to_view_headers(create_event):
+    demo = app.Chalice('app-name')
+    shared_headers = {'Content-Type': 'text/plain'}
+    bodies = ['first', 'second']
+
+    @demo.route('/', etag=True)
+    def index():
+        return app.Response(body=bodies.pop(0), headers=shared_headers)
+
+    first = demo(create_event('/', 'GET', {}), context=None)
+    second = demo(create_event('/', 'GET', {}), context=None)
+    assert shared_headers == {'Content-Type': 'text/plain'}
+    assert first['headers']['ETag'] != second['headers']['ETag']
+
+
+def test_compression_does_not_modify_view_headers(create_event):
+    demo = app.Chalice('app-name')
+    demo.api.compression = app.CompressionConfig(minimum_size=10)
+    shared_headers = {'Content-Type': 'text/plain', 'ETag': '"abc"'}
+
+    @demo.route('/')
+    def index():
+        return app.Response(body='x' * 100, headers=shared_headers)
+
+    event = create_event_with_accept_encoding(create_event, '/', 'gzip')
+    assert demo(event, context=None)['headers']['Content-Encoding'] == 'gzip'
+    assert shared_headers == {'Content-Type': 'text/plain', 'ETag': '"abc"'}
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert 'Content-Encoding' not in response['headers']
+    assert response['body'] == 'x' * 100
+
+
+@pytest.mark.parametrize('accept_encoding,expected', [
+    ('gzip', 'gzip'),
+    ('deflate, gzip', 'gzip'),
+    ('gzip;q=0.2, deflate;q=0.8', 'deflate'),
+    ('gzip;q=0', None),
+    ('identity', None),
+    ('*', 'gzip'),
+    ('*, gzip;q=0', 'deflate'),
+    ('', None),
+    (None, None),
+])
+def test_compression_selects_encoding(accept_encoding, expected):
+    config = app.CompressionConfig(algorithms=['gzip', 'deflate'])
+    assert config.select_encoding(accept_encoding) == expected
+
+
+def test_unknown_compression_algorithm_raises_error():
+    with pytest.raises(ValueError):
+        app.CompressionConfig(algorithms=['lzma'])
+
+
+@pytest.mark.parametrize('content_type,is_compressible', [
+    ('application/json', True),
+    ('application/json; charset=utf-8', True),
+    ('text/html', True),
+    ('image/png', False),
+    ('application/octet-stream', False),
+])
+def test_compressible_content_types(content_type, is_compressible):
+    config = app.CompressionConfig()
+    assert config.is_compressible(content_type) == is_compressible
+
+
+@fixture
+def etag_app():
+    demo = app.Chalice('app-name')
+
+    @demo.route('/etag', etag=True)
+    def etag():
+        return {'foo': 'bar'}
+
+    @demo.route('/precomputed', etag=True)
+    def precomputed():
+        # A body that can't be serialized verifies that it never is
+        # when a view supplies its own ETag.
+        return app.Response(body=object(), headers={'ETag': '"v1"'})
+
+    @demo.route('/no-etag')
+    def no_etag():
+        return {'foo': 'bar'}
+
+    @demo.route('/error', etag=True)
+    def error():
+        raise NotFoundError('missing')
+
+    return demo
+
+
+def test_etag_added_to_response(etag_app, create_event):
+    response = etag_app(create_event('/etag', 'GET', {}), context=None)
+    assert response['statusCode'] == 200
+    assert response['headers']['ETag'] == app._compute_etag(response['body'])
+    assert json_response_body(response) == {'foo': 'bar'}
+
+
+def test_etag_returns_not_modified(etag_app, create_event):
+    response = etag_app(create_event('/etag', 'GET', {}), context=None)
+    event = create_event('/etag', 'GET', {})
+    event['headers']['If-None-Match'] = response['headers']['ETag']
+    response = etag_app(event, context=None)
+    assert response['statusCode'] == 304
+    assert response['body'] == ''
+    assert 'Content-Type' not in response['headers']
+    assert 'ETag' in response['headers']
+
+
+def test_etag_mismatch_returns_full_response(etag_app, create_event):
+    event = create_event('/etag', 'GET', {})
+    event['headers']['If-None-Match'] = '"other", W/"another"'
+    response = etag_app(event, context=None)
+    assert response['statusCode'] == 200
+    assert json_response_body(response) == {'foo': 'bar'}
+
+
+def test_view_can_provide_precomputed_etag(etag_app, create_event):
+    event = create_event('/precomputed', 'GET', {})
+    event['headers']['If-None-Match'] = 'W/"v1"'
+    response = etag_app(event, context=None)
+    assert response['statusCode'] == 304
+    assert response['headers']['ETag'] == '"v1"'
+
+
+def test_no_etag_unless_enabled(etag_app, create_event):
+    response = etag_app(create_event('/no-etag', 'GET', {}), context=None)
+    assert 'ETag' not in response['headers']
+
+
+def test_can_enable_etag_globally(etag_app, create_event):
+    etag_app.api.etag = True
+    etag_app.freeze()
+    response = etag_app(create_event('/no-etag', 'GET', {}), context=None)
+    assert 'ETag' in response['headers']
+
+
+def test_no_etag_for_error_responses(etag_app, create_event):
+    response = etag_app(create_event('/error', 'GET', {}), context=None)
+    assert response['statusCode'] == 404
+    assert 'ETag' not in response['headers']
+
+
+@pytest.mark.parametrize('if_none_match,etag,matches', [
+    ('"a"', '"a"', True),
+    ('W/"a"', '"a"', True),
+    ('"a"', 'W/"a"', True),
+    ('"b", "a"', '"a"', True),
+    ('*', '"a"', True),
+    ('"b"', '"a"', False),
+    ('', '"a"', False),
+])
+def test_etag_matches(if_none_match, etag, matches):
+    assert app._etag_matches(if_none_match, etag) == matches
+
+
+def test_etag_weakened_when_compressed(create_event):
+    demo = app.Chalice('app-name')
+    demo.api.compression = app.CompressionConfig(minimum_size=10)
+
+    @demo.route('/', etag=True)
+    def index():
+        return {'data': 'x' * 100}
+
+    event = create_event('/', 'GET', {})
+    event['headers']['Accept-Encoding'] = 'gzip'
+    response = demo(event, context=None)
+    assert response['headers']['ETag'].startswith('W/"')
+    event['headers']['If-None-Match'] = response['headers']['ETag']
+    not_modified = demo(event, context=None)
+    assert not_modified['statusCode'] == 304
+    # Caches revalidating the response must see the same validator.
+    assert not_modified['headers']['ETag'] == response['headers']['ETag']
+    assert not_modified['headers']['Vary'] == 'Accept-Encoding'
+    assert 'Content-Encoding' not in not_modified['headers']
+
+
+class FakeClock(object):
+    def __init__(self, now=0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@fixture
+def cached_app():
+    demo = app.Chalice('app-name')
+    demo.cache = app.ResponseCache(clock=FakeClock().time)
+    demo.calls = []
+
+    @demo.route('/items/{item_id}',
+                cache=app.CacheConfig(ttl=30, max_entries=2,
+                                      vary_on=['Accept-Language'],
+                                      query_params=['fields']))
+    def item(item_id):
+        demo.calls.append(item_id)
+        return {'item_id': item_id, 'calls': len(demo.calls)}
+
+    return demo
+
+
+def create_item_event(create_event, item_id, query_params=None,
+                      headers=None):
+    event = create_event('/items/{item_id}', 'GET', {'item_id': item_id})
+    event['queryStringParameters'] = query_params
+    if headers:
+        event['headers'].update(headers)
+    return event
+
+
+def test_cache_hit_skips_view(cached_app, create_event):
+    first = cached_app(create_item_event(create_event, '1'), context=None)
+    second = cached_app(create_item_event(create_event, '1'), context=None)
+    assert first == second
+    assert cached_app.calls == ['1']
+    assert cached_app.cache.hits == 1
+    assert cached_app.cache.misses == 1
+
+
+def test_cache_returns_copies(cached_app, create_event):
+    first = cached_app(create_item_event(create_event, '1'), context=None)
+    first['headers']['X-Modified'] = 'true'
+    first['body'] = 'modified'
+    second = cached_app(create_item_event(create_event, '1'), context=None)
+    assert 'X-Modified' not in second['headers']
+    assert json_response_body(second) == {'item_id': '1', 'calls': 1}
+
+
+def test_cache_keyed_on_authorizer_principal(cached_app, create_event):
+    for principal_id in ['alice', 'bob', 'alice']:
+        event = create_item_event(create_event, '1')
+        event['requestContext']['authorizer'] = {'principalId': principal_id}
+        cached_app(event, context=None)
+    assert cached_app.calls == ['1', '1']
+
+
+@pytest.mark.parametrize('context_key,alice,bob', [
+    ('authorizer', {'claims': {'sub': 'alice'}},
+     {'claims': {'sub': 'bob'}}),
+    ('identity', {'userArn': 'arn:aws:iam::1:user/alice'},
+     {'userArn': 'arn:aws:iam::1:user/bob'}),
+    ('identity', {'cognitoIdentityId': 'alice'},
+     {'cognitoIdentityId': 'bob'}),
+])
+def test_cache_keyed_on_caller(cached_app, create_event, context_key,
+                               alice, bob):
+    for caller in [alice, bob, alice]:
+        event = create_item_event(create_event, '1')
+        event['requestContext'][context_key] = caller
+        cached_app(event, context=None)
+    assert cached_app.calls == ['1', '1']
+
+
+def test_middleware_runs_on_cache_hit(cached_app, create_event):
+    allowed = []
+
+    @cached_app.middleware('http')
+    def check_access(request, get_response):
+        if not allowed:
+            return Response(body={'message': 'denied'}, status_code=403)
+        response = get_response(request)
+        response.headers['X-Middleware'] = 'true'
+        response.body['seen'] = True
+        return response
+
+    allowed.append(True)
+    first = cached_app(create_item_event(create_event, '1'), context=None)
+    second = cached_app(create_item_event(create_event, '1'), context=None)
+    assert cached_app.calls == ['1']
+    assert cached_app.cache.hits == 1
+    assert second['headers']['X-Middleware'] == 'true'
+    assert json_response_body(first) == json_response_body(second) == {
+        'item_id': '1', 'calls': 1, 'seen': True}
+    del allowed[:]
+    denied = cached_app(create_item_event(create_event, '1'), context=None)
+    assert denied['statusCode'] == 403
+
+
+def test_cache_keyed_on_selected_query_params(cached_app, create_event):
+    cached_app(create_item_event(create_event, '1', {'fields': 'a'}),
+               context=None)
+    cached_app(create_item_event(create_event, '1', {'fields': 'b'}),
+               context=None)
+    # Query params not listed in the CacheConfig aren't part of the key.
+    cached_app(create_item_event(create_event, '1',
+                                 {'fields': 'a', 'other': 'x'}),
+               context=None)
+    assert cached_app.calls == ['1', '1']
+
+
+def test_cache_keyed_on_vary_on_headers(cached_app, create_event):
+    cached_app(create_item_event(create_event, '1',
+                                 headers={'Accept-Language': 'en'}),
+               context=None)
+    cached_app(create_item_event(create_event, '1',
+                                 headers={'accept-language': 'fr'}),
+               context=None)
+    cached_app(create_item_event(create_event, '1',
+                                 headers={'Accept-Language': 'en'}),
+               context=None)
+    assert cached_app.calls == ['1', '1']
+
+
+def test_cache_entries_expire(create_event):
+    clock = FakeClock()
+    demo = app.Chalice('app-name')
+    demo.cache = app.ResponseCache(clock=clock.time)
+    calls = []
+
+    @demo.route('/', cache=app.CacheConfig(ttl=30))
+    def index():
+        calls.append(1)
+        return {}
+
+    demo(create_event('/', 'GET', {}), context=None)
+    clock.now = 29
+    demo(create_event('/', 'GET', {}), context=None)
+    assert len(calls) == 1
+    clock.now = 30
+    demo(create_event('/', 'GET', {}), context=None)
+    assert len(calls) == 2
+
+
+def test_cache_evicts_least_recently_used(cached_app, create_event):
+    for item_id in ['1', '2', '1', '3', '1', '2']:
+        cached_app(create_item_event(create_event, item_id), context=None)
+    # '2' was evicted when '3' was added because '1' was used more
+    # recently, so it had to be requested again.
+    assert cached_app.calls == ['1', '2', '3', '2']
+    stats = cached_app.cache.stats()['GET /items/{item_id}']
+    assert stats == {'hits': 2, 'misses': 4, 'evictions': 2, 'entries': 2}
+
+
+def test_can_invalidate_cache(cached_app, create_event):
+    cached_app(create_item_event(create_event, '1'), context=None)
+    cached_app(create_item_event(create_event, '2'), context=None)
+    cached_app.cache.invalidate('/items/{item_id}', {'item_id': '1'})
+    cached_app(create_item_event(create_event, '1'), context=None)
+    cached_app(create_item_event(create_event, '2'), context=None)
+    assert cached_app.calls == ['1', '2', '1']
+    cached_app.cache.invalidate()
+    cached_app(create_item_event(create_event, '2'), context=None)
+    assert cached_app.calls == ['1', '2', '1', '2']
+
+
+def test_error_responses_not_cached(create_event):
+    demo = app.Chalice('app-name')
+    calls = []
+
+    @demo.route('/', cache=app.CacheConfig())
+    def index():
+        calls.append(1)
+        raise NotFoundError('missing')
+
+    demo(create_event('/', 'GET', {}), context=None)
+    demo(create_event('/', 'GET', {}), context=None)
+    assert len(calls) == 2
+
+
+def test_cache_only_allowed_for_get_and_head():
+    demo = app.Chalice('app-name')
+    with pytest.raises(ValueError):
+        @demo.route('/', methods=['POST'], cache=app.CacheConfig())
+        def index():
+            pass
+
+
+def test_cache_keyed_on_content_encoding(create_event):
+    demo = app.Chalice('app-name')
+    demo.api.compression = app.CompressionConfig(minimum_size=10)
+
+    @demo.route('/', cache=app.CacheConfig())
+    def index():
+        return {'data': 'x' * 100}
+
+    event = create_event('/', 'GET', {})
+    event['headers']['Accept-Encoding'] = 'gzip'
+    assert demo(event, context=None)['headers']['Content-Encoding'] == 'gzip'
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert 'Content-Encoding' not in response['headers']
+    assert json_response_body(response) == {'data': 'x' * 100}
+
+
+def test_cache_hit_can_return_not_modified(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/', etag=True, cache=app.CacheConfig())
+    def index():
+        return {'foo': 'bar'}
+
+    etag = demo(create_event('/', 'GET', {}), context=None)['headers']['ETag']
+    event = create_event('/', 'GET', {})
+    event['headers']['If-None-Match'] = etag
+    response = demo(event, context=None)
+    assert response['statusCode'] == 304
+    assert demo.cache.hits == 1
+
+
+def test_cold_start_info_recorded_on_first_invocation(create_event):
+    demo = app.Chalice('app-name')
+    seen = []
+
+    @demo.route('/')
+    def index():
+        seen.append(demo.is_cold_start)
+        return {}
+
+    info = demo.cold_start_info
+    assert info.import_time <= info.init_start <= info.init_end
+    assert info.first_invocation_start is None
+    assert info.to_dict()['total_ms'] is None
+    demo(create_event('/', 'GET', {}), context=None)
+    first_end = info.first_invocation_end
+    assert info.init_end <= info.first_invocation_start <= first_end
+    demo(create_event('/', 'GET', {}), context=None)
+    # Only the first invocation is recorded.
+    assert info.first_invocation_end == first_end
+    assert seen == [True, False]
+    assert not demo.is_cold_start
+
+
+def test_cold_start_info_to_dict():
+    info = app.ColdStartInfo(import_time=10.0, init_start=10.5)
+    info.init_end = 10.75
+    info.first_invocation_start = 11.0
+    info.first_invocation_end = 11.25
+    assert info.to_dict() == {
+        'import_to_init_ms': 500.0,
+        'init_ms': 250.0,
+        'init_to_first_invocation_ms': 250.0,
+        'first_invocation_ms': 250.0,
+        'total_ms': 1250.0,
+    }
+
+
+def test_cold_start_logged_once_when_enabled(create_event, capsys):
+    demo = app.Chalice('app-name', log_cold_start=True)
+
+    @demo.route('/')
+    def index():
+        return {}
+
+    context = mock.Mock(aws_request_id='request-id', function_name='func',
+                        memory_limit_in_mb='128')
+    demo(create_event('/', 'GET', {}), context=context)
+    demo(create_event('/', 'GET', {}), context=context)
+    out, _ = capsys.readouterr()
+    lines = out.splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record['type'] == 'chalice.cold_start'
+    assert record['app_name'] == 'app-name'
+    assert record['aws_request_id'] == 'request-id'
+    assert record['function_name'] == 'func'
+    assert record['total_ms'] >= 0
+
+
+def test_cold_start_not_logged_by_default(create_event, capsys):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/')
+    def index():
+        return {}
+
+    demo(create_event('/', 'GET', {}), context=None)
+    out, _ = capsys.readouterr()
+    assert out == ''
+
+
+def test_cold_start_recorded_when_view_raises(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/')
+    def index():
+        raise ValueError('boom')
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 500
+    assert demo.cold_start_info.first_invocation_end is not None
+    assert not demo.is_cold_start
+
+
+def test_middleware_called_in_registration_order(create_event):
+    demo = app.Chalice('app-name')
+    calls = []
+
+    @demo.middleware('http')
+    def first(request, get_response):
+        calls.append('first-before')
+        response = get_response(request)
+        calls.append('first-after')
+        return response
+
+    @demo.middleware('http')
+    def second(request, get_response):
+        calls.append('second-before')
+        response = get_response(request)
+        calls.append('second-after')
+        return response
+
+    @demo.route('/{name}')
+    def index(name):
+        calls.append('view')
+        return {'name': name}
+
+    response = demo(create_event('/{name}', 'GET', {'name': 'foo'}),
+                    context=None)
+    assert json_response_body(response) == {'name': 'foo'}
+    assert calls == ['first-before', 'second-before', 'view',
+                     'second-after', 'first-after']
+
+
+def test_middleware_can_modify_response(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.middleware('http')
+    def add_header(request, get_response):
+        response = get_response(request)
+        response.headers['X-Method'] = request.method
+        return response
+
+    @demo.route('/')
+    def index():
+        return {'foo': 'bar'}
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['headers']['X-Method'] == 'GET'
+    assert json_response_body(response) == {'foo': 'bar'}
+
+
+def test_middleware_can_short_circuit(create_event):
+    demo = app.Chalice('app-name')
+    view_calls = []
+
+    @demo.middleware('http')
+    def deny(request, get_response):
+        return app.Response(body={'denied': True}, status_code=403)
+
+    @demo.route('/')
+    def index():
+        view_calls.append(True)
+        return {}
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 403
+    assert json_response_body(response) == {'denied': True}
+    assert view_calls == []
+
+
+def test_middleware_return_value_converted_to_response(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.middleware('http')
+    def plain(request, get_response):
+        return {'from': 'middleware'}
+
+    @demo.route('/')
+    def index():
+        return {}
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 200
+    assert json_response_body(response) == {'from': 'middleware'}
+
+
+def test_middleware_sees_view_errors_as_responses(create_event):
+    demo = app.Chalice('app-name')
+    status_codes = []
+
+    @demo.middleware('http')
+    def record(request, get_response):
+        response = get_response(request)
+        status_codes.append(response.status_code)
+        return response
+
+    @demo.route('/')
+    def index():
+        raise app.NotFoundError('missing')
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 404
+    assert status_codes == [404]
+
+
+def test_middleware_errors_converted_to_responses(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.middleware('http')
+    def check(request, get_response):
+        if request.method == 'GET':
+            raise app.UnauthorizedError('no')
+        raise ValueError('boom')
+
+    @demo.route('/', methods=['GET', 'POST'])
+    def index():
+        return {}
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 401
+    assert json_response_body(response)['Code'] == 'UnauthorizedError'
+    response = demo(create_event('/', 'POST', {}), context=None)
+    assert response['statusCode'] == 500
+
+
+def test_no_middleware_leaves_route_without_handler(sample_app):
+    dispatch_table = sample_app.freeze()
+    assert all(route.handler is None for route in dispatch_table.values())
+
+
+def test_registering_middleware_invalidates_dispatch_table(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/')
+    def index():
+        return {}
+
+    demo(create_event('/', 'GET', {}), context=None)
+
+    def add_header(request, get_response):
+        response = get_response(request)
+        response.headers['X-Middleware'] = 'true'
+        return response
+
+    demo.register_middleware(add_header)
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['headers']['X-Middleware'] == 'true'
+
+
+def test_unsupported_middleware_event_type():
+    demo = app.Chalice('app-name')
+    with pytest.raises(ValueError):
+        demo.register_middleware(lambda request, get_response: None,
+                                 event_type='s3')
+
+
+def create_sqs_event(bodies, queue='myqueue'):
+    return {
+        'Records': [
+            {
+                'messageId': 'message-%s' % i,
+                'receiptHandle': 'handle-%s' % i,
+                'body': body,
+                'attributes': {'ApproximateReceiveCount': '1'},
+                'messageAttributes': {},
+                'eventSource': 'aws:sqs',
+                'eventSourceARN': 'arn:aws:sqs:us-west-2:12345:%s' % queue,
+                'awsRegion': 'us-west-2',
+            } for i, body in enumerate(bodies)
+        ]
+    }
+
+
+def test_can_register_sqs_handler():
+    demo = app.Chalice('app-name')
+
+    @demo.on_sqs_message(queue='myqueue', batch_size=5, name='worker')
+    def handler(event):
+        pass
+
+    assert len(demo.event_sources) == 1
+    event_source = demo.event_sources[0]
+    assert isinstance(event_source, app.SQSEventSource)
+    assert event_source.name == 'worker'
+    assert event_source.queue == 'myqueue'
+    assert event_source.batch_size == 5
+    assert event_source.handler_string == 'app.handler'
+    assert handler.event_source is event_source
+
+
+@pytest.mark.parametrize('batch_size', [0, 11])
+def test_sqs_batch_size_must_be_valid(batch_size):
+    demo = app.Chalice('app-name')
+    with pytest.raises(ValueError):
+        demo.on_sqs_message(queue='myqueue', batch_size=batch_size)
+
+
+def test_sqs_handler_receives_batch():
+    demo = app.Chalice('app-name')
+    received = []
+
+    @demo.on_sqs_message(queue='myqueue', batch_size=2)
+    def handler(event):
+        for record in event:
+            received.append((record.message_id, record.queue,
+                             record.json_body))
+
+    response = handler(create_sqs_event(['{"a":1}', '{"b":2}']), None)
+    assert response == {'batchItemFailures': []}
+    assert received == [('message-0', 'myqueue', {'a': 1}),
+                        ('message-1', 'myqueue', {'b': 2})]
+
+
+def test_sqs_handler_reports_failed_messages():
+    demo = app.Chalice('app-name')
+
+    @demo.on_sqs_message(queue='myqueue', batch_size=3)
+    def handler(event):
+        for record in event:
+            if record.body == 'bad':
+                event.report_failure(record)
+
+    response = handler(create_sqs_event(['ok', 'bad', 'ok']), None)
+    assert response == {
+        'batchItemFailures': [{'itemIdentifier': 'message-1'}]}
+
+
+def test_sqs_record_body_only_decoded_on_access():
+    codec = mock.Mock(spec=app.JSONCodec)
+    codec.loads.return_value = {'decoded': True}
+    record = app.SQSRecord(create_sqs_event(['{}'])['Records'][0], codec)
+    assert record.body == '{}'
+    assert not codec.loads.called
+    assert record.json_body == {'decoded': True}
+    assert record.json_body == {'decoded': True}
+    assert codec.loads.call_count == 1
+
+
+def test_sqs_event_attributes():
+    event_dict = create_sqs_event(['body'])
+    event = app.SQSEvent(event_dict, context='context')
+    assert len(event) == 1
+    assert event.context == 'context'
+    assert event.to_dict() == event_dict
+    record = list(event)[0]
+    assert record.receipt_handle == 'handle-0'
+    assert record.attributes == {'ApproximateReceiveCount': '1'}
+    assert record.message_attributes == {}
+    assert record.event_source_arn == 'arn:aws:sqs:us-west-2:12345:myqueue'
+    assert record.to_dict() == event_dict['Records'][0]
+
+
+def create_auth_event(token='authtoken'):
+    return {
+        'type': 'TOKEN',
+        'authorizationToken': token,
+        'methodArn': 'arn:aws:execute-api:us-west-2:1:id/dev/GET/a',
+    }
+
+
+def test_authorizer_results_cached_by_token():
+    auth_app = app.Chalice('builtin-auth')
+    tokens = []
+
+    @auth_app.authorizer()
+    def builtin_auth(auth_request):
+        tokens.append(auth_request.token)
+        return app.AuthResponse(routes=['/a'], principal_id=auth_request.token)
+
+    first = builtin_auth(create_auth_event('one'), None)
+    assert builtin_auth(create_auth_event('one'), None) == first
+    builtin_auth(create_auth_event('two'), None)
+    assert tokens == ['one', 'two']
+    assert builtin_auth.cache.hits == 1
+
+
+def test_authorizer_cache_honors_ttl_seconds():
+    auth_app = app.Chalice('builtin-auth')
+    calls = []
+
+    @auth_app.authorizer(ttl_seconds=10)
+    def builtin_auth(auth_request):
+        calls.append(auth_request)
+        return {'principalId': 'user', 'context': {}}
+
+    clock = FakeClock()
+    builtin_auth.cache = app.AuthorizerCache(10, clock=clock.time)
+    builtin_auth(create_auth_event(), None)
+    clock.now = 9
+    builtin_auth(create_auth_event(), None)
+    assert len(calls) == 1
+    clock.now = 10
+    builtin_auth(create_auth_event(), None)
+    assert len(calls) == 2
+
+
+def test_authorizer_cache_disabled_with_zero_ttl():
+    auth_app = app.Chalice('builtin-auth')
+    calls = []
+
+    @auth_app.authorizer(ttl_seconds=0)
+    def builtin_auth(auth_request):
+        calls.append(auth_request)
+        return {'principalId': 'user', 'context': {}}
+
+    builtin_auth(create_auth_event(), None)
+    builtin_auth(create_auth_event(), None)
+    assert builtin_auth.cache is None
+    assert len(calls) == 2
+
+
+def test_authorizer_cache_returns_copies():
+    auth_app = app.Chalice('builtin-auth')
+
+    @auth_app.authorizer()
+    def builtin_auth(auth_request):
+        return {'principalId': 'user', 'context': {'foo': 'bar'}}
+
+    result = builtin_auth(create_auth_event(), None)
+    result['context']['principalId'] = 'changed'
+    assert builtin_auth(create_auth_event(), None) == {
+        'principalId': 'user', 'context': {'foo': 'bar'}}
+
+
+def test_authorizer_errors_not_cached():
+    auth_app = app.Chalice('builtin-auth')
+    calls = []
+
+    @auth_app.authorizer()
+    def builtin_auth(auth_request):
+        calls.append(auth_request)
+        if len(calls) == 1:
+            raise RuntimeError('Unavailable')
+        return {'principalId': 'user', 'context': {}}
+
+    with pytest.raises(RuntimeError):
+        builtin_auth(create_auth_event(), None)
+    assert builtin_auth(create_auth_event(), None)['principalId'] == 'user'
+
+
+def test_authorizer_cache_evicts_least_recently_used():
+    cache = app.AuthorizerCache(ttl_seconds=60, max_entries=2)
+    cache.put('a', {'principalId': 'a'})
+    cache.put('b', {'principalId': 'b'})
+    cache.get('a')
+    cache.put('c', {'principalId': 'c'})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'principalId': 'a'}
+    assert cache.stats()['evictions'] == 1
+    cache.invalidate('a')
+    assert cache.get('a') is None
+
+
+def test_keep_warm_defaults():
+    demo = app.Chalice('app-name')
+    assert demo.keep_warm_config is None
+    demo.keep_warm()
+    assert demo.keep_warm_config.rate.to_string() == 'rate(5 minutes)'
+    assert demo.keep_warm_config.concurrency == 1
+    assert demo.keep_warm_config.to_event() == {
+        'chalice_keep_warm': {'concurrency': 1}}
+
+
+def test_keep_warm_concurrency_must_be_positive():
+    demo = app.Chalice('app-name')
+    with pytest.raises(ValueError):
+        demo.keep_warm(concurrency=0)
+
+
+def test_keep_warm_event_does_not_call_view(sample_app):
+    session = mock.Mock()
+    sample_app.clients = app.ClientRegistry(session=session)
+    sample_app.keep_warm(rate='rate(1 minute)')
+    event = sample_app.keep_warm_config.to_event()
+    assert sample_app(event, FakeLambdaContext()) == {
+        'chalice_keep_warm': True}
+    assert not session.client.called
+
+
+def test_keep_warm_fans_out_to_other_containers(sample_app, monkeypatch):
+    monkeypatch.setattr(app.time, 'sleep', lambda seconds: None)
+    session = mock.Mock()
+    lambda_client = session.client.return_value
+    sample_app.clients = app.ClientRegistry(session=session)
+    context = FakeLambdaContext()
+    context.invoked_function_arn = 'function-arn'
+    sample_app.keep_warm(concurrency=3)
+    response = sample_app(sample_app.keep_warm_config.to_event(), context)
+    assert response == {'chalice_keep_warm': True}
+    assert lambda_client.invoke.call_count == 2
+    kwargs = lambda_client.invoke.call_args[1]
+    assert kwargs['FunctionName'] == 'function-arn'
+    assert kwargs['InvocationType'] == 'Event'
+    assert json.loads(kwargs['Payload']) == {
+        'chalice_keep_warm': {'concurrency': 1, 'hold_seconds': 0.1}}
+
+
+def test_keep_warm_fan_out_errors_are_logged(sample_app, monkeypatch):
+    monkeypatch.setattr(app.time, 'sleep', lambda seconds: None)
+    session = mock.Mock()
+    session.client.return_value.invoke.side_effect = RuntimeError('boom')
+    sample_app.clients = app.ClientRegistry(session=session)
+    context = FakeLambdaContext()
+    context.invoked_function_arn = 'function-arn'
+    event = {'chalice_keep_warm': {'concurrency': 2}}
+    assert sample_app(event, context) == {'chalice_keep_warm': True}
+
+
+def test_client_registry_creates_clients_once():
+    session = mock.Mock()
+    session.client.side_effect = lambda name, **kwargs: mock.Mock(name=name)
+    clients = app.ClientRegistry(session=session, max_pool_connections=25)
+    assert clients.dynamodb is clients.dynamodb
+    assert clients.get('dynamodb') is clients.dynamodb
+    assert session.client.call_count == 1
+    service_name, = session.client.call_args[0]
+    kwargs = session.client.call_args[1]
+    assert service_name == 'dynamodb'
+    assert kwargs['region_name'] is None
+    assert kwargs['config'].max_pool_connections == 25
+
+
+def test_client_registry_keys_clients_by_region():
+    session = mock.Mock()
+    session.client.side_effect = lambda name, **kwargs: mock.Mock()
+    clients = app.ClientRegistry(session=session)
+    east = clients.get('s3', region='us-east-1')
+    assert clients.get('s3', region='us-east-1') is east
+    assert clients.get('s3', region='us-west-2') is not east
+    assert clients.get('s3') is not east
+    assert session.client.call_count == 3
+
+
+def test_client_registry_maps_attribute_names_to_service_names():
+    session = mock.Mock()
+    clients = app.ClientRegistry(session=session)
+    clients.cognito_idp
+    assert session.client.call_args[0] == ('cognito-idp',)
+    with pytest.raises(AttributeError):
+        clients._private
+
+
+class RecordingStream(object):
+    def __init__(self):
+        self.writes = []
+
+    def write(self, data):
+        self.writes.append(data)
+
+    def flush(self):
+        pass
+
+    def records(self):
+        return [json.loads(line) for line in
+                ''.join(self.writes).splitlines()]
+
+
+@fixture
+def log_stream():
+    yield RecordingStream()
+    logging.getLogger('structured-logs').handlers = []
+
+
+def create_structured_app(stream, structured_logs=True):
+    # pytest replaces sys.stdout between test phases, so it's
+    # patched only while the log handler is created.
+    with mock.patch('sys.stdout', stream):
+        demo = app.Chalice('structured-logs', debug=True,
+                           structured_logs=structured_logs)
+
+    @demo.route('/')
+    def index():
+        demo.log.debug('debug message')
+        demo.log.info('info message')
+        demo.log.error('error message')
+        return {}
+
+    @demo.route('/error')
+    def error():
+        try:
+            raise ValueError('bad value')
+        except ValueError:
+            demo.log.exception('view failed')
+        return {}
+
+    return demo
+
+
+def test_structured_logs_disabled_by_default():
+    assert app.Chalice('app-name').structured_logs is None
+
+
+def test_structured_logs_buffered_per_invocation(log_stream, create_event):
+    demo = create_structured_app(log_stream)
+    demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert len(log_stream.writes) == 1
+    records = log_stream.records()
+    assert [r['message'] for r in records] == [
+        'debug message', 'info message', 'error message']
+    assert [r['level'] for r in records] == ['DEBUG', 'INFO', 'ERROR']
+    for record in records:
+        assert record['logger'] == 'structured-logs'
+        assert record['request_id'] == 'id'
+        assert record['method'] == 'GET'
+        assert record['route'] == '/'
+        assert record['latency_ms'] >= 0
+        assert record['timestamp'].endswith('Z')
+
+
+def test_structured_logs_flushed_when_buffer_is_full(log_stream,
+                                                     create_event):
+    demo = create_structured_app(
+        log_stream, app.StructuredLogConfig(capacity=2))
+    demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert len(log_stream.writes) == 2
+    assert len(log_stream.records()) == 3
+
+
+def test_structured_logs_include_exception(log_stream, create_event):
+    demo = create_structured_app(log_stream)
+    demo(create_event('/error', 'GET', {}), FakeLambdaContext())
+    record, = log_stream.records()
+    assert record['message'] == 'view failed'
+    assert 'ValueError: bad value' in record['exception']
+
+
+def test_structured_logs_outside_invocation_not_buffered(log_stream):
+    demo = create_structured_app(log_stream)
+    demo.log.error('outside')
+    record, = log_stream.records()
+    assert record['message'] == 'outside'
+    assert 'request_id' not in record
+
+
+def test_structured_logs_buffered_per_thread(log_stream):
+    demo = create_structured_app(log_stream)
+    handler = demo.log.handlers[0]
+    first_logged = threading.Event()
+    second_done = threading.Event()
+
+    def first_invocation():
+        handler.start_invocation()
+        demo.log.info('first 1')
+        first_logged.set()
+        second_done.wait(5)
+        demo.log.info('first 2')
+        handler.end_invocation()
+
+    def second_invocation():
+        first_logged.wait(5)
+        handler.start_invocation()
+        demo.log.info('second')
+        handler.end_invocation()
+        second_done.set()
+
+    threads = [threading.Thread(target=first_invocation),
+               threading.Thread(target=second_invocation)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [[r['message'] for r in map(json.loads, write.splitlines())]
+            for write in log_stream.writes] == [
+        ['second'], ['first 1', 'first 2']]
+    assert all('latency_ms' in r for r in log_stream.records())
+
+
+def test_structured_logs_sample_debug_records(log_stream, create_event):
+    demo = create_structured_app(
+        log_stream, app.StructuredLogConfig(debug_sample_rate=0))
+    demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert [r['level'] for r in log_stream.records()] == ['INFO', 'ERROR']
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'capacity': 0},
+    {'debug_sample_rate': -0.1},
+    {'debug_sample_rate': 1.5},
+])
+def test_structured_log_config_validation(kwargs):
+    with pytest.raises(ValueError):
+        app.StructuredLogConfig(**kwargs)
+
+
+def emf_records(output):
+    return [json.loads(line) for line in output.splitlines()
+            if '"_aws"' in line]
+
+
+def test_metrics_disabled_by_default(sample_app, create_event, capsys):
+    sample_app.metrics.put('Orders', 1)
+    sample_app(create_event('/index', 'GET', {}), context=None)
+    assert emf_records(capsys.readouterr()[0]) == []
+
+
+def test_metrics_emitted_once_per_invocation(create_event, capsys):
+    demo = app.Chalice('metrics-app', metrics=True)
+
+    @demo.route('/orders/{order_id}')
+    def order(order_id):
+        demo.metrics.put('ItemsOrdered', 3)
+        demo.metrics.put('ItemsOrdered', 2)
+        return {}
+
+    event = create_event('/orders/{order_id}', 'GET', {'order_id': '1'})
+    demo(event, context=None)
+    demo(event, context=None)
+    first, second = emf_records(capsys.readouterr()[0])
+    directive, = first['_aws']['CloudWatchMetrics']
+    assert directive['Namespace'] == 'metrics-app'
+    assert directive['Dimensions'] == [
+        ['Route', 'Method'], ['Route', 'Method', 'StatusCode']]
+    assert [m['Name'] for m in directive['Metrics']] == [
+        'ItemsOrdered', 'Latency', 'Requests', 'ClientErrors', 'Errors',
+        'ColdStarts']
+    assert first['Route'] == '/orders/{order_id}'
+    assert first['Method'] == 'GET'
+    assert first['StatusCode'] == '200'
+    assert first['ItemsOrdered'] == [3, 2]
+    assert first['Latency'] >= 0
+    assert first['Requests'] == 1
+    assert first['Errors'] == 0
+    assert first['ColdStarts'] == 1
+    assert second['ColdStarts'] == 0
+
+
+def test_metrics_count_errors(create_event, capsys):
+    demo = app.Chalice('metrics-app', metrics=True)
+
+    @demo.route('/missing')
+    def missing():
+        raise NotFoundError('missing')
+
+    @demo.route('/broken')
+    def broken():
+        raise ValueError('broken')
+
+    demo(create_event('/missing', 'GET', {}), context=None)
+    demo(create_event('/broken', 'GET', {}), context=None)
+    not_found, server_error = emf_records(capsys.readouterr()[0])
+    assert not_found['StatusCode'] == '404'
+    assert not_found['ClientErrors'] == 1
+    assert not_found['Errors'] == 0
+    assert server_error['StatusCode'] == '500'
+    assert server_error['Errors'] == 1
+
+
+def test_unserializable_metric_does_not_replace_response(
+        create_event, capsys):
+    demo = app.Chalice('metrics-app', metrics=True)
+
+    @demo.route('/')
+    def index():
+        demo.metrics.put('Total', decimal.Decimal('1.5'))
+        return {'hello': 'world'}
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 200
+    record, = emf_records(capsys.readouterr()[0])
+    assert record['Total'] == '1.5'
+
+
+def test_metrics_failure_is_logged(create_event):
+    demo = app.Chalice('metrics-app', metrics=True)
+
+    @demo.route('/')
+    def index():
+        return {'hello': 'world'}
+
+    with mock.patch.object(demo.metrics, 'flush',
+                           side_effect=RuntimeError('boom')), \
+            mock.patch.object(demo.log, 'exception') as log_exception:
+        response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 200
+    assert log_exception.called
+
+
+def test_custom_metrics_without_request_have_no_dimensions():
+    metrics = app.MetricsRecorder('namespace', enabled=True)
+    metrics.put('Processed', 10, 'Count')
+    record = metrics.flush()
+    assert record['Processed'] == 10
+    assert record['_aws']['CloudWatchMetrics'] == [{
+        'Namespace': 'namespace',
+        'Dimensions': [[]],
+        'Metrics': [{'Name': 'Processed', 'Unit': 'Count'}],
+    }]
+    assert metrics.flush() is None
+
+
+def test_metrics_recorded_per_thread():
+    metrics = app.MetricsRecorder('namespace', enabled=True)
+    first_recorded = threading.Event()
+    second_flushed = threading.Event()
+    records = {}
+
+    def first_invocation():
+        metrics.put('First', 1)
+        first_recorded.set()
+        second_flushed.wait(5)
+        records['first'] = metrics.flush()
+
+    def second_invocation():
+        first_recorded.wait(5)
+        metrics.put('Second', 2)
+        records['second'] = metrics.flush()
+        second_flushed.set()
+
+    threads = [threading.Thread(target=first_invocation),
+               threading.Thread(target=second_invocation)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert records['first']['First'] == 1
+    assert 'Second' not in records['first']
+    assert records['second']['Second'] == 2
+    assert 'First' not in records['second']
+
+
+def test_parallel_map_metrics_recorded_for_invocation(create_event,
+                                                      capsys):
+    demo = app.Chalice('metrics-app', metrics=True)
+
+    @demo.route('/')
+    def index():
+        demo.parallel_map(lambda i: demo.metrics.put('Items', i), [1, 2])
+        return {}
+
+    demo(create_event('/', 'GET', {}), context=None)
+    record, = emf_records(capsys.readouterr()[0])
+    assert sorted(record['Items']) == [1, 2]
+
+
+def test_metric_names_cannot_shadow_dimensions():
+    metrics = app.MetricsRecorder('namespace', enabled=True)
+    with pytest.raises(ValueError):
+        metrics.put('Route', 1)
+
+
+def test_no_deadline_by_default(sample_app, create_event):
+    sample_app(create_event('/index', 'GET', {}), FakeLambdaContext())
+    assert sample_app.current_request.deadline is None
+    assert sample_app.current_request.remaining_time() is None
+
+
+def test_deadline_computed_from_remaining_time(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=100)
+    remaining = []
+
+    @demo.route('/')
+    def index():
+        remaining.append(demo.current_request.remaining_time())
+        return {}
+
+    before = time.time()
+    demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    # FakeLambdaContext has 500ms remaining.
+    deadline = demo.current_request.deadline
+    assert before + 0.4 <= deadline <= time.time() + 0.4
+    assert 0 < remaining[0] <= 0.4
+
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'),
+                    reason='Requires SIGALRM')
+def test_view_exceeding_deadline_returns_504(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=450)
+
+    @demo.route('/')
+    def index():
+        time.sleep(2)
+        return {}
+
+    start = time.time()
+    response = demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert time.time() - start < 1
+    assert response['statusCode'] == 504
+    assert json_response_body(response)['Code'] == 'GatewayTimeoutError'
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+    assert signal.getsignal(signal.SIGALRM) == signal.SIG_DFL
+
+
+def test_expired_deadline_does_not_call_view(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=600)
+    called = []
+
+    @demo.route('/')
+    def index():
+        called.append(True)
+        return {}
+
+    response = demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert response['statusCode'] == 504
+    assert not called
+
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'),
+                    reason='Requires SIGALRM')
+def test_deadline_alarm_cleared_after_view_returns(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=100)
+
+    @demo.route('/')
+    def index():
+        assert signal.getitimer(signal.ITIMER_REAL)[0] > 0
+        return {}
+
+    response = demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert response['statusCode'] == 200
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+    assert signal.getsignal(signal.SIGALRM) == signal.SIG_DFL
+
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'),
+                    reason='Requires SIGALRM')
+def test_deadline_alarm_disarmed_before_response_is_converted(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=450)
+
+    @demo.route('/')
+    def index():
+        return {}
+
+    convert_response = demo._convert_response
+
+    def slow_convert_response(route, response):
+        time.sleep(0.1)
+        return convert_response(route, response)
+
+    demo._convert_response = slow_convert_response
+    response = demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert response['statusCode'] == 200
+
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'),
+                    reason='Requires SIGALRM')
+def test_deadline_alarm_restores_previous_timer(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=100)
+
+    @demo.route('/')
+    def index():
+        return {}
+
+    def handler(signum, frame):
+        pass
+
+    previous_handler = signal.signal(signal.SIGALRM, handler)
+    signal.setitimer(signal.ITIMER_REAL, 5, 10)
+    try:
+        response = demo(create_event('/', 'GET', {}), FakeLambdaContext())
+        delay, interval = signal.getitimer(signal.ITIMER_REAL)
+        assert signal.getsignal(signal.SIGALRM) is handler
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous_handler)
+    assert response['statusCode'] == 200
+    assert 4 < delay <= 5
+    assert interval == 10
+
+
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'),
+                    reason='Requires SIGALRM')
+def test_deadline_alarm_cleared_without_python_handler():
+    # signal.signal() returns None if the previous handler was installed
+    # outside of python.
+    alarm = app._DeadlineAlarm(time.time() + 10)
+    with mock.patch('signal.signal', return_value=None) as set_handler:
+        with alarm:
+            assert signal.getitimer(signal.ITIMER_REAL)[0] > 0
+    assert signal.getitimer(signal.ITIMER_REAL) == (0.0, 0.0)
+    set_handler.assert_called_with(signal.SIGALRM, signal.SIG_DFL)
+
+
+@pytest.mark.parametrize('media_ranges,media_type,expected', [
+    (['image/png'], 'image/png', True),
+    (['image/png'], 'IMAGE/PNG; charset=binary', True),
+    (['image/png'], 'image/jpeg', False),
+    (['image/*'], 'image/jpeg', True),
+    (['image/*'], 'text/plain', False),
+    (['*/*'], 'text/plain', True),
+    (['*/*'], '', False),
+    (['text/plain; charset=utf-8'], 'text/plain; charset=UTF-8', True),
+    (['text/plain; charset=utf-8'], 'text/plain', False),
+    (['text/plain; charset=utf-8'], 'text/plain; charset=latin-1', False),
+])
+def test_media_type_matcher_matches(media_ranges, media_type, expected):
+    matcher = app.MediaTypeMatcher(media_ranges)
+    assert matcher.matches(media_type) is expected
+    # The second lookup is cached.
+    assert matcher.matches(media_type) is expected
+    assert (media_type in matcher) is expected
+
+
+@pytest.mark.parametrize('accept,expected', [
+    ('image/png', True),
+    ('text/html, image/png', False),
+    ('text/html;q=0.5, image/png', True),
+    ('image/png;q=0', False),
+    ('*/*', False),
+    ('', False),
+])
+def test_media_type_matcher_accepts_preferred_type(accept, expected):
+    matcher = app.MediaTypeMatcher(['image/png', 'application/octet-stream'])
+    assert matcher.accepts(accept) is expected
+
+
+@pytest.mark.parametrize('accept,expected', [
+    ('application/json', 'application/json'),
+    ('text/csv, application/json', 'text/csv'),
+    ('text/csv;q=0.5, application/json', 'application/json'),
+    ('text/*', 'text/csv'),
+    ('*/*', 'application/json'),
+    ('*/*, application/json;q=0', 'text/csv'),
+    ('text/html', None),
+])
+def test_media_type_matcher_best_match(accept, expected):
+    matcher = app.MediaTypeMatcher(['application/json', 'text/csv'])
+    assert matcher.best_match(accept) == expected
+
+
+def test_can_accept_wildcard_content_types(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/', methods=['POST'], content_types=['image/*'])
+    def index():
+        return {}
+
+    event = create_event('/', 'POST', {}, content_type='image/gif')
+    assert demo(event, context=None)['statusCode'] == 200
+    event = create_event('/', 'POST', {}, content_type='text/plain')
+    assert demo(event, context=None)['statusCode'] == 415
+
+
+def test_wildcard_binary_types_are_base64_encoded(create_event):
+    demo = app.Chalice('app-name')
+    demo.api.binary_types.append('image/*')
+
+    @demo.route('/')
+    def index():
+        return Response(body=b'\x00\x01',
+                        headers={'Content-Type': 'image/webp'})
+
+    event = create_event('/', 'GET', {})
+    event['headers']['Accept'] = 'image/webp, */*;q=0.8'
+    response = demo(event, context=None)
+    assert response['isBase64Encoded']
+    assert response['body'] == base64.b64encode(b'\x00\x01').decode('ascii')
+
+
+def test_raw_body_events_get_binary_bodies_as_bytes(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/', methods=['POST'], content_types=['image/png'])
+    def index():
+        return Response(body=demo.current_request.raw_body[::-1],
+                        headers={'Content-Type': 'image/png'})
+
+    event = create_event('/', 'POST', {}, content_type='image/png')
+    event['body'] = b'\x00\x01'
+    event['headers']['Accept'] = 'image/png'
+    event['chalice_raw_body'] = True
+    response = demo(event, context=None)
+    assert response['statusCode'] == 200
+    assert response['body'] == b'\x01\x00'
+    assert 'isBase64Encoded' not in response
+
+
+def test_raw_and_base64_responses_are_cached_separately(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/', cache=app.CacheConfig())
+    def index():
+        return Response(body=b'\x00\x01',
+                        headers={'Content-Type': 'image/png'})
+
+    event = create_event('/', 'GET', {})
+    event['headers']['Accept'] = 'image/png'
+    raw_event = dict(event, chalice_raw_body=True)
+    assert demo(raw_event, context=None)['body'] == b'\x00\x01'
+    response = demo(event, context=None)
+    assert response['isBase64Encoded']
+    assert response['body'] == base64.b64encode(b'\x00\x01').decode('ascii')
+
+
+requires_async = pytest.mark.skipif(
+    sys.version_info < (3, 5), reason='async def requires python 3.5+')
+
+
+def define_async_views(source):
+    # The async views are compiled from a string so this module can
+    # still be imported on python 2.
+    namespace = {}
+    exec(source, namespace)
+    return namespace
+
+
+@requires_async
+def test_can_call_async_view(create_event):
+    demo = app.Chalice('app-name')
+    views = define_async_views(
+        'import asyncio\n'
+        'async def lookup(value):\n'
+        '    await asyncio.sleep(0)\n'
+        '    return value * 2\n'
+        'async def index(name):\n'
+        '    results = await asyncio.gather(*[lookup(i) for i in (1, 2, 3)])\n'
+        '    return {"name": name, "results": results}\n'
+    )
+    demo.route('/{name}')(views['index'])
+
+    response = demo(create_event('/{name}', 'GET', {'name': 'foo'}),
+                    context=None)
+    assert response['statusCode'] == 200
+    assert json.loads(response['body']) == {
+        'name': 'foo', 'results': [2, 4, 6]}
+
+
+@requires_async
+def test_async_views_reuse_event_loop(create_event):
+    demo = app.Chalice('app-name')
+    views = define_async_views(
+        'import asyncio\n'
+        'loops = []\n'
+        'async def index():\n'
+        '    loops.append(asyncio.get_event_loop())\n'
+        '    return {}\n'
+    )
+    demo.route('/')(views['index'])
+
+    demo(create_event('/', 'GET', {}), context=None)
+    demo(create_event('/', 'GET', {}), context=None)
+    first, second = views['loops']
+    assert first is second
+    assert not first.is_closed()
+
+
+@requires_async
+def test_async_view_errors_converted_to_responses(create_event):
+    demo = app.Chalice('app-name')
+    views = define_async_views(
+        'from chalice import NotFoundError\n'
+        'async def index():\n'
+        '    raise NotFoundError("missing")\n'
+    )
+    demo.route('/')(views['index'])
+
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['statusCode'] == 404
+    assert json.loads(response['body'])['Code'] == 'NotFoundError'
+
+
+@requires_async
+@pytest.mark.skipif(not hasattr(signal, 'setitimer'),
+                    reason='Requires SIGALRM')
+def test_timed_out_async_view_is_cancelled(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=400)
+    views = define_async_views(
+        'import asyncio\n'
+        'calls = []\n'
+        'async def slow():\n'
+        '    calls.append("slow started")\n'
+        '    while True:\n'
+        '        await asyncio.sleep(0.01)\n'
+        '        calls.append("slow resumed")\n'
+        'async def fast():\n'
+        '    await asyncio.sleep(0.03)\n'
+        '    return {}\n'
+    )
+    demo.route('/slow')(views['slow'])
+    demo.route('/fast')(views['fast'])
+
+    response = demo(create_event('/slow', 'GET', {}), FakeLambdaContext())
+    assert response['statusCode'] == 504
+    del views['calls'][:]
+    response = demo(create_event('/fast', 'GET', {}), FakeLambdaContext())
+    assert response['statusCode'] == 200
+    assert views['calls'] == []
+
+
+@requires_async
+def test_middleware_wraps_async_views(create_event):
+    demo = app.Chalice('app-name')
+    views = define_async_views(
+        'async def index():\n'
+        '    return {"async": True}\n'
+    )
+    demo.route('/')(views['index'])
+
+    def add_header(request, get_response):
+        response = get_response(request)
+        response.headers['X-Middleware'] = 'true'
+        return response
+
+    demo.register_middleware(add_header)
+    response = demo(create_event('/', 'GET', {}), context=None)
+    assert response['headers']['X-Middleware'] == 'true'
+    assert json.loads(response['body']) == {'async': True}
+
+
+def test_executor_created_once():
+    demo = app.Chalice('app-name')
+    executor = demo.executor
+    assert demo.executor is executor
+    assert executor._max_workers == 5
+
+
+@pytest.mark.parametrize('memory_size,max_workers', [
+    ('128', 5),
+    ('1769', 5),
+    ('3008', 6),
+    ('10240', 10),
+])
+def test_executor_sized_from_memory_size(memory_size, max_workers):
+    demo = app.Chalice(
+        'app-name', env={'AWS_LAMBDA_FUNCTION_MEMORY_SIZE': memory_size})
+    assert demo.executor._max_workers == max_workers
+
+
+def test_executor_max_workers_can_be_configured():
+    demo = app.Chalice('app-name', executor_max_workers=2)
+    assert demo.executor._max_workers == 2
+
+
+def test_executor_recreated_after_fork(monkeypatch):
+    demo = app.Chalice('app-name')
+    executor = demo.executor
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert demo.executor is not executor
+
+
+def test_parallel_map_returns_results_in_order(sample_app, create_event):
+    @sample_app.route('/parallel')
+    def parallel():
+        def lookup(value):
+            time.sleep(0.01 * (3 - value))
+            return (value, sample_app.current_request.method)
+        return {'results': sample_app.parallel_map(lookup, [1, 2, 3])}
+
+    response = sample_app(create_event('/parallel', 'GET', {}),
+                          FakeLambdaContext())
+    assert json_response_body(response) == {
+        'results': [[1, 'GET'], [2, 'GET'], [3, 'GET']]}
+
+
+def test_parallel_map_raises_timeout():
+    from concurrent.futures import TimeoutError
+    demo = app.Chalice('app-name')
+    with pytest.raises(TimeoutError):
+        demo.parallel_map(time.sleep, [1], timeout=0.01)
+
+
+def test_parallel_map_limited_by_deadline(create_event):
+    demo = app.Chalice('app-name', deadline_margin_ms=450)
+    started = []
+
+    def slow(value):
+        started.append(value)
+        time.sleep(0.5)
+
+    @demo.route('/')
+    def index():
+        return demo.parallel_map(slow, range(50), timeout=10)
+
+    start = time.time()
+    response = demo(create_event('/', 'GET', {}), FakeLambdaContext())
+    assert time.time() - start < 0.5
+    assert response['statusCode'] == 504
+    assert json_response_body(response)['Code'] == 'GatewayTimeoutError'
+    # The calls that didn't start are cancelled.
+    assert len(started) <= demo.executor._max_workers
+
+
+USER_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'name': {'type': 'string', 'minLength': 1},
+        'age': {'type': 'integer', 'minimum': 0},
+        'tags': {'type': 'array', 'items': {'type': 'string'},
+                 'maxItems': 2},
+    },
+    'required': ['name'],
+    'additionalProperties': False,
+}
+
+
+@pytest.mark.parametrize('value,error', [
+    ({'name': 'a'}, None),
+    ({'name': 'a', 'age': 3, 'tags': ['x', 'y']}, None),
+    ({}, 'body.name is required'),
+    ([], 'body must be of type object'),
+    ({'name': ''}, 'body.name must be at least 1 characters long'),
+    ({'name': 'a', 'age': True}, 'body.age must be of type integer'),
+    ({'name': 'a', 'age': -1},
+     'body.age must be greater than or equal to 0'),
+    ({'name': 'a', 'tags': ['x', 1]}, 'body.tags[1] must be of type string'),
+    ({'name': 'a', 'tags': ['x', 'y', 'z']},
+     'body.tags must have at most 2 items'),
+    ({'name': 'a', 'extra': 1}, 'body.extra is not allowed'),
+])
+def test_json_schema_validator(value, error):
+    validator = app.JSONSchemaValidator(USER_SCHEMA)
+    if error is None:
+        validator.validate(value)
+    else:
+        with pytest.raises(app.BadRequestError) as e:
+            validator.validate(value)
+        assert str(e.value) == 'BadRequestError: %s' % error
+
+
+@pytest.mark.parametrize('schema,value,valid', [
+    ({'enum': ['a', 'b']}, 'b', True),
+    ({'enum': ['a', 'b']}, 'c', False),
+    ({'type': ['string', 'null']}, None, True),
+    ({'pattern': '^[a-z]+$'}, 'abc', True),
+    ({'pattern': '^[a-z]+$'}, 'ABC', False),
+    ({'maximum': 10, 'exclusiveMaximum': True}, 10, False),
+    ({'anyOf': [{'type': 'string'}, {'type': 'integer'}]}, 1, True),
+    ({'anyOf': [{'type': 'string'}, {'type': 'integer'}]}, 1.5, False),
+    ({'allOf': [{'minimum': 1}, {'maximum': 2}]}, 3, False),
+    ({'additionalProperties': {'type': 'integer'}}, {'a': 1}, True),
+    ({'additionalProperties': {'type': 'integer'}}, {'a': 'b'}, False),
+])
+def test_json_schema_keywords(schema, value, valid):
+    validator = app.JSONSchemaValidator(schema)
+    if valid:
+        validator.validate(value)
+    else:
+        with pytest.raises(app.BadRequestError):
+            validator.validate(value)
+
+
+def test_unsupported_json_schema_keyword_rejected():
+    with pytest.raises(ValueError):
+        app.JSONSchemaValidator({'oneOf': [{'type': 'string'}]})
+
+
+def test_body_schema_compiled_when_route_registered():
+    demo = app.Chalice('app-name')
+    with pytest.raises(ValueError):
+        @demo.route('/', methods=['POST'], body_schema={'$ref': '#/a'})
+        def index():
+            return {}
+
+
+def test_invalid_body_rejected_before_view(create_event_with_body):
+    demo = app.Chalice('app-name')
+    called = []
+
+    @demo.route('/', methods=['POST'], body_schema=USER_SCHEMA,
+                cors=True)
+    def index():
+        called.append(True)
+        return demo.current_request.json_body
+
+    response = demo(create_event_with_body({'age': 1}), context=None)
+    assert response['statusCode'] == 400
+    assert json_response_body(response) == {
+        'Code': 'BadRequestError',
+        'Message': 'BadRequestError: body.name is required'}
+    assert 'Access-Control-Allow-Origin' in response['headers']
+    assert not called
+
+    response = demo(create_event_with_body({'name': 'foo'}), context=None)
+    assert response['statusCode'] == 200
+    assert json_response_body(response) == {'name': 'foo'}
+
+
+def test_malformed_body_rejected_before_view(create_event):
+    demo = app.Chalice('app-name')
+    called = []
+
+    @demo.route('/', methods=['POST'], body_schema=USER_SCHEMA)
+    def index():
+        called.append(True)
+        return {}
+
+    event = create_event('/', 'POST', {})
+    event['body'] = '{"name": '
+    response = demo(event, context=None)
+    assert response['statusCode'] == 400
+    assert json_response_body(response) == {
+        'Code': 'BadRequestError',
+        'Message': 'BadRequestError: Invalid JSON body'}
+    assert not called
+
+
+def test_invalid_query_params_rejected(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/', query_schema={
+        'type': 'object',
+        'properties': {'limit': {'type': 'string', 'pattern': '^[0-9]+$'}},
+        'required': ['limit'],
+    })
+    def index():
+        return demo.current_request.query_params
+
+    event = create_event('/', 'GET', {})
+    event['queryStringParameters'] = None
+    response = demo(event, context=None)
+    assert response['statusCode'] == 400
+    assert json_response_body(response)['Message'] == (
+        'BadRequestError: query.limit is required')
+
+    event['queryStringParameters'] = {'limit': 'ten'}
+    assert demo(event, context=None)['statusCode'] == 400
+
+    event['queryStringParameters'] = {'limit': '10'}
+    response = demo(event, context=None)
+    assert response['statusCode'] == 200
+    assert json_response_body(response) == {'limit': '10'}
+
+
+def test_query_params_parsed_as_declared_types(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/', query_schema={
+        'type': 'object',
+        'properties': {'n': {'type': 'integer', 'minimum': 1},
+                       'ratio': {'type': 'number'},
+                       'verbose': {'type': 'boolean'},
+                       'name': {'type': 'string'}},
+    })
+    def index():
+        return demo.current_request.query_params
+
+    event = create_event('/', 'GET', {})
+    params = {'n': '5', 'ratio': '0.5', 'verbose': 'true', 'name': '7'}
+    event['queryStringParameters'] = params
+    response = demo(event, context=None)
+    assert response['statusCode'] == 200
+    # The view still sees the strings from the query string.
+    assert json_response_body(response) == params
+
+    for name, value in [('n', 'five'), ('n', '0'), ('n', '1.5'),
+                        ('ratio', 'half'), ('verbose', 'yes')]:
+        event['queryStringParameters'] = {name: value}
+        assert demo(event, context=None)['statusCode'] == 400
+    event['queryStringParameters'] = {'n': 'five'}
+    assert json_response_body(demo(event, context=None))['Message'] == (
+        'BadRequestError: query.n must be of type integer')
+
+
+def test_multidict_returns_last_value_and_lists():
+    params = app.MultiDict({'a': 'c', 'd': 'e'},
+                           {'a': ['b', 'c'], 'd': ['e']})
+    assert params['a'] == 'c'
+    assert params.getlist('a') == ['b', 'c']
+    assert params.getlist('missing') == []
+    assert dict(params) == {'a': 'c', 'd': 'e'}
+    assert len(params) == 2
+    with pytest.raises(TypeError):
+        params['a'] = 'f'
+
+
+def test_multidict_with_only_single_values():
+    params = app.MultiDict({'a': 'b'})
+    assert params['a'] == 'b'
+    assert params.getlist('a') == ['b']
+    assert params == {'a': 'b'}
+    assert app.MultiDict() == {}
+
+
+def test_case_insensitive_multidict():
+    headers = app.MultiDict({'X-Foo': 'b'}, {'X-Foo': ['a', 'b']},
+                            case_sensitive=False)
+    assert headers['x-foo'] == 'b'
+    assert headers.getlist('X-FOO') == ['a', 'b']
+    assert list(headers) == ['x-foo']
+
+
+def test_multi_value_params_available_on_request(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/')
+    def index():
+        request = demo.current_request
+        return {'ids': request.query_params.getlist('id'),
+                'last_id': request.query_params['id'],
+                'accept': request.headers.getlist('accept')}
+
+    event = create_event('/', 'GET', {})
+    event['queryStringParameters'] = {'id': '2'}
+    event['multiValueQueryStringParameters'] = {'id': ['1', '2']}
+    event['headers']['Accept'] = 'text/html'
+    event['multiValueHeaders'] = {'Accept': ['application/json',
+                                             'text/html']}
+    response = demo(event, context=None)
+    assert json_response_body(response) == {
+        'ids': ['1', '2'], 'last_id': '2',
+        'accept': ['application/json', 'text/html']}
+
+
+def test_can_return_query_params_from_view(create_event):
+    demo = app.Chalice('app-name')
+
+    @demo.route('/')
+    def index():
+        return demo.current_request.query_params
+
+    event = create_event('/', 'GET', {})
+    event['queryStringParameters'] = {'a': 'b'}
+    assert json_response_body(demo(event, context=None)) == {'a': 'b'}
@@ -263,6 +263,22 @@ def test_lambda_functions_not_required_from_dict():
     }
     d = DeployedResources.from_dict(older_version)
     assert d.lambda_functions == {}
+    assert d.keep_warm_rule is None
+
+
+def test_keep_warm_rule_from_dict():
+    d = DeployedResources.from_dict({
+        'backend': 'api',
+        'api_handler_arn': 'arn',
+        'api_handler_name': 'name',
+        'rest_api_id': 'id',
+        'api_gateway_stage': 'stage',
+        'region': 'region',
+        'chalice_version': '1.0.0',
+        'lambda_functions': {},
+        'keep_warm_rule': 'name-keep-warm',
+    })
+    assert d.keep_warm_rule == 'name-keep-warm'
 
 
 def test_environment_from_top_level():
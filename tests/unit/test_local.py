@@ -1,6 +1,10 @@
 import re
+import sys
+import signal
 import json
+import zlib
 import decimal
+import threading
 import pytest
 import mock
 from pytest import fixture
@@ -20,6 +24,9 @@ from chalice.local import NotAuthorizedError
 from chalice.local import ForbiddenError
 from chalice.local import InvalidAuthorizerError
 from chalice.local import LocalDevServer
+from chalice.local import BoundedThreadPoolHTTPServer
+from chalice.local import PreforkLocalDevServer
+from chalice.local import LocalSQSQueue
 
 
 AWS_REQUEST_ID_PATTERN = re.compile(
@@ -127,6 +134,13 @@ def sample_app():
     def query_string():
         return demo.current_request.query_params
 
+    @demo.route('/query-string-list')
+    def query_string_list():
+        query_params = demo.current_request.query_params
+        return {'last': query_params['a'],
+                'all': query_params.getlist('a'),
+                'single': query_params.getlist('d')}
+
     @demo.route('/custom-response')
     def custom_response():
         return Response(body='text',
@@ -462,6 +476,42 @@ def test_querystring_is_mapped(handler):
     assert _get_body_from_response_stream(handler) == {'a': 'b', 'c': 'd'}
 
 
+def test_repeated_querystring_params_are_mapped(handler):
+    set_current_request(handler, method='GET',
+                        path='/query-string-list?a=b&a=c&d=e')
+    handler.do_GET()
+    assert _get_body_from_response_stream(handler) == {
+        'last': 'c', 'all': ['b', 'c'], 'single': ['e']}
+
+
+def test_can_create_lambda_event_with_repeated_query_params():
+    converter = local.LambdaEventConverter(local.RouteMatcher(['/foo']))
+    event = converter.create_lambda_event(
+        method='GET',
+        path='/foo?a=b&a=c',
+        headers={'X-Custom': 'one'},
+        multi_value_headers={'X-Custom': ['one', 'two']},
+    )
+    assert event['queryStringParameters'] == {'a': 'c'}
+    assert event['multiValueQueryStringParameters'] == {'a': ['b', 'c']}
+    assert event['headers'] == {'x-custom': 'one'}
+    assert event['multiValueHeaders'] == {'x-custom': ['one', 'two']}
+
+
+def test_raw_body_events_are_not_base64_encoded():
+    converter = local.LambdaEventConverter(
+        local.RouteMatcher(['/foo']), ['image/png'], raw_body=True)
+    event = converter.create_lambda_event(
+        method='POST',
+        path='/foo',
+        headers={'content-type': 'image/png'},
+        body=b'\x00\x01',
+    )
+    assert event['body'] == b'\x00\x01'
+    assert 'isBase64Encoded' not in event
+    assert event['chalice_raw_body'] is True
+
+
 def test_content_type_included_once(handler):
     set_current_request(handler, method='GET', path='/custom-response')
     handler.do_GET()
@@ -472,6 +522,23 @@ def test_content_type_included_once(handler):
     assert len(content_header_lines) == 1
 
 
+def test_can_serve_compressed_response():
+    demo = app.Chalice('app-name')
+    demo.api.compression = app.CompressionConfig(minimum_size=10)
+
+    @demo.route('/')
+    def index():
+        return {'data': 'x' * 100}
+
+    gateway = LocalGateway(demo, Config())
+    response = gateway.handle_request(
+        method='GET', path='/', headers={'accept-encoding': 'gzip'},
+        body=None)
+    assert response['headers']['Content-Encoding'] == 'gzip'
+    body = zlib.decompress(response['body'], 16 + zlib.MAX_WBITS)
+    assert json.loads(body.decode('utf-8')) == {'data': 'x' * 100}
+
+
 def test_can_deny_unauthed_request(auth_handler):
     set_current_request(auth_handler, method='GET', path='/index')
     auth_handler.do_GET()
@@ -496,12 +563,14 @@ def test_can_deny_unauthed_request(auth_handler):
     ('/names/bar/wrong', None),
     ('/a/z/c', '/a/{capture}/c'),
     ('/a/b/c', '/a/b/c'),
+    ('/a/b/d', '/a/{capture}/d'),
+    ('/', '/'),
 ])
 def test_can_match_exact_route(actual_url, matched_url):
     matcher = local.RouteMatcher([
-        '/foo', '/foo/{capture}', '/foo/bar',
+        '/', '/foo', '/foo/{capture}', '/foo/bar',
         '/names/{capture}',
-        '/a/{capture}/c', '/a/b/c'
+        '/a/{capture}/c', '/a/b/c', '/a/{capture}/d',
     ])
     if matched_url is not None:
         assert matcher.match_route(actual_url).route == matched_url
@@ -510,6 +579,22 @@ def test_can_match_exact_route(actual_url, matched_url):
             matcher.match_route(actual_url)
 
 
+def test_captures_from_failed_routes_not_included():
+    matcher = local.RouteMatcher([
+        '/users/{user_id}/orders', '/{resource}/{id}/items'])
+    match = matcher.match_route('/users/123/items')
+    assert match.route == '/{resource}/{id}/items'
+    assert match.captured == {'resource': 'users', 'id': '123'}
+
+
+def test_captures_use_names_of_matched_route():
+    matcher = local.RouteMatcher(['/users/{user_id}',
+                                  '/users/{name}/profile'])
+    assert matcher.match_route('/users/1').captured == {'user_id': '1'}
+    assert matcher.match_route('/users/bob/profile').captured == {
+        'name': 'bob'}
+
+
 def test_lambda_event_contains_source_ip():
     converter = local.LambdaEventConverter(
         local.RouteMatcher(['/foo/bar']))
@@ -539,8 +624,10 @@ def test_can_create_lambda_event():
             },
         },
         'headers': {'content-type': 'application/json'},
+        'multiValueHeaders': {'content-type': ['application/json']},
         'pathParameters': {'capture': 'other'},
         'queryStringParameters': None,
+        'multiValueQueryStringParameters': None,
         'body': None,
         'stageVariables': {},
     }
@@ -564,8 +651,10 @@ def test_can_create_lambda_event_for_put_request():
             },
         },
         'headers': {'content-type': 'application/json'},
+        'multiValueHeaders': {'content-type': ['application/json']},
         'pathParameters': {'capture': 'other'},
         'queryStringParameters': None,
+        'multiValueQueryStringParameters': None,
         'body': '{"foo": "bar"}',
         'stageVariables': {},
     }
@@ -590,8 +679,11 @@ def test_can_create_lambda_event_for_post_with_formencoded_body():
             },
         },
         'headers': {'content-type': 'application/x-www-form-urlencoded'},
+        'multiValueHeaders': {
+            'content-type': ['application/x-www-form-urlencoded']},
         'pathParameters': {'capture': 'other'},
         'queryStringParameters': None,
+        'multiValueQueryStringParameters': None,
         'body': form_body,
         'stageVariables': {},
     }
@@ -609,6 +701,166 @@ def test_can_provide_host_to_local_server(sample_app):
     assert dev_server.host == '0.0.0.0'
 
 
+def test_can_create_local_server_with_worker_pool(sample_app):
+    dev_server = local.create_local_server(
+        sample_app, None, '127.0.0.1', port=0, workers=2, backlog=3)
+    try:
+        server = dev_server.server
+        assert isinstance(server, BoundedThreadPoolHTTPServer)
+        assert server.workers == 2
+        assert server.backlog == 3
+        assert server.keep_alive_timeout == local.DEFAULT_KEEP_ALIVE_TIMEOUT
+    finally:
+        dev_server.server.server_close()
+
+
+class TestBoundedThreadPoolHTTPServer(object):
+    def create_server(self, handler_cls, **kwargs):
+        server = BoundedThreadPoolHTTPServer(
+            ('127.0.0.1', 0), handler_cls, **kwargs)
+        self.servers.append(server)
+        return server
+
+    def setup_method(self):
+        self.servers = []
+
+    def teardown_method(self):
+        for server in self.servers:
+            server.server_close()
+
+    def test_workers_must_be_positive(self):
+        with pytest.raises(ValueError):
+            BoundedThreadPoolHTTPServer(('127.0.0.1', 0), None, workers=0)
+
+    def test_requests_are_handled_by_worker_threads(self):
+        handled = []
+        done = threading.Event()
+
+        def handler_cls(request, client_address, server):
+            handled.append((request, threading.current_thread().name))
+            done.set()
+
+        server = self.create_server(handler_cls, workers=1)
+        request = mock.Mock()
+        server.process_request(request, ('127.0.0.1', 2000))
+        assert done.wait(5)
+        assert handled[0][0] is request
+        assert handled[0][1] == 'chalice-local-worker-0'
+
+    def test_keep_alive_timeout_set_on_connection(self):
+        done = threading.Event()
+
+        def handler_cls(request, client_address, server):
+            done.set()
+
+        server = self.create_server(handler_cls, keep_alive_timeout=2.5)
+        request = mock.Mock()
+        server.process_request(request, ('127.0.0.1', 2000))
+        assert done.wait(5)
+        request.settimeout.assert_called_with(2.5)
+
+    def test_sends_503_when_backlog_is_full(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def handler_cls(request, client_address, server):
+            started.set()
+            release.wait(5)
+
+        server = self.create_server(handler_cls, workers=1, backlog=1)
+        busy, queued, rejected = mock.Mock(), mock.Mock(), mock.Mock()
+        server.process_request(busy, ('127.0.0.1', 2000))
+        # Wait for the only worker to take the first connection
+        # so the second one fills the queue.
+        assert started.wait(5)
+        server.process_request(queued, ('127.0.0.1', 2001))
+        server.process_request(rejected, ('127.0.0.1', 2002))
+        release.set()
+
+        response = rejected.sendall.call_args[0][0]
+        assert response.startswith(b'HTTP/1.1 503 Service Unavailable\r\n')
+        assert response.endswith(b'{"message": "Service Unavailable"}')
+        rejected.close.assert_called_with()
+        assert not busy.sendall.called
+        assert not queued.sendall.called
+
+
+class TestPreforkLocalDevServer(object):
+    def create_server(self, sample_app, times=None):
+        self.http_server = mock.Mock(spec=HTTPServer)
+        clock = mock.Mock(spec=local.Clock)
+        clock.time.side_effect = times or [0, 0, 10, 10]
+        return PreforkLocalDevServer(
+            sample_app, Config(), '0.0.0.0', 8000, processes=2,
+            server_cls=lambda *args: self.http_server, clock=clock)
+
+    def test_processes_must_be_positive(self, sample_app):
+        with pytest.raises(ValueError):
+            PreforkLocalDevServer(sample_app, Config(), '0.0.0.0', 8000,
+                                  processes=0,
+                                  server_cls=lambda *args: None)
+
+    def test_can_create_prefork_server(self, sample_app):
+        dev_server = local.create_local_server(
+            sample_app, None, '127.0.0.1', port=0, processes=3)
+        try:
+            assert isinstance(dev_server, PreforkLocalDevServer)
+            assert dev_server.processes == 3
+        finally:
+            dev_server.server.server_close()
+
+    def test_restarts_workers_that_exit(self, sample_app):
+        server = self.create_server(sample_app)
+        wait_results = [(101, 256), KeyboardInterrupt(), (102, 0), (103, 0)]
+        with mock.patch.object(local.os, 'fork',
+                               side_effect=[101, 102, 103]) as fork, \
+                mock.patch.object(local.os, 'wait',
+                                  side_effect=wait_results), \
+                mock.patch.object(local.os, 'kill') as kill:
+            server.serve_forever()
+        assert fork.call_count == 3
+        assert kill.call_args_list == [
+            mock.call(102, signal.SIGTERM), mock.call(103, signal.SIGTERM)]
+        self.http_server.server_close.assert_called_with()
+
+    def test_sigterm_stops_workers_without_restarting(self, sample_app):
+        server = self.create_server(sample_app)
+        wait_results = [(102, signal.SIGTERM)]
+
+        def wait():
+            if len(server._workers) == 2:
+                server._handle_sigterm(signal.SIGTERM, None)
+                return (101, signal.SIGTERM)
+            return wait_results.pop()
+
+        with mock.patch.object(local.os, 'fork',
+                               side_effect=[101, 102]) as fork, \
+                mock.patch.object(local.os, 'wait', side_effect=wait), \
+                mock.patch.object(local.os, 'kill') as kill:
+            server.serve_forever()
+        assert fork.call_count == 2
+        kill.assert_any_call(101, signal.SIGTERM)
+        kill.assert_any_call(102, signal.SIGTERM)
+
+    def test_worker_process_serves_and_exits(self, sample_app):
+        server = self.create_server(sample_app)
+        with mock.patch.object(local.os, '_exit',
+                               side_effect=SystemExit) as exit:
+            with pytest.raises(SystemExit):
+                server._run_worker()
+        self.http_server.serve_forever.assert_called_with()
+        exit.assert_called_with(0)
+
+    def test_worker_process_exits_with_error_on_crash(self, sample_app):
+        server = self.create_server(sample_app)
+        self.http_server.serve_forever.side_effect = RuntimeError()
+        with mock.patch.object(local.os, '_exit',
+                               side_effect=SystemExit) as exit:
+            with pytest.raises(SystemExit):
+                server._run_worker()
+        exit.assert_called_with(1)
+
+
 class TestLambdaContext(object):
     def test_can_get_remaining_time_once(self, lambda_context_args):
         time_source = FakeTimeSource([0, 5])
@@ -629,6 +881,11 @@ class TestLambdaContext(object):
         time_remaining = context.get_remaining_time_in_millis()
         assert time_remaining == 1000
 
+    def test_no_remaining_time_without_max_runtime(
+            self, lambda_context_args):
+        context = LambdaContext(*lambda_context_args, max_runtime_ms=None)
+        assert context.get_remaining_time_in_millis() is None
+
     def test_does_populate_aws_request_id_with_valid_uuid(self,
                                                           lambda_context_args):
         context = LambdaContext(*lambda_context_args)
@@ -652,6 +909,20 @@ class TestLocalGateway(object):
         body = json.loads(response['body'])
         assert body['foo'] == 'bar'
 
+    @pytest.mark.skipif(sys.version_info < (3, 5),
+                        reason='async def requires python 3.5+')
+    def test_can_invoke_async_function(self):
+        demo = app.Chalice('app-name')
+        namespace = {}
+        exec('async def index_view():\n'
+             '    return {"foo": "bar"}\n', namespace)
+        demo.route('/')(namespace['index_view'])
+
+        gateway = LocalGateway(demo, Config())
+        response = gateway.handle_request('GET', '/', {}, '')
+        body = json.loads(response['body'])
+        assert body['foo'] == 'bar'
+
     def test_does_populate_context(self):
         demo = app.Chalice('app-name')
 
@@ -681,6 +952,30 @@ class TestLocalGateway(object):
         assert body['timeout'] <= 10000
         assert AWS_REQUEST_ID_PATTERN.match(body['request_id'])
 
+    def test_no_deadline_without_lambda_timeout(self):
+        demo = app.Chalice('app-name', deadline_margin_ms=100)
+
+        @demo.route('/')
+        def index():
+            return {'remaining': demo.current_request.remaining_time()}
+
+        gateway = LocalGateway(demo, Config())
+        response = gateway.handle_request('GET', '/', {}, '')
+        assert response['statusCode'] == 200
+        assert json.loads(response['body']) == {'remaining': None}
+
+    def test_parallel_map_without_lambda_timeout(self):
+        demo = app.Chalice('app-name')
+
+        @demo.route('/')
+        def index():
+            return {'results': demo.parallel_map(lambda x: x * 2, [1, 2])}
+
+        gateway = LocalGateway(demo, Config())
+        response = gateway.handle_request('GET', '/', {}, '')
+        assert response['statusCode'] == 200
+        assert json.loads(response['body']) == {'results': [2, 4]}
+
     def test_can_validate_route_with_variables(self, demo_app_auth):
         gateway = LocalGateway(demo_app_auth, Config())
         response = gateway.handle_request(
@@ -997,7 +1292,7 @@ class TestLocalDevServer(object):
         dev_server.serve_forever()
         http_server.serve_forever.assert_called_with()
 
-    def test_host_and_port_forwarded_to_server_creation(self):
+    def test_host_and_port_forwarded_to_server_creation(self, sample_app):
         provided_args = []
 
         def args_recorder(*args):
@@ -1009,3 +1304,185 @@ class TestLocalDevServer(object):
         )
 
         assert provided_args[0] == ('0.0.0.0', 8000)
+
+    def test_handlers_share_local_gateway(self, sample_app):
+        handlers = []
+
+        def server_cls(address, handler_cls):
+            for _ in range(2):
+                handlers.append(handler_cls(None, ('127.0.0.1', 2000), None))
+
+        with mock.patch.object(local.BaseHTTPRequestHandler, '__init__',
+                               return_value=None):
+            dev_server = LocalDevServer(sample_app, Config(), '0.0.0.0', 8000,
+                                        server_cls=server_cls)
+        assert handlers[0].local_gateway is dev_server.local_gateway
+        assert handlers[1].local_gateway is dev_server.local_gateway
+
+    def test_shared_gateway_keeps_requests_per_thread(self):
+        demo = app.Chalice('app-name')
+        arrived = {'a': threading.Event(), 'b': threading.Event()}
+
+        @demo.route('/{name}')
+        def index(name):
+            # Wait until both requests are in the view at the same time.
+            arrived[name].set()
+            arrived['b' if name == 'a' else 'a'].wait(5)
+            return {'name': demo.current_request.uri_params['name']}
+
+        gateway = LocalGateway(demo, Config())
+        responses = {}
+
+        def make_request(name):
+            responses[name] = gateway.handle_request(
+                method='GET', path='/%s' % name, headers={}, body=None)
+
+        threads = [threading.Thread(target=make_request, args=(name,))
+                   for name in ('a', 'b')]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert json.loads(responses['a']['body']) == {'name': 'a'}
+        assert json.loads(responses['b']['body']) == {'name': 'b'}
+
+
+class TestLocalSQSQueue(object):
+    def create_handler(self, batch_size=2, fail_bodies=(), queue='myqueue'):
+        demo = app.Chalice('app-name')
+        batches = []
+
+        @demo.on_sqs_message(queue=queue, batch_size=batch_size)
+        def handler(event):
+            batches.append([record.body for record in event])
+            for record in event:
+                if record.body in fail_bodies:
+                    event.report_failure(record)
+
+        return handler, batches
+
+    def test_delivers_messages_in_batches(self):
+        handler, batches = self.create_handler(batch_size=2)
+        queue = LocalSQSQueue('myqueue')
+        for body in ['a', 'b', 'c']:
+            queue.send_message(body)
+        assert len(queue) == 3
+        assert queue.process(handler) == []
+        assert batches == [['a', 'b'], ['c']]
+        assert len(queue) == 0
+
+    def test_failed_messages_are_redelivered(self):
+        handler, batches = self.create_handler(fail_bodies=['b'])
+        queue = LocalSQSQueue('myqueue')
+        queue.send_message('a')
+        failed_id = queue.send_message('b')
+        assert queue.process(handler) == [failed_id]
+        assert len(queue) == 1
+        queue.process(handler)
+        assert batches == [['a', 'b'], ['b']]
+
+    def test_receive_count_is_incremented(self):
+        demo = app.Chalice('app-name')
+        counts = []
+
+        @demo.on_sqs_message(queue='myqueue')
+        def handler(event):
+            for record in event:
+                counts.append(record.attributes['ApproximateReceiveCount'])
+                event.report_failure(record)
+
+        queue = LocalSQSQueue('myqueue')
+        queue.send_message('a')
+        queue.process(handler)
+        queue.process(handler)
+        assert counts == ['1', '2']
+
+    def test_batch_requeued_when_handler_raises(self):
+        demo = app.Chalice('app-name')
+
+        @demo.on_sqs_message(queue='myqueue', batch_size=1)
+        def handler(event):
+            raise RuntimeError('boom')
+
+        queue = LocalSQSQueue('myqueue')
+        queue.send_message('a')
+        queue.send_message('b')
+        with pytest.raises(RuntimeError):
+            queue.process(handler)
+        assert len(queue) == 2
+
+    def test_event_matches_lambda_format(self):
+        demo = app.Chalice('app-name')
+        records = []
+
+        @demo.on_sqs_message(queue='myqueue')
+        def handler(event):
+            records.extend(event)
+
+        queue = LocalSQSQueue('myqueue', region='us-east-1',
+                              account_id='12345')
+        message_id = queue.send_message('{"foo": "bar"}')
+        queue.process(handler)
+        record = records[0]
+        assert record.message_id == message_id
+        assert record.json_body == {'foo': 'bar'}
+        assert record.queue == 'myqueue'
+        assert record.event_source_arn == (
+            'arn:aws:sqs:us-east-1:12345:myqueue')
+
+    def test_handler_must_subscribe_to_queue(self):
+        handler, _ = self.create_handler(queue='otherqueue')
+        queue = LocalSQSQueue('myqueue')
+        with pytest.raises(ValueError):
+            queue.process(handler)
+
+
+class TestLocalAuthorizerCaching(object):
+    def test_authorizer_called_once_per_token(self, lambda_context_args,
+                                              create_event):
+        demo = app.Chalice('app-name')
+        calls = []
+
+        @demo.authorizer()
+        def auth(auth_request):
+            calls.append(auth_request.token)
+            return app.AuthResponse(routes=['/index'], principal_id='user')
+
+        @demo.route('/index', authorizer=auth)
+        def index_view():
+            return {}
+
+        authorizer = LocalGatewayAuthorizer(demo)
+        for _ in range(3):
+            event = create_event('/index', 'GET', {})
+            event['headers']['authorization'] = 'allow'
+            context = LambdaContext(*lambda_context_args)
+            event, context = authorizer.authorize('/index', event, context)
+            assert event['requestContext']['authorizer'] == {
+                'principalId': 'user'}
+        assert calls == ['allow']
+
+
+class TestARNMatcher(object):
+    def test_exact_match(self):
+        matcher = local.ARNMatcher('arn:aws:execute-api:r:1:id/api/GET/a')
+        assert matcher.does_any_resource_match(
+            ['arn:aws:execute-api:r:1:id/api/GET/a'])
+        assert not matcher.does_any_resource_match(
+            ['arn:aws:execute-api:r:1:id/api/GET/ab'])
+
+    def test_wildcard_match(self):
+        matcher = local.ARNMatcher('arn:aws:execute-api:r:1:id/api/GET/a/b')
+        assert matcher.does_any_resource_match(
+            ['arn:aws:execute-api:r:1:id/api/*/a/*'])
+        assert matcher.does_any_resource_match(
+            ['arn:aws:execute-api:r:1:id/api/GE?/a/b'])
+        assert not matcher.does_any_resource_match(
+            ['arn:aws:execute-api:r:1:id/api/POST/*'])
+
+    def test_compiled_resources_are_reused(self):
+        resource = 'arn:aws:execute-api:r:1:id/api/*/reused'
+        local.ARNMatcher('a').does_any_resource_match([resource])
+        compiled = local.ARNMatcher._COMPILED_RESOURCES[resource]
+        local.ARNMatcher('b').does_any_resource_match([resource])
+        assert local.ARNMatcher._COMPILED_RESOURCES[resource] is compiled
@@ -372,3 +372,90 @@ def test_app_with_auth_but_invalid_cfn_name(sample_app,
             'Principal': 'apigateway.amazonaws.com'
         }
     }
+
+
+def test_app_with_sqs_handler(sample_app,
+                              mock_swagger_generator,
+                              mock_policy_generator):
+
+    @sample_app.on_sqs_message(queue='myqueue', batch_size=5)
+    def handler(event):
+        pass
+
+    p = package.SAMTemplateGenerator(
+        mock_swagger_generator, mock_policy_generator)
+    config = Config.create(
+        chalice_app=sample_app,
+        api_gateway_stage='dev',
+    )
+    template = p.generate_sam_template(config)
+    # The last four digits come from the hash of the handler name
+    sqs_function = template['Resources']['handlerc1cb']
+    assert sqs_function['Type'] == 'AWS::Serverless::Function'
+    assert sqs_function['Properties']['Handler'] == 'app.handler'
+    assert sqs_function['Properties']['Events'] == {
+        'handlerc1cbSQSEventSource': {
+            'Type': 'SQS',
+            'Properties': {
+                'Queue': {
+                    'Fn::Sub': (
+                        'arn:aws:sqs:${AWS::Region}:${AWS::AccountId}:myqueue'
+                    )
+                },
+                'BatchSize': 5,
+                'FunctionResponseTypes': ['ReportBatchItemFailures'],
+            }
+        }
+    }
+
+
+def test_each_sqs_handler_gets_its_own_queue(sample_app,
+                                             mock_swagger_generator,
+                                             mock_policy_generator):
+
+    @sample_app.on_sqs_message(queue='first-queue')
+    def first(event):
+        pass
+
+    @sample_app.on_sqs_message(queue='second-queue', batch_size=10)
+    def second(event):
+        pass
+
+    p = package.SAMTemplateGenerator(
+        mock_swagger_generator, mock_policy_generator)
+    config = Config.create(
+        chalice_app=sample_app,
+        api_gateway_stage='dev',
+    )
+    template = p.generate_sam_template(config)
+    queues = {}
+    for resource in template['Resources'].values():
+        if resource['Properties'].get('Handler') in ('app.first',
+                                                     'app.second'):
+            event, = resource['Properties']['Events'].values()
+            queues[resource['Properties']['Handler']] = (
+                event['Properties']['Queue']['Fn::Sub'].split(':')[-1],
+                event['Properties']['BatchSize'])
+    assert queues == {'app.first': ('first-queue', 1),
+                      'app.second': ('second-queue', 10)}
+
+
+def test_app_with_keep_warm(sample_app,
+                            mock_swagger_generator,
+                            mock_policy_generator):
+    sample_app.keep_warm(concurrency=2)
+    p = package.SAMTemplateGenerator(
+        mock_swagger_generator, mock_policy_generator)
+    config = Config.create(
+        chalice_app=sample_app,
+        api_gateway_stage='dev',
+    )
+    template = p.generate_sam_template(config)
+    events = template['Resources']['APIHandler']['Properties']['Events']
+    assert events['KeepWarm'] == {
+        'Type': 'Schedule',
+        'Properties': {
+            'Schedule': 'rate(5 minutes)',
+            'Input': '{"chalice_keep_warm": {"concurrency": 2}}',
+        }
+    }
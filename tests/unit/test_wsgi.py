@@ -0,0 +1,177 @@
+import json
+
+from pytest import fixture
+from six import BytesIO
+
+from chalice import app
+from chalice import Response
+from chalice.config import Config
+from chalice.wsgi import make_wsgi_app
+
+
+class StartResponse(object):
+    def __init__(self):
+        self.status = None
+        self.headers = None
+
+    def __call__(self, status, headers):
+        self.status = status
+        self.headers = dict(headers)
+
+
+def create_environ(method='GET', path='/', query_string='', headers=None,
+                   body=b'', content_type=None):
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        'PATH_INFO': path,
+        'QUERY_STRING': query_string,
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '8000',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'wsgi.input': BytesIO(body),
+        'wsgi.url_scheme': 'http',
+    }
+    if body:
+        environ['CONTENT_LENGTH'] = str(len(body))
+    if content_type is not None:
+        environ['CONTENT_TYPE'] = content_type
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+
+@fixture
+def sample_app():
+    demo = app.Chalice('demo-app')
+
+    @demo.route('/index')
+    def index():
+        return {'hello': 'world'}
+
+    @demo.route('/users/{name}', methods=['GET', 'PUT'])
+    def user(name):
+        request = demo.current_request
+        return {'name': name, 'method': request.method,
+                'body': request.json_body,
+                'tags': request.query_params.getlist('tag')
+                if request.query_params else [],
+                'custom': request.headers.get('x-custom')}
+
+    @demo.route('/image', methods=['POST'], content_types=['image/png'])
+    def image():
+        return Response(body=demo.current_request.raw_body[::-1],
+                        headers={'Content-Type': 'image/png'})
+
+    @demo.route('/cors', cors=True)
+    def cors():
+        return {}
+
+    return demo
+
+
+def call_app(wsgi_app, environ):
+    start_response = StartResponse()
+    body = b''.join(wsgi_app(environ, start_response))
+    return start_response, body
+
+
+def test_can_call_route(sample_app):
+    response, body = call_app(make_wsgi_app(sample_app),
+                              create_environ(path='/index'))
+    assert response.status == '200 OK'
+    assert response.headers['Content-Type'] == 'application/json'
+    assert response.headers['Content-Length'] == str(len(body))
+    assert json.loads(body.decode('utf-8')) == {'hello': 'world'}
+
+
+def test_request_is_converted_to_event(sample_app):
+    environ = create_environ(
+        method='PUT', path='/users/james', query_string='tag=a&tag=b',
+        headers={'X-Custom': 'value'}, body=b'{"age": 30}',
+        content_type='application/json')
+    response, body = call_app(make_wsgi_app(sample_app), environ)
+    assert response.status == '200 OK'
+    assert json.loads(body.decode('utf-8')) == {
+        'name': 'james', 'method': 'PUT', 'body': {'age': 30},
+        'tags': ['a', 'b'], 'custom': 'value'}
+
+
+def test_binary_bodies_are_passed_through(sample_app):
+    environ = create_environ(method='POST', path='/image',
+                             headers={'Accept': 'image/png'},
+                             body=b'\x00\x01\x02', content_type='image/png')
+    response, body = call_app(make_wsgi_app(sample_app), environ)
+    assert response.status == '200 OK'
+    assert response.headers['Content-Type'] == 'image/png'
+    assert body == b'\x02\x01\x00'
+
+
+def test_unknown_route_is_forbidden(sample_app):
+    response, body = call_app(make_wsgi_app(sample_app),
+                              create_environ(path='/unknown'))
+    assert response.status == '403 Forbidden'
+    assert json.loads(body.decode('utf-8')) == {
+        'message': 'Missing Authentication Token'}
+
+
+def test_unsupported_method_is_not_allowed(sample_app):
+    response, _ = call_app(make_wsgi_app(sample_app),
+                           create_environ(method='POST', path='/index'))
+    assert response.status == '405 Method Not Allowed'
+
+
+def test_can_answer_cors_preflight(sample_app):
+    response, body = call_app(make_wsgi_app(sample_app),
+                              create_environ(method='OPTIONS', path='/cors'))
+    assert response.status == '200 OK'
+    assert response.headers['Access-Control-Allow-Origin'] == '*'
+    assert response.headers['Content-Length'] == '0'
+    assert body == b''
+
+
+def test_path_is_quoted_before_matching(sample_app):
+    # WSGI servers decode the path, so a captured "?" must not be
+    # treated as the start of the query string.
+    response, body = call_app(make_wsgi_app(sample_app),
+                              create_environ(path='/users/a?b'))
+    assert response.status == '200 OK'
+    assert json.loads(body.decode('utf-8'))['name'] == 'a%3Fb'
+
+
+def test_reserved_path_characters_are_not_quoted(sample_app):
+    response, body = call_app(make_wsgi_app(sample_app),
+                              create_environ(path='/users/a:b'))
+    assert response.status == '200 OK'
+    assert json.loads(body.decode('utf-8'))['name'] == 'a:b'
+
+
+def test_raw_uri_used_when_provided(sample_app):
+    environ = create_environ(path='/users/a/b', query_string='x=1')
+    environ['RAW_URI'] = '/users/a%2Fb?x=1'
+    response, body = call_app(make_wsgi_app(sample_app), environ)
+    assert response.status == '200 OK'
+    assert json.loads(body.decode('utf-8'))['name'] == 'a%2Fb'
+
+
+def test_gateway_is_shared_between_requests(sample_app):
+    wsgi_app = make_wsgi_app(sample_app)
+    gateway = wsgi_app.local_gateway
+    call_app(wsgi_app, create_environ(path='/index'))
+    call_app(wsgi_app, create_environ(path='/index'))
+    assert wsgi_app.local_gateway is gateway
+
+
+def test_lambda_context_uses_config(sample_app):
+    contexts = []
+
+    @sample_app.route('/context')
+    def context():
+        contexts.append(sample_app.lambda_context)
+        return {}
+
+    config = Config.create(lambda_timeout=10, lambda_memory_size=256)
+    call_app(make_wsgi_app(sample_app, config),
+             create_environ(path='/context'))
+    assert contexts[0].memory_limit_in_mb == 256
+    assert 0 < contexts[0].get_remaining_time_in_millis() <= 10000